@@ -3,12 +3,20 @@ FastAPI application for Penguins Analysis
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 
 from config import settings
-from routers import part1, part2, part3, part4, part5, health
+from routers import part1, part2, part3, part4, part5, health, cache, data, penguins, profiler
 from database import init_services, close_services
+from services.analysis import analysis_service
+from services.evaluation import MODEL_KEYS
+from services.jobs import job_manager
+from services.profiler import ProfilerMiddleware, profiler_service
+from services.shared_state import shared_state
+from responses import FastJSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from metrics import MetricsMiddleware, render_latest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,7 +26,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Penguins Analysis API",
     description="API for multi-database penguin species classification and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -30,6 +39,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in sampling of requests (X-Profile header or a route armed via /api/profiler)
+app.add_middleware(ProfilerMiddleware, profiler=profiler_service)
+
 # Lifecycle events
 @app.on_event("startup")
 async def startup():
@@ -37,12 +52,18 @@ async def startup():
     try:
         init_services()
         logger.info("Database services initialized")
+        # Retrains in this worker tell the others to reload the models
+        analysis_service.on_models_changed = shared_state.publish_models_changed
+        shared_state.sync_models()
+        if settings.MODEL_WARMUP:
+            analysis_service.models.warm_in_background(MODEL_KEYS)
     except Exception as e:
         logger.error(f"Failed to initialize database services: {e}")
 
 @app.on_event("shutdown")
 async def shutdown():
     """Close database connections on shutdown"""
+    job_manager.shutdown()
     close_services()
     logger.info("Database services closed")
 
@@ -53,6 +74,10 @@ app.include_router(part2.router, prefix="/api/part2", tags=["part2_visualization
 app.include_router(part3.router, prefix="/api/part3", tags=["part3_regression"])
 app.include_router(part4.router, prefix="/api/part4", tags=["part4_classification"])
 app.include_router(part5.router, prefix="/api/benchmark", tags=["benchmark"])
+app.include_router(cache.router, prefix="/api/cache", tags=["cache"])
+app.include_router(data.router, prefix="/api/data", tags=["data"])
+app.include_router(penguins.router, prefix="/api/penguins", tags=["penguins"])
+app.include_router(profiler.router, prefix="/api/profiler", tags=["profiler"])
 
 @app.get("/")
 async def root():
@@ -63,6 +88,12 @@ async def root():
         "version": "1.0.0"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics (all workers when PROMETHEUS_MULTIPROC_DIR is set)"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Worker processes import the app themselves, so pass it as an import string
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=settings.WORKERS)
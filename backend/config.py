@@ -17,11 +17,54 @@ class Settings(BaseSettings):
     CASSANDRA_HOST: str = os.getenv("CASSANDRA_HOST", "localhost")
     CASSANDRA_PORT: int = int(os.getenv("CASSANDRA_PORT", "9042"))
     CASSANDRA_KEYSPACE: str = "penguins"
+    # Command prefix for nodetool (e.g. "docker exec penguins-cassandra-lrm-1 nodetool"),
+    # used by the cold-cache benchmark to invalidate key/row caches; empty disables it
+    CASSANDRA_NODETOOL: str = os.getenv("CASSANDRA_NODETOOL", "")
     
     # Redis
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     
+    # Response cache
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_LOCAL_SIZE: int = int(os.getenv("RESPONSE_CACHE_LOCAL_SIZE", "256"))
+    
+    # Serving: uvicorn worker processes (WEB_CONCURRENCY is uvicorn's own variable)
+    WORKERS: int = int(os.getenv("WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+    # Memory-map persisted model arrays so workers share them through the page cache
+    MODEL_MMAP: bool = os.getenv("MODEL_MMAP", "true").lower() == "true"
+    # zlib level of model artifacts (0 keeps them uncompressed, which memory-mapping requires)
+    MODEL_COMPRESS: int = int(os.getenv("MODEL_COMPRESS", "0"))
+    # Versions of each model kept in the registry for rollback
+    MODEL_VERSIONS_KEPT: int = int(os.getenv("MODEL_VERSIONS_KEPT", "3"))
+    # Load the persisted models in a background thread at startup instead of on first use
+    MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+    
+    # Sampling profiler (X-Profile header and /api/profiler)
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    
+    # Streaming statistics: documents per chunk read from a store cursor
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "5000"))
+    
+    # Background jobs
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    # Processes (one core each) fitting cross-validation folds
+    CV_WORKERS: int = int(os.getenv("CV_WORKERS", "2"))
+    # Threads splitting the neighbour queries of a K-NN batch prediction (-1: all cores)
+    KNN_QUERY_JOBS: int = int(os.getenv("KNN_QUERY_JOBS", "-1"))
+    
+    # Incremental model updates (/api/part4/update)
+    # Rows appended to the K-NN side index before it is folded into the main index
+    KNN_DELTA_LIMIT: int = int(os.getenv("KNN_DELTA_LIMIT", "2048"))
+    # Population stability index of a feature or of the species mix that calls for a full retrain
+    DRIFT_PSI_THRESHOLD: float = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+    # Drop in accuracy on new rows (before learning them) that calls for a full retrain
+    DRIFT_ACCURACY_DROP: float = float(os.getenv("DRIFT_ACCURACY_DROP", "0.05"))
+    # Appended rows, as a share of the last full training set, after which a full retrain is due
+    INCREMENTAL_MAX_GROWTH: float = float(os.getenv("INCREMENTAL_MAX_GROWTH", "0.5"))
+    
     # API
     API_TITLE: str = "Penguins Analysis API"
     API_VERSION: str = "1.0.0"
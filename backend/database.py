@@ -1,14 +1,27 @@
 """
 Database connection and query services
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from itertools import islice
+from bson.int64 import Int64
+from bson.objectid import ObjectId
+from bson.min_key import MinKey
 from pymongo import MongoClient
+from pymongo.write_concern import WriteConcern
+from cassandra import ConsistencyLevel
 from cassandra.cluster import Cluster
+from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent_with_args
 import redis
 import json
 import logging
+import shlex
+import subprocess
+import uuid
 
 from config import settings
+from fields import FIELDS, FIELDS_BY_NAME, STORES, cassandra_value, physical_names, resolve_projection
+from metrics import timed
 
 logger = logging.getLogger(__name__)
 
@@ -37,16 +50,112 @@ class MongoDBService:
         if self.client:
             self.client.close()
     
-    def get_all_penguins(self) -> List[Dict]:
-        """Get all penguins"""
-        return list(self.collection.find({}, {'_id': 0}))
+    @staticmethod
+    def _projection(fields: Optional[List[str]] = None) -> Dict[str, int]:
+        """Find projection for logical field names (all fields when None)"""
+        projection = {'_id': 0}
+        names = resolve_projection(fields)
+        if names:
+            projection.update({name: 1 for name in physical_names('mongodb', names)})
+        return projection
     
-    def get_penguins_by_species(self, species: str) -> List[Dict]:
-        """Get penguins by species"""
-        return list(self.collection.find({'species': species}, {'_id': 0}))
+    @timed('mongodb')
+    def get_all_penguins(self, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all penguins, optionally only the given fields"""
+        return list(self.collection.find({}, self._projection(fields)))
     
-    def enable_sharding(self, shard_key: str = 'species') -> Dict[str, Any]:
+    def iter_penguins(self, fields: Optional[List[str]] = None, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        """All penguins in chunks of batch_size, streamed from one cursor"""
+        cursor = self.collection.find({}, self._projection(fields)).batch_size(batch_size)
+        while True:
+            chunk = list(islice(cursor, batch_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    @timed('mongodb')
+    def get_penguins_by_species(self, species: str, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get penguins by species, optionally only the given fields"""
+        return list(self.collection.find({'species': species}, self._projection(fields)))
+    
+    @timed('mongodb')
+    def get_penguins_since(self, after_id: Optional[str] = None,
+                           fields: Optional[List[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Penguins inserted after the given _id (all when None) and the newest _id seen.
+
+        ObjectIds grow with insertion time, so the newest _id is a watermark
+        to resume from; the range query walks the _id index.
+        """
+        query = {'_id': {'$gt': ObjectId(after_id)}} if after_id else {}
+        projection = {**self._projection(fields), '_id': 1}
+        penguins = list(self.collection.find(query, projection).sort('_id', 1))
+        newest = str(penguins[-1]['_id']) if penguins else after_id
+        for penguin in penguins:
+            del penguin['_id']
+        return penguins, newest
+    
+    @timed('mongodb')
+    def get_penguins_page(self, after: Optional[Tuple[int, str]] = None, limit: int = 100,
+                          species: Optional[str] = None) -> Tuple[List[Dict], Optional[Tuple[int, str]]]:
+        """One page ordered by (sampleNumber, species), starting after the given key.
+
+        sampleNumber restarts for every species, so species breaks ties.
+        Returns the page and the key to resume from (None on the last page).
+        """
+        query: Dict[str, Any] = {}
+        if species:
+            query['species'] = species
+        if after is not None:
+            number, name = after
+            query['$or'] = [
+                {'sampleNumber': {'$gt': number}},
+                {'sampleNumber': number, 'species': {'$gt': name}}
+            ]
+        cursor = self.collection.find(query, {'_id': 0}).sort([('sampleNumber', 1), ('species', 1)]).limit(limit)
+        penguins = list(cursor)
+        if len(penguins) < limit:
+            return penguins, None
+        return penguins, (penguins[-1]['sampleNumber'], penguins[-1]['species'])
+    
+    @timed('mongodb')
+    def get_dataset_fingerprint(self) -> str:
+        """Cheap identifier of the current dataset: document count and newest _id"""
+        count = self.collection.estimated_document_count()
+        newest = self.collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        return f"{count}-{newest['_id'] if newest else 'empty'}"
+    
+    NAMESPACE = 'penguins.penguins'
+    
+    @staticmethod
+    def normalize_shard_key(shard_key: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Turn 'species', 'species,sampleNumber', '_id:hashed' or a key document into a key document"""
+        if isinstance(shard_key, str):
+            spec = {}
+            for part in shard_key.split(','):
+                field, _, kind = part.strip().partition(':')
+                if field:
+                    spec[field] = 'hashed' if kind.strip() == 'hashed' else 1
+        else:
+            spec = dict(shard_key)
+        
+        if not spec:
+            raise ValueError("Shard key must contain at least one field")
+        for field, kind in spec.items():
+            if kind not in (1, 'hashed'):
+                raise ValueError(f"Invalid shard key direction for '{field}': {kind} (use 1 or 'hashed')")
+        if list(spec.values()).count('hashed') > 1:
+            raise ValueError("A shard key can contain at most one hashed field")
+        return spec
+    
+    def enable_sharding(self, shard_key: Union[str, Dict[str, Any]] = 'species',
+                        presplit_chunks: int = 0, balance: bool = False,
+                        reshard: bool = False) -> Dict[str, Any]:
         """Enable sharding on the collection with specified shard key"""
+        try:
+            key = self.normalize_shard_key(shard_key)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e), 'error': str(e)}
+        
         try:
             admin_db = self.client['admin']
             
@@ -55,19 +164,40 @@ class MongoDBService:
             logger.info("Sharding enabled on 'penguins' database")
             
             # Create shard key index if not exists
-            self.collection.create_index(shard_key)
-            logger.info(f"Shard key index created on '{shard_key}'")
+            self.collection.create_index(list(key.items()))
+            logger.info(f"Shard key index created on {key}")
             
-            # Shard the collection
-            admin_db.command('shardCollection', 'penguins.penguins', 
-                           key={shard_key: 1})
-            logger.info(f"Collection sharded with key '{shard_key}'")
+            current = self.client['config']['collections'].find_one({'_id': self.NAMESPACE})
+            if current and current.get('key') and dict(current['key']) != key:
+                if not reshard:
+                    return {
+                        'status': 'already_sharded',
+                        'message': f"Collection is already sharded on {dict(current['key'])}; pass reshard=true to change the key",
+                        'shard_key': dict(current['key'])
+                    }
+                # Online resharding (MongoDB 5.0+) copies the data to the new key layout
+                admin_db.command('reshardCollection', self.NAMESPACE, key=key)
+                logger.info(f"Collection resharded with key {key}")
+                action = 'resharded'
+            elif current:
+                action = 'already_sharded'
+            else:
+                # Shard the collection
+                admin_db.command('shardCollection', self.NAMESPACE, key=key)
+                logger.info(f"Collection sharded with key {key}")
+                action = 'sharded'
             
-            return {
-                'status': 'success',
-                'message': f'Sharding enabled with key: {shard_key}',
-                'shard_key': shard_key
+            result = {
+                'status': 'success' if action != 'already_sharded' else 'already_sharded',
+                'message': f'Sharding enabled with key: {key}',
+                'action': action,
+                'shard_key': key
             }
+            if presplit_chunks > 1:
+                result['presplit'] = self.presplit_chunks(key, presplit_chunks)
+            if balance:
+                result['balance'] = self.balance_chunks()
+            return result
         except Exception as e:
             if 'already sharded' in str(e):
                 logger.warning(f"Collection already sharded: {e}")
@@ -83,24 +213,196 @@ class MongoDBService:
                 'error': str(e)
             }
     
+    def _split_points(self, key: Dict[str, Any], num_chunks: int) -> List[Dict[str, Any]]:
+        """Compute chunk boundaries that cut the key space into num_chunks pieces"""
+        fields = list(key.keys())
+        
+        if key[fields[0]] == 'hashed':
+            # Hashed values are spread uniformly over the signed 64-bit range
+            step = 2 ** 64 // num_chunks
+            return [
+                {fields[0]: Int64(-2 ** 63 + i * step), **{f: MinKey() for f in fields[1:]}}
+                for i in range(1, num_chunks)
+            ]
+        
+        # Ranged keys: split on the ranged prefix at evenly spaced document ranks
+        prefix = []
+        for field in fields:
+            if key[field] == 'hashed':
+                break
+            prefix.append(field)
+        
+        total = self.collection.count_documents({})
+        points, seen = [], set()
+        for i in range(1, num_chunks):
+            doc = next(self.collection.find({}, {f: 1 for f in prefix})
+                       .sort([(f, 1) for f in prefix])
+                       .skip(i * total // num_chunks)
+                       .limit(1), None)
+            if doc is None or any(doc.get(f) is None for f in prefix):
+                continue
+            values = tuple(doc[f] for f in prefix)
+            if values in seen:
+                continue
+            seen.add(values)
+            points.append({**dict(zip(prefix, values)), **{f: MinKey() for f in fields[len(prefix):]}})
+        return points
+    
+    def presplit_chunks(self, key: Dict[str, Any], num_chunks: int) -> Dict[str, Any]:
+        """Split the collection into roughly num_chunks chunks before benchmarking"""
+        admin_db = self.client['admin']
+        points = self._split_points(key, num_chunks)
+        split, errors = 0, []
+        for middle in points:
+            try:
+                admin_db.command('split', self.NAMESPACE, middle=middle)
+                split += 1
+            except Exception as e:
+                # Points that already are chunk boundaries are rejected; that's fine
+                errors.append(str(e))
+        logger.info(f"Pre-split {split}/{len(points)} chunk boundaries")
+        return {'requested_chunks': num_chunks, 'split_points': len(points), 'splits_applied': split, 'errors': errors[:5]}
+    
+    def _chunk_filter(self) -> Optional[Dict[str, Any]]:
+        """Query matching this collection's chunks in config.chunks (by uuid on 5.0+, by ns before)"""
+        coll = self.client['config']['collections'].find_one({'_id': self.NAMESPACE})
+        if not coll:
+            return None
+        if 'uuid' in coll:
+            return {'$or': [{'uuid': coll['uuid']}, {'ns': self.NAMESPACE}]}
+        return {'ns': self.NAMESPACE}
+    
+    def balance_chunks(self) -> Dict[str, Any]:
+        """Spread chunks round-robin across shards so every shard owns part of the key space"""
+        admin_db = self.client['admin']
+        chunk_filter = self._chunk_filter()
+        if chunk_filter is None:
+            return {'moved': 0, 'message': 'Collection is not sharded'}
+        
+        shards = [shard['_id'] for shard in admin_db.command('listShards').get('shards', [])]
+        chunks = list(self.client['config']['chunks'].find(chunk_filter).sort('min', 1))
+        moved, errors = 0, []
+        for i, chunk in enumerate(chunks):
+            target = shards[i % len(shards)]
+            if chunk['shard'] == target:
+                continue
+            try:
+                admin_db.command('moveChunk', self.NAMESPACE, bounds=[chunk['min'], chunk['max']], to=target)
+                moved += 1
+            except Exception as e:
+                errors.append(str(e))
+        logger.info(f"Balanced chunks: moved {moved} of {len(chunks)} across {len(shards)} shards")
+        return {'shards': len(shards), 'chunks': len(chunks), 'moved': moved, 'errors': errors[:5]}
+    
+    def get_shard_distribution(self) -> Dict[str, Any]:
+        """Get per-shard document and chunk counts"""
+        try:
+            distribution: Dict[str, Dict[str, int]] = {}
+            for stats in self.collection.aggregate([{'$collStats': {'count': {}}}]):
+                shard = stats.get('shard', 'unsharded')
+                distribution.setdefault(shard, {'documents': 0, 'chunks': 0})
+                distribution[shard]['documents'] += stats.get('count', 0)
+            
+            chunk_filter = self._chunk_filter()
+            if chunk_filter is not None:
+                for row in self.client['config']['chunks'].aggregate([
+                    {'$match': chunk_filter},
+                    {'$group': {'_id': '$shard', 'chunks': {'$sum': 1}}}
+                ]):
+                    distribution.setdefault(row['_id'], {'documents': 0, 'chunks': 0})
+                    distribution[row['_id']]['chunks'] = row['chunks']
+            
+            return {
+                'shards': [{'shard': shard, **counts} for shard, counts in sorted(distribution.items())],
+                'total_chunks': sum(counts['chunks'] for counts in distribution.values())
+            }
+        except Exception as e:
+            logger.error(f"Error getting shard distribution: {e}")
+            return {'error': str(e)}
+    
+    def explain_query_routing(self, query_filter: Dict[str, Any]) -> Dict[str, Any]:
+        """Report whether a find is routed to a single shard or scattered to all of them"""
+        try:
+            explain = self.db.command('explain', {'find': 'penguins', 'filter': query_filter},
+                                      verbosity='queryPlanner')
+            winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+            stage = winning_plan.get('stage')
+            shards = [shard.get('shardName') for shard in winning_plan.get('shards', [])]
+            if not shards:
+                routing = 'unsharded'
+            elif stage == 'SINGLE_SHARD' or len(shards) == 1:
+                routing = 'targeted'
+            else:
+                routing = 'scatter_gather'
+            return {'routing': routing, 'stage': stage, 'shards': shards}
+        except Exception as e:
+            logger.error(f"Explain error: {e}")
+            return {'routing': 'unknown', 'error': str(e)}
+    
+    @staticmethod
+    def _plan_indexes(plan: Any) -> List[str]:
+        """Collect index names (or COLLSCAN) from anywhere in an explain plan tree"""
+        found = []
+        if isinstance(plan, dict):
+            if plan.get('stage') == 'COLLSCAN':
+                found.append('COLLSCAN')
+            if 'indexName' in plan:
+                found.append(plan['indexName'])
+            for value in plan.values():
+                found.extend(MongoDBService._plan_indexes(value))
+        elif isinstance(plan, list):
+            for item in plan:
+                found.extend(MongoDBService._plan_indexes(item))
+        return found
+    
+    def explain_find(self, query_filter: Dict[str, Any]) -> Dict[str, Any]:
+        """Server-side execution statistics for a find, via explain('executionStats')"""
+        try:
+            explain = self.db.command('explain', {'find': 'penguins', 'filter': query_filter, 'projection': {'_id': 0}},
+                                      verbosity='executionStats')
+            stats = explain.get('executionStats', {})
+            planner = explain.get('queryPlanner', {})
+            per_shard = [
+                {
+                    'shard': shard.get('shardName'),
+                    'execution_time_ms': shard.get('executionTimeMillis'),
+                    'docs_examined': shard.get('totalDocsExamined'),
+                    'keys_examined': shard.get('totalKeysExamined'),
+                    'returned': shard.get('nReturned')
+                }
+                for shard in stats.get('executionStages', {}).get('shards', [])
+            ]
+            return {
+                'execution_time_ms': stats.get('executionTimeMillis'),
+                'docs_examined': stats.get('totalDocsExamined'),
+                'keys_examined': stats.get('totalKeysExamined'),
+                'returned': stats.get('nReturned'),
+                'indexes_used': sorted(set(self._plan_indexes(planner.get('winningPlan', {})))),
+                'shards_touched': len(per_shard) if per_shard else 1,
+                'shards': per_shard
+            }
+        except Exception as e:
+            logger.error(f"Explain error: {e}")
+            return {'error': str(e)}
+    
     def get_sharding_status(self) -> Dict[str, Any]:
         """Get sharding status of the collection"""
         try:
-            admin_db = self.client['admin']
-            
             # Get collection sharding info
-            result = admin_db.command('collStats', 'penguins', count=True)
+            result = self.db.command('collStats', 'penguins')
             
             # Check if sharded
             config_db = self.client['config']
-            collections = config_db['collections'].find_one({'_id': 'penguins.penguins'})
+            collections = config_db['collections'].find_one({'_id': self.NAMESPACE})
             
             if collections:
                 return {
                     'is_sharded': True,
                     'shard_key': list(collections.get('key', {}).keys()),
+                    'shard_key_spec': dict(collections.get('key', {})),
                     'count': result.get('count', 0),
-                    'size': result.get('size', 0)
+                    'size': result.get('size', 0),
+                    'distribution': self.get_shard_distribution()
                 }
             else:
                 return {
@@ -112,6 +414,32 @@ class MongoDBService:
             logger.error(f"Error getting sharding status: {e}")
             return {'error': str(e)}
     
+    # Write concerns swept by the write benchmarks
+    WRITE_CONCERNS = {
+        'w:1': WriteConcern(w=1),
+        'w:majority': WriteConcern(w='majority'),
+        'journaled': WriteConcern(w=1, j=True)
+    }
+    
+    def scratch_collection(self, name: str, write_concern: str = 'w:1'):
+        """Throwaway collection handle using one of WRITE_CONCERNS"""
+        return self.db.get_collection(name, write_concern=self.WRITE_CONCERNS[write_concern])
+    
+    def drop_collection(self, name: str):
+        """Drop a (throwaway) collection"""
+        self.db.drop_collection(name)
+    
+    def clear_caches(self) -> Dict[str, str]:
+        """Clear the server caches that can be cleared without a restart"""
+        actions = {}
+        try:
+            self.db.command('planCacheClear', 'penguins')
+            actions['planCacheClear'] = 'ok'
+        except Exception as e:
+            actions['planCacheClear'] = f'error: {e}'
+        actions['wiredtiger_cache'] = 'not clearable without a restart'
+        return actions
+    
     def create_indexes(self) -> Dict[str, str]:
         """Create performance indexes for common queries"""
         try:
@@ -129,6 +457,10 @@ class MongoDBService:
             self.collection.create_index([('species', 1), ('island', 1)])
             indexes['species_island'] = 'created'
             
+            # Keyset pagination order
+            self.collection.create_index([('sampleNumber', 1), ('species', 1)])
+            indexes['sampleNumber_species'] = 'created'
+            
             logger.info(f"Created indexes: {indexes}")
             return indexes
         except Exception as e:
@@ -138,6 +470,20 @@ class MongoDBService:
 class CassandraService:
     """Cassandra connection and queries"""
     
+    # Explicit column lists so rows map back to logical field names
+    SELECT_ALL = f"SELECT {', '.join(physical_names('cassandra'))} FROM penguins"
+    SELECT_BY_SPECIES = f"{SELECT_ALL} WHERE species = %s"
+    
+    # Consistency levels swept by the write benchmarks
+    CONSISTENCY_LEVELS = {
+        'ONE': ConsistencyLevel.ONE,
+        'QUORUM': ConsistencyLevel.QUORUM,
+        'ALL': ConsistencyLevel.ALL
+    }
+    
+    # Column order used for inserts, as (cassandra column, document field)
+    INSERT_COLUMNS = [(field.cassandra, field.name) for field in FIELDS]
+    
     def __init__(self):
         self.cluster = None
         self.session = None
@@ -163,21 +509,140 @@ class CassandraService:
         if self.cluster:
             self.cluster.shutdown()
     
-    def get_all_penguins(self) -> List[Dict]:
-        """Get all penguins"""
-        rows = self.session.execute('SELECT * FROM penguins')
-        return [row._asdict() for row in rows]
+    @staticmethod
+    def _select(fields: Optional[List[str]] = None) -> Tuple[str, List[str]]:
+        """SELECT for logical field names and the names its columns map back to"""
+        names = resolve_projection(fields) or [field.name for field in FIELDS]
+        return f"SELECT {', '.join(physical_names('cassandra', names))} FROM penguins", names
+    
+    @timed('cassandra')
+    def get_all_penguins(self, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all penguins with logical field names, optionally only the given fields"""
+        query, names = self._select(fields)
+        rows = self.session.execute(query)
+        return [dict(zip(names, row)) for row in rows]
+    
+    def iter_penguins(self, fields: Optional[List[str]] = None, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        """All penguins in chunks of batch_size; the driver fetches one page per chunk"""
+        query, names = self._select(fields)
+        rows = self.session.execute(SimpleStatement(query, fetch_size=batch_size))
+        while True:
+            chunk = [dict(zip(names, row)) for row in islice(rows, batch_size)]
+            if not chunk:
+                return
+            yield chunk
+    
+    @timed('cassandra')
+    def get_penguins_by_species(self, species: str, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get penguins by species with logical field names, optionally only the given fields"""
+        query, names = self._select(fields)
+        rows = self.session.execute(f"{query} WHERE species = %s", [species])
+        return [dict(zip(names, row)) for row in rows]
+    
+    @timed('cassandra')
+    def get_penguins_page(self, paging_state: Optional[bytes] = None, limit: int = 100,
+                          species: Optional[str] = None) -> Tuple[List[Dict], Optional[bytes]]:
+        """One page using the driver's paging state, with document field names.
+
+        Pages follow partition order: by sample_number within a species, and
+        species in token order when no species is given.
+        """
+        if species:
+            statement = SimpleStatement(self.SELECT_BY_SPECIES, fetch_size=limit)
+            rows = self.session.execute(statement, [species], paging_state=paging_state)
+        else:
+            statement = SimpleStatement(self.SELECT_ALL, fetch_size=limit)
+            rows = self.session.execute(statement, paging_state=paging_state)
+        names = [field.name for field in FIELDS]
+        penguins = [dict(zip(names, row)) for row in rows.current_rows]
+        return penguins, rows.paging_state
+    
+    def trace_query(self, query: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Execute a query with tracing on and summarize coordinator and replica durations"""
+        try:
+            result = self.session.execute(query, params, trace=True)
+            rows = sum(1 for _ in result)
+            trace = result.get_query_trace(max_wait_sec=2.0)
+            replicas: Dict[str, float] = {}
+            for event in trace.events:
+                source = str(event.source)
+                elapsed_ms = event.source_elapsed.total_seconds() * 1000 if event.source_elapsed else 0.0
+                replicas[source] = max(replicas.get(source, 0.0), elapsed_ms)
+            return {
+                'coordinator': str(trace.coordinator),
+                'duration_ms': trace.duration.total_seconds() * 1000 if trace.duration else None,
+                'replica_durations_ms': replicas,
+                'events': len(trace.events),
+                'rows': rows
+            }
+        except Exception as e:
+            logger.error(f"Cassandra trace error: {e}")
+            return {'error': str(e)}
+
+    def clear_caches(self) -> Dict[str, str]:
+        """Invalidate key and row caches through nodetool when CASSANDRA_NODETOOL is configured"""
+        if not settings.CASSANDRA_NODETOOL:
+            return {'nodetool': 'skipped: CASSANDRA_NODETOOL not set'}
+        actions = {}
+        for command in ('invalidatekeycache', 'invalidaterowcache'):
+            try:
+                subprocess.run(shlex.split(settings.CASSANDRA_NODETOOL) + [command],
+                               check=True, capture_output=True, timeout=30)
+                actions[command] = 'ok'
+            except Exception as e:
+                actions[command] = f'error: {e}'
+        return actions
+    
+    def create_scratch_keyspace(self, keyspace: str) -> int:
+        """Create a throwaway keyspace with a penguins table; returns its replication factor"""
+        replication_factor = max(1, min(3, len(self.cluster.metadata.all_hosts())))
+        self.session.execute(f"""
+            CREATE KEYSPACE IF NOT EXISTS {keyspace}
+            WITH REPLICATION = {{'class': 'SimpleStrategy', 'replication_factor': {replication_factor}}}
+        """)
+        self.session.execute(f"""
+            CREATE TABLE IF NOT EXISTS {keyspace}.penguins (
+                {', '.join(f'{field.cassandra} {field.cassandra_type}' for field in FIELDS)},
+                PRIMARY KEY ((species), sample_number)
+            )
+        """)
+        self.cluster.control_connection.wait_for_schema_agreement()
+        return replication_factor
+    
+    def prepare_scratch_statements(self, keyspace: str, consistency: str = 'ONE') -> Dict[str, Any]:
+        """Prepared insert/upsert/delete statements for a scratch keyspace at a consistency level"""
+        columns = ', '.join(column for column, _ in self.INSERT_COLUMNS)
+        placeholders = ', '.join('?' for _ in self.INSERT_COLUMNS)
+        statements = {
+            'insert': self.session.prepare(f"INSERT INTO {keyspace}.penguins ({columns}) VALUES ({placeholders})"),
+            'upsert': self.session.prepare(
+                f"UPDATE {keyspace}.penguins SET body_mass_g = ? WHERE species = ? AND sample_number = ?"),
+            'delete': self.session.prepare(
+                f"DELETE FROM {keyspace}.penguins WHERE species = ? AND sample_number = ?")
+        }
+        for statement in statements.values():
+            statement.consistency_level = self.CONSISTENCY_LEVELS[consistency]
+        return statements
+    
+    def row_values(self, penguin: Dict[str, Any]) -> tuple:
+        """Document -> values in INSERT_COLUMNS order, coerced to the column types"""
+        return tuple(cassandra_value(FIELDS_BY_NAME[field], penguin.get(field)) for _, field in self.INSERT_COLUMNS)
+    
+    def execute_concurrent(self, statement, params_list: List[tuple], concurrency: int = 50):
+        """Execute one prepared statement for many parameter sets with bounded concurrency"""
+        return execute_concurrent_with_args(self.session, statement, params_list,
+                                            concurrency=concurrency, raise_on_first_error=True)
     
-    def get_penguins_by_species(self, species: str) -> List[Dict]:
-        """Get penguins by species"""
-        rows = self.session.execute('SELECT * FROM penguins WHERE species = %s', [species])
-        return [row._asdict() for row in rows]
+    def drop_keyspace(self, keyspace: str):
+        """Drop a (throwaway) keyspace"""
+        self.session.execute(f"DROP KEYSPACE IF EXISTS {keyspace}")
 
 class RedisService:
     """Redis connection and queries"""
     
     def __init__(self):
         self.redis = None
+        self.binary = None  # same server, raw bytes (binary payloads such as dataset snapshots)
     
     def connect(self):
         """Connect to Redis"""
@@ -189,6 +654,11 @@ class RedisService:
                 socket_connect_timeout=5
             )
             self.redis.ping()
+            self.binary = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                socket_connect_timeout=5
+            )
             logger.info("Connected to Redis")
         except Exception as e:
             logger.error(f"Redis connection error: {e}")
@@ -198,27 +668,222 @@ class RedisService:
         """Disconnect from Redis"""
         if self.redis:
             self.redis.close()
+        if self.binary:
+            self.binary.close()
+    
+    SAMPLE_INDEX = 'penguins:by_sample'  # sorted set of penguin keys scored by sampleNumber
+    SAMPLE_INDEX_VERSION = 'penguins:by_sample:version'  # dataset version the index was built for
+    
+    @staticmethod
+    def decode_penguin(penguin_data: Dict[str, str]) -> Dict[str, Any]:
+        """Convert JSON strings back to Python objects"""
+        penguin = {}
+        for k, v in penguin_data.items():
+            try:
+                penguin[k] = json.loads(v)
+            except:
+                penguin[k] = v
+        return penguin
     
-    def get_all_penguins(self) -> List[Dict]:
-        """Get all penguins from Redis"""
+    @timed('redis')
+    def get_all_penguins(self, fields: Optional[List[str]] = None, batch_size: int = 500) -> List[Dict]:
+        """Get all penguins from Redis, optionally only the given fields (HMGET)"""
+        names = resolve_projection(fields)
+        if names is None:
+            return [self.decode_penguin(self.redis.hgetall(key)) for key in self.redis.scan_iter('penguin:*')]
+        
+        physical = physical_names('redis', names)
         penguins = []
-        for key in self.redis.scan_iter('penguin:*'):
-            penguin_data = self.redis.hgetall(key)
-            # Convert JSON strings back to Python objects
-            penguin = {}
-            for k, v in penguin_data.items():
-                try:
-                    penguin[k] = json.loads(v)
-                except:
-                    penguin[k] = v
-            penguins.append(penguin)
+        keys = []
+        for key in self.redis.scan_iter('penguin:*', count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                penguins.extend(self._hmget_penguins(keys, names, physical))
+                keys = []
+        if keys:
+            penguins.extend(self._hmget_penguins(keys, names, physical))
         return penguins
+    
+    def iter_penguins(self, fields: Optional[List[str]] = None, batch_size: int = 1000) -> Iterator[List[Dict]]:
+        """All penguins in chunks of batch_size: SCAN a batch of keys, then one pipelined read"""
+        names = resolve_projection(fields)
+        physical = physical_names('redis', names) if names is not None else None
+        keys = []
+        for key in self.redis.scan_iter('penguin:*', count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                yield self._fetch_penguins(keys) if names is None else self._hmget_penguins(keys, names, physical)
+                keys = []
+        if keys:
+            yield self._fetch_penguins(keys) if names is None else self._hmget_penguins(keys, names, physical)
+    
+    def _hmget_penguins(self, keys: List[str], names: List[str], physical: List[str]) -> List[Dict]:
+        """HMGET the same fields from several hashes in one round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, physical)
+        return [
+            self.decode_penguin({name: value for name, value in zip(names, values) if value is not None})
+            for values in pipe.execute()
+        ]
+    
+    def ensure_sample_index(self, version: Optional[str] = None, batch_size: int = 500) -> int:
+        """Build the sampleNumber sorted set from the penguin hashes if it is missing or stale.
+
+        With a dataset version, an index built for another version is rebuilt,
+        which picks up penguins written by the loader or outside the API. The
+        new index is built under a temporary key and renamed into place, so
+        readers never page through a half-built one.
+        """
+        if self.redis.exists(self.SAMPLE_INDEX) and (
+                version is None or self.redis.get(self.SAMPLE_INDEX_VERSION) == version):
+            return self.redis.zcard(self.SAMPLE_INDEX)
+        building = f"{self.SAMPLE_INDEX}:building:{uuid.uuid4().hex}"
+        scores = {}
+        for key in self.redis.scan_iter('penguin:*', count=batch_size):
+            number = self.redis.hget(key, 'sampleNumber')
+            if number not in (None, 'null'):
+                scores[key] = float(json.loads(number))
+            if len(scores) >= batch_size:
+                self.redis.zadd(building, scores)
+                scores = {}
+        if scores:
+            self.redis.zadd(building, scores)
+        pipe = self.redis.pipeline()
+        if self.redis.exists(building):
+            pipe.rename(building, self.SAMPLE_INDEX)
+        else:
+            pipe.delete(self.SAMPLE_INDEX)
+        if version is not None:
+            pipe.set(self.SAMPLE_INDEX_VERSION, version)
+        pipe.execute()
+        return self.redis.zcard(self.SAMPLE_INDEX)
+    
+    def _fetch_penguins(self, keys: List[str]) -> List[Dict]:
+        """HGETALL a list of keys in one round trip, skipping missing hashes"""
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return [self.decode_penguin(data) for data in pipe.execute() if data]
+    
+    @timed('redis')
+    def get_penguins_page(self, after: Optional[Tuple[float, str]] = None, limit: int = 100,
+                          version: Optional[str] = None) -> Tuple[List[Dict], Optional[Tuple[float, str]]]:
+        """One page from the sampleNumber sorted set (for the given dataset version), starting after (score, key)"""
+        self.ensure_sample_index(version)
+        if after is None:
+            entries = self.redis.zrangebyscore(self.SAMPLE_INDEX, '-inf', '+inf', start=0, num=limit, withscores=True)
+        else:
+            score, member = after
+            # Members sharing the last score are ordered by name; resume after the last one seen
+            tied = self.redis.zrangebyscore(self.SAMPLE_INDEX, score, score, withscores=True)
+            entries = [(key, value) for key, value in tied if key > member][:limit]
+            if len(entries) < limit:
+                entries += self.redis.zrangebyscore(
+                    self.SAMPLE_INDEX, f'({score}', '+inf', start=0, num=limit - len(entries), withscores=True
+                )
+        penguins = self._fetch_penguins([key for key, _ in entries])
+        if len(entries) < limit:
+            return penguins, None
+        last_key, last_score = entries[-1]
+        return penguins, (last_score, last_key)
+    
+    @timed('redis')
+    def get_penguins_by_species_page(self, species: str, cursor: int = 0,
+                                     limit: int = 100) -> Tuple[List[Dict], Optional[int]]:
+        """One SSCAN step over the species set (unordered, roughly limit members per step)"""
+        cursor, members = self.redis.sscan(f"species:{species}", cursor=cursor, count=limit)
+        penguins = self._fetch_penguins([f"penguin:{member}" for member in members])
+        return penguins, cursor or None
+    
+    def clear_caches(self) -> Dict[str, str]:
+        """Redis keeps no separate read cache; cold runs only get a fresh connection"""
+        return {'server_cache': 'none (in-memory store)'}
+    
+    @staticmethod
+    def encode_penguin(penguin: Dict[str, Any]) -> Dict[str, str]:
+        """Hash mapping for a penguin, JSON-encoding values like the init script"""
+        return {k: json.dumps(v) if v is not None else 'null' for k, v in penguin.items() if k != '_id'}
+    
+    def delete_prefix(self, prefix: str, batch_size: int = 500) -> int:
+        """Delete every key starting with prefix"""
+        deleted = 0
+        batch = []
+        for key in self.redis.scan_iter(f'{prefix}*', count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += self.redis.delete(*batch)
+                batch = []
+        if batch:
+            deleted += self.redis.delete(*batch)
+        return deleted
+    
+    def start_profiling(self) -> Dict[str, Any]:
+        """Log every command to SLOWLOG and reset latency data; returns settings to restore"""
+        previous = {}
+        for setting in ('slowlog-log-slower-than', 'slowlog-max-len', 'latency-monitor-threshold'):
+            previous.update(self.redis.config_get(setting))
+        self.redis.config_set('slowlog-log-slower-than', 0)
+        self.redis.config_set('slowlog-max-len', 100000)
+        self.redis.config_set('latency-monitor-threshold', 1)
+        self.redis.slowlog_reset()
+        self.redis.execute_command('LATENCY', 'RESET')
+        return previous
+    
+    def stop_profiling(self, previous: Dict[str, Any]) -> Dict[str, Any]:
+        """Summarize SLOWLOG entries per command, read LATENCY LATEST and restore settings"""
+        try:
+            entries = self.redis.slowlog_get(100000)
+            latest = self.redis.execute_command('LATENCY', 'LATEST')
+        finally:
+            for setting, value in previous.items():
+                self.redis.config_set(setting, value)
+        
+        commands: Dict[str, Dict[str, float]] = {}
+        for entry in entries:
+            command = entry.get('command', '')
+            if isinstance(command, bytes):
+                command = command.decode(errors='replace')
+            name = command.split(' ', 1)[0].upper()
+            if name in ('SLOWLOG', 'CONFIG', 'LATENCY'):
+                continue
+            summary = commands.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            duration_ms = entry.get('duration', 0) / 1000
+            summary['count'] += 1
+            summary['total_ms'] += duration_ms
+            summary['max_ms'] = max(summary['max_ms'], duration_ms)
+        for summary in commands.values():
+            summary['avg_ms'] = summary['total_ms'] / summary['count']
+        
+        return {
+            'commands': commands,
+            'server_time_ms': sum(summary['total_ms'] for summary in commands.values()),
+            'latency_events': [
+                {'event': event, 'timestamp': ts, 'latest_ms': latest_ms, 'max_ms': max_ms}
+                for event, ts, latest_ms, max_ms, *_ in (latest or [])
+            ]
+        }
 
 # Global service instances
 mongo_service = MongoDBService()
 cassandra_service = CassandraService()
 redis_service = RedisService()
 
+def get_penguins(store: str = 'mongodb', fields: Optional[List[str]] = None) -> List[Dict]:
+    """All penguins from the given store with logical field names, optionally projected"""
+    services = {'mongodb': mongo_service, 'cassandra': cassandra_service, 'redis': redis_service}
+    if store not in services:
+        raise ValueError(f"Unknown store: {store}. Choose from {', '.join(STORES)}")
+    return services[store].get_all_penguins(fields)
+
+def iter_penguins(store: str = 'mongodb', fields: Optional[List[str]] = None,
+                  batch_size: int = 1000) -> Iterator[List[Dict]]:
+    """All penguins from the given store in chunks, without holding the collection in memory"""
+    services = {'mongodb': mongo_service, 'cassandra': cassandra_service, 'redis': redis_service}
+    if store not in services:
+        raise ValueError(f"Unknown store: {store}. Choose from {', '.join(STORES)}")
+    return services[store].iter_penguins(fields, batch_size)
+
 def init_services():
     """Initialize all database services"""
     mongo_service.connect()
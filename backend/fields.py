@@ -0,0 +1,98 @@
+"""
+Schema registry: logical penguin fields and their physical names and types in each store
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+STORES = ('mongodb', 'cassandra', 'redis')
+STORE_PATTERN = f"^({'|'.join(STORES)})$"  # query parameter validation
+
+
+class FieldSpec(NamedTuple):
+    """One logical field and how each store names and types it"""
+    name: str                  # logical name (MongoDB document field, Redis hash field)
+    cassandra: str             # Cassandra column
+    cassandra_type: str        # CQL type
+    dtype: str                 # in-memory type: float32, int32, category or string
+    aliases: Tuple[str, ...] = ()  # other names accepted by the API
+
+
+FIELDS: List[FieldSpec] = [
+    FieldSpec('studyName', 'study_name', 'TEXT', 'category'),
+    FieldSpec('sampleNumber', 'sample_number', 'INT', 'int32'),
+    FieldSpec('species', 'species', 'TEXT', 'category'),
+    FieldSpec('region', 'region', 'TEXT', 'category'),
+    FieldSpec('island', 'island', 'TEXT', 'category'),
+    FieldSpec('stage', 'stage', 'TEXT', 'category'),
+    FieldSpec('individualId', 'individual_id', 'TEXT', 'string'),
+    FieldSpec('clutchCompletion', 'clutch_completion', 'TEXT', 'category'),
+    FieldSpec('dateEgg', 'date_egg', 'TEXT', 'string'),
+    FieldSpec('culmenLength', 'culmen_length_mm', 'DOUBLE', 'float32', ('bill_length_mm',)),
+    FieldSpec('culmenDepth', 'culmen_depth_mm', 'DOUBLE', 'float32', ('bill_depth_mm',)),
+    FieldSpec('flipperLength', 'flipper_length_mm', 'INT', 'float32'),
+    FieldSpec('bodyMass', 'body_mass_g', 'INT', 'float32'),
+    FieldSpec('sex', 'sex', 'TEXT', 'category'),
+    FieldSpec('delta15N', 'delta_15_n', 'DOUBLE', 'float32'),
+    FieldSpec('delta13C', 'delta_13_c', 'DOUBLE', 'float32'),
+    FieldSpec('comments', 'comments', 'TEXT', 'string'),
+]
+
+FIELDS_BY_NAME: Dict[str, FieldSpec] = {field.name: field for field in FIELDS}
+
+# Measurement fields used throughout the analyses
+MEASUREMENT_FIELDS = ['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass']
+
+# Every accepted spelling -> logical name
+_LOOKUP: Dict[str, str] = {
+    alias: field.name
+    for field in FIELDS
+    for alias in (field.name, field.cassandra) + field.aliases
+}
+
+
+def resolve_field(name: str) -> str:
+    """Logical name for an API alias or a physical name (unknown names pass through)"""
+    return _LOOKUP.get(name, name)
+
+
+def get_field(name: str) -> FieldSpec:
+    """Field spec for any accepted spelling; raises ValueError if unknown"""
+    field = FIELDS_BY_NAME.get(resolve_field(name))
+    if field is None:
+        raise ValueError(f"Unknown field: {name}")
+    return field
+
+
+def fields_of_type(dtype: str) -> List[str]:
+    """Logical names of the fields with the given in-memory type"""
+    return [field.name for field in FIELDS if field.dtype == dtype]
+
+
+def resolve_projection(names: Optional[List[str]]) -> Optional[List[str]]:
+    """Validated, de-duplicated logical names for a projection (None means all fields)"""
+    if not names:
+        return None
+    resolved = []
+    for name in names:
+        field = get_field(name).name
+        if field not in resolved:
+            resolved.append(field)
+    return resolved
+
+
+def physical_names(store: str, names: Optional[List[str]] = None) -> List[str]:
+    """Physical field/column names in a store for logical names (all fields by default)"""
+    specs = FIELDS if names is None else [FIELDS_BY_NAME[name] for name in names]
+    if store == 'cassandra':
+        return [field.cassandra for field in specs]
+    return [field.name for field in specs]
+
+
+def cassandra_value(field: FieldSpec, value: Any) -> Any:
+    """Coerce a document value to the field's CQL type"""
+    if value is None:
+        return None
+    if field.cassandra_type == 'INT':
+        return int(value)
+    if field.cassandra_type == 'DOUBLE':
+        return float(value)
+    return value
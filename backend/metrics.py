@@ -0,0 +1,113 @@
+"""
+Prometheus metrics: request latency, instrumented calls and cache outcomes
+"""
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Sub-millisecond buckets for cached Redis reads up to multi-second model training
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+CALL_LATENCY = Histogram(
+    'penguins_call_duration_seconds', 'Latency of instrumented calls (database, dataframe, analysis, model)',
+    ['component', 'operation'], buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'penguins_response_cache_requests_total', 'Response cache lookups by outcome',
+    ['route', 'outcome']
+)
+
+UNMATCHED_ROUTE = 'unmatched'  # 404s are grouped so arbitrary paths cannot create series
+
+
+def timed(component: str, operation: Optional[str] = None):
+    """Record the latency of every call to the decorated function.
+
+    operation defaults to the function's qualified name (e.g.
+    MongoDBService.get_all_penguins). The labelled histogram is resolved once
+    at decoration time, so a call only pays for two clock reads and an observe.
+    """
+    def decorator(func: Callable) -> Callable:
+        histogram = CALL_LATENCY.labels(component, operation or func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def timer(component: str, operation: str):
+    """Record the latency of a block whose operation is only known at run time"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        CALL_LATENCY.labels(component, operation).observe(time.perf_counter() - start)
+
+
+def count_cache(route: str, outcome: str):
+    """Count one response cache outcome (local_hits, redis_hits, coalesced, misses, not_modified)"""
+    CACHE_REQUESTS.labels(route, outcome).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing request latency per route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _route_template(scope) -> str:
+        """Request path with matched path parameters put back as {name} placeholders"""
+        if scope.get('endpoint') is None:
+            return UNMATCHED_ROUTE
+        params = {str(value): f"{{{name}}}" for name, value in scope.get('path_params', {}).items()}
+        if not params:
+            return scope['path']
+        return '/'.join(params.get(segment, segment) for segment in scope['path'].split('/'))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(scope['method'], self._route_template(scope), str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+def render_latest() -> bytes:
+    """Exposition text for this process, or for all workers in multiprocess mode"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
@@ -0,0 +1,44 @@
+"""
+Fast JSON serialization for API responses
+"""
+from typing import Any
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# NumPy arrays and scalars are written natively; NaN/inf become null
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson does not handle natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        # Object/non-contiguous arrays are not covered by OPT_SERIALIZE_NUMPY
+        return obj.tolist()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes with orjson"""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, including NumPy arrays and scalars.
+
+    Returning an instance directly from an endpoint also skips FastAPI's
+    jsonable_encoder pass, which dominates on large payloads.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,27 @@
+"""
+Response cache statistics and invalidation
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from services.binning import sorted_columns
+from services.cache import response_cache
+from services.shared_state import shared_state
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/stats")
+async def get_cache_stats():
+    """Get hit/miss counters per cached route, plus this worker's shared state"""
+    return {**response_cache.stats(), "worker": shared_state.stats(), "sorted_columns": sorted_columns.stats()}
+
+@router.post("/invalidate")
+async def invalidate_cache():
+    """Bump the dataset version so cached responses are recomputed"""
+    try:
+        version = await run_in_threadpool(response_cache.invalidate)
+        return {"status": "success", "dataset_version": version}
+    except Exception as e:
+        logger.error(f"Error in /invalidate: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,157 @@
+"""
+Bulk data export in columnar binary formats
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import logging
+
+from services.cache import response_cache
+from services.dataset import memory_usage
+from services.shared_state import shared_state
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1024  # Rows per Arrow record batch / Parquet row group
+
+EXPORT_FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parse_list(value: Optional[str]) -> List[str]:
+    """Split a comma-separated query parameter"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _snapshot() -> pd.DataFrame:
+    """Dataset snapshot for the current version, shared by every worker.
+
+    A new version replaces the frame rather than mutating it, so the export
+    keeps reading a consistent snapshot even if the data changes meanwhile.
+    """
+    return shared_state.dataset_snapshot()
+
+
+def _select(df: pd.DataFrame, columns: List[str], species: List[str], islands: List[str]) -> pd.DataFrame:
+    """Apply the species/island filters and the column projection"""
+    unknown = [col for col in columns if col not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(df.columns)}")
+
+    mask = pd.Series(True, index=df.index)
+    if species:
+        mask &= df['species'].isin(species)
+    if islands:
+        mask &= df['island'].isin(islands)
+    return df.loc[mask, columns or list(df.columns)]
+
+
+def _record_batches(df: pd.DataFrame, schema: pa.Schema, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Convert the frame to Arrow one slice at a time"""
+    for start in range(0, len(df), batch_size):
+        yield pa.RecordBatch.from_pandas(df.iloc[start:start + batch_size], schema=schema, preserve_index=False)
+
+
+def _stream_export(df: pd.DataFrame, export_format: str, batch_size: int) -> Iterator[bytes]:
+    """Encode the frame batch by batch, yielding the bytes produced so far"""
+    # Typed columns map straight to Arrow: float32, int32 and dictionary-encoded categoricals
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = _ChunkSink()
+    if export_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    try:
+        for batch in _record_batches(df, schema, batch_size):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+@router.get("/info")
+async def get_dataset_info():
+    """Columns, types and memory footprint of the dataset snapshot"""
+    try:
+        df = await run_in_threadpool(_snapshot)
+        return {
+            "columns": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            "memory": memory_usage(df)
+        }
+    except Exception as e:
+        logger.error(f"Error in /info: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export")
+async def export_dataset(
+    format: str = Query("arrow", pattern="^(arrow|parquet)$", description="Arrow IPC stream or Parquet"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to include (default: all)"),
+    species: Optional[str] = Query(None, description="Comma-separated species filter"),
+    island: Optional[str] = Query(None, description="Comma-separated island filter"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=100000, description="Rows per record batch / row group")
+):
+    """Stream the current dataset snapshot as Arrow IPC or Parquet"""
+    try:
+        df = await run_in_threadpool(_snapshot)
+        selected = _select(df, _parse_list(columns), _parse_list(species), _parse_list(island))
+        version = await run_in_threadpool(response_cache.dataset_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /export: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        _stream_export(selected, format, batch_size),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="penguins.{extension}"',
+            "X-Dataset-Version": version,
+            "X-Row-Count": str(len(selected))
+        }
+    )
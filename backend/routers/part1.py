@@ -1,53 +1,92 @@
 """
 Part 1: Descriptive Statistical Analysis
 """
-from fastapi import APIRouter, HTTPException
-from database import mongo_service
+from fastapi import APIRouter, HTTPException, Query, Request
+from functools import partial
+from config import settings
+from database import get_penguins, iter_penguins
+from fields import STORE_PATTERN
 from services.analysis import analysis_service
+from services.cache import response_cache
 import logging
+from typing import Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+STORE_QUERY = Query("mongodb", pattern=STORE_PATTERN, description="Store to read the data from")
+GROUP_BY_QUERY = Query(None, description="Also compute the result per group of this categorical field (species, island, sex, ...)")
+STREAMING_QUERY = Query(False, description="Compute from the store cursor in chunks instead of an in-memory frame "
+                                          "(bounded memory; quantiles are approximate beyond a few hundred rows)")
+
+def _load_summary(store: str = "mongodb", group_by: Optional[str] = None, streaming: bool = False):
+    """Fetch penguins from a store and compute the Part 1 summary"""
+    if streaming:
+        if group_by:
+            raise ValueError("group_by is not supported with streaming")
+        summary = analysis_service.run_streaming(
+            'stream_part1_summary', partial(iter_penguins, store, batch_size=settings.STREAM_BATCH_SIZE)
+        )
+        if summary['total_penguins'] == 0:
+            raise HTTPException(status_code=404, detail="No penguin data found")
+        return summary
+    
+    def fetch(fields):
+        # Fetch the declared fields from the chosen store
+        penguins = get_penguins(store, fields)
+        if not penguins:
+            raise HTTPException(status_code=404, detail="No penguin data found")
+        return penguins
+    
+    # Get summary
+    return analysis_service.run_projected('get_part1_summary', fetch, group_by)
+
 @router.get("/summary")
-async def get_summary():
+async def get_summary(request: Request, store: str = STORE_QUERY, group_by: Optional[str] = GROUP_BY_QUERY,
+                      streaming: bool = STREAMING_QUERY):
     """Get descriptive statistics summary"""
     try:
-        # Fetch data from MongoDB
-        penguins = mongo_service.get_all_penguins()
-        if not penguins:
-            raise HTTPException(status_code=404, detail="No penguin data found")
-        
-        # Load data into analysis service
-        analysis_service.load_data(penguins)
-        
-        # Get summary
-        summary = analysis_service.get_part1_summary()
-        return summary
+        return await response_cache.respond(request, "part1.summary", lambda: _load_summary(store, group_by, streaming))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/numeric-stats")
-async def get_numeric_stats():
+async def get_numeric_stats(request: Request, store: str = STORE_QUERY, group_by: Optional[str] = GROUP_BY_QUERY,
+                            streaming: bool = STREAMING_QUERY):
     """Get statistics for numeric variables"""
+    def compute():
+        summary = _load_summary(store, group_by, streaming)
+        result = {"numeric_stats": summary["numeric_stats"]}
+        if group_by:
+            result["group_by"] = group_by
+            result["groups"] = {label: group["numeric_stats"] for label, group in summary["groups"].items()}
+        return result
+    
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        summary = analysis_service.get_part1_summary()
-        return {"numeric_stats": summary["numeric_stats"]}
+        return await response_cache.respond(request, "part1.numeric-stats", compute)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /numeric-stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/species")
-async def get_species_distribution():
+async def get_species_distribution(request: Request, store: str = STORE_QUERY):
     """Get species distribution"""
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        summary = analysis_service.get_part1_summary()
-        return {"species_counts": summary["species_counts"]}
+        return await response_cache.respond(
+            request, "part1.species",
+            lambda: {"species_counts": _load_summary(store)["species_counts"]}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in /species: {e}")
         raise HTTPException(status_code=500, detail=str(e))
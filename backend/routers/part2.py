@@ -1,23 +1,64 @@
 """
 Part 2: Data Visualization
 """
-from fastapi import APIRouter, HTTPException, Query
-from database import mongo_service
+from fastapi import APIRouter, HTTPException, Query, Request
+from functools import partial
+from config import settings
+from database import get_penguins, iter_penguins
+from fields import STORE_PATTERN
+from metrics import timer
 from services.analysis import analysis_service
+from services.binning import sorted_columns
+from services.downsampling import SCATTER_MODES
+from services.shared_state import shared_state
+from services.cache import response_cache
 import logging
+from typing import Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+STORE_QUERY = Query("mongodb", pattern=STORE_PATTERN, description="Store to read the data from")
+GROUP_BY_QUERY = Query(None, description="Also compute the result per group of this categorical field (species, island, sex, ...)")
+SCATTER_MODES_PATTERN = f"^({'|'.join(SCATTER_MODES)})$"
+STREAMING_QUERY = Query(False, description="Compute from the store cursor in chunks instead of an in-memory frame "
+                                          "(bounded memory; quantiles are approximate beyond a few hundred rows)")
+
+def _resolutions(value: Optional[str]):
+    """Extra histogram bin counts from a comma-separated list"""
+    if not value:
+        return None
+    try:
+        return [int(item.strip()) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError("resolutions must be comma-separated bin counts, e.g. 5,20,40")
+
+def _stream(store: str, group_by: Optional[str]):
+    """Chunked reader of a store, for analyses that do not group"""
+    if group_by:
+        raise ValueError("group_by is not supported with streaming")
+    return partial(iter_penguins, store, batch_size=settings.STREAM_BATCH_SIZE)
+
 @router.get("/distribution")
-async def get_distribution(variable: str = Query("body_mass_g")):
+async def get_distribution(request: Request, variable: str = Query("body_mass_g"), store: str = STORE_QUERY,
+                           group_by: Optional[str] = GROUP_BY_QUERY, streaming: bool = STREAMING_QUERY,
+                           bins: str = Query("10", description="Number of bins, or fd (Freedman-Diaconis), sturges or auto"),
+                           resolutions: Optional[str] = Query(None, description="Extra bin counts for multi-resolution histograms, e.g. 5,20,40")):
     """Get distribution data for a variable"""
+    def compute():
+        if streaming:
+            if resolutions:
+                raise ValueError("resolutions is not supported with streaming")
+            return analysis_service.run_streaming('stream_distribution_data', _stream(store, group_by), variable, bins)
+        # Sorted values are kept per dataset version; each bin choice is then a lookup
+        column = sorted_columns.get(
+            (store, variable, group_by), response_cache.dataset_version(),
+            lambda: analysis_service.run_projected('sorted_column', partial(get_penguins, store), variable, group_by)
+        )
+        return analysis_service.distribution_from_sorted(variable, column, bins, _resolutions(resolutions), group_by)
+    
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
-        distribution = analysis_service.get_distribution_data(variable)
-        return distribution
+        return await response_cache.respond(request, "part2.distribution", compute)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -25,27 +66,54 @@ async def get_distribution(variable: str = Query("body_mass_g")):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/correlation")
-async def get_correlation():
+async def get_correlation(request: Request, store: str = STORE_QUERY, group_by: Optional[str] = GROUP_BY_QUERY,
+                          streaming: bool = STREAMING_QUERY):
     """Get correlation matrix"""
+    def compute():
+        if streaming:
+            return analysis_service.run_streaming('stream_correlation_matrix', _stream(store, group_by))
+        return analysis_service.run_projected('get_correlation_matrix', partial(get_penguins, store), group_by)
+    
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
-        correlation = analysis_service.get_correlation_matrix()
-        return correlation
+        return await response_cache.respond(request, "part2.correlation", compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /correlation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/scatter")
-async def get_scatter_data():
-    """Get scatter plot data for relationship analysis"""
+async def get_scatter_data(
+    request: Request,
+    store: str = STORE_QUERY,
+    mode: str = Query("full", pattern=SCATTER_MODES_PATTERN,
+                      description="full, uniform or stratified sampling, or grid / hexbin aggregation"),
+    plot: Optional[str] = Query(None, pattern="^(bill|flipper)$", description="Only this plot (required with bounds)"),
+    max_points: int = Query(2000, ge=1, le=100000, description="Points per plot for uniform and stratified"),
+    width: int = Query(500, ge=1, le=8192, description="Plot width in pixels for grid / hexbin"),
+    height: int = Query(400, ge=1, le=8192, description="Plot height in pixels for grid / hexbin"),
+    bin_size: float = Query(8.0, gt=0, le=512, description="Cell size (hexagon radius) in pixels"),
+    xmin: Optional[float] = Query(None), xmax: Optional[float] = Query(None),
+    ymin: Optional[float] = Query(None), ymax: Optional[float] = Query(None),
+    seed: int = Query(0, description="Sampling seed (the same seed returns the same sample)")
+):
+    """Get scatter plot data for relationship analysis, optionally reduced to screen resolution"""
+    options = dict(
+        mode=mode, plot=plot, max_points=max_points, width=width, height=height, bin_size=bin_size,
+        bounds={'xmin': xmin, 'xmax': xmax, 'ymin': ymin, 'ymax': ymax}, seed=seed
+    )
+    
+    def compute():
+        if store == "mongodb":
+            # Reduce the worker's cached dataset instead of re-reading the collection
+            with timer('analysis', 'get_scatter_data'):
+                return analysis_service.get_scatter_data(**options, df=shared_state.dataset_snapshot())
+        return analysis_service.run_projected('get_scatter_data', partial(get_penguins, store), **options)
+    
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
-        scatter = analysis_service.get_scatter_data()
-        return scatter
+        return await response_cache.respond(request, "part2.scatter", compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /scatter: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,12 +1,16 @@
 """
 Part 3: Regression Analysis
 """
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
-from database import mongo_service
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from functools import partial
+from database import get_penguins
+from fields import STORE_PATTERN
 from services.analysis import analysis_service
+from services.cache import response_cache
 import logging
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,30 +19,61 @@ class RegressionRequest(BaseModel):
     """Request model for multiple regression"""
     predictors: List[str]
     target: str = "body_mass_g"
+    store: str = Field("mongodb", pattern=STORE_PATTERN)
+    group_by: Optional[str] = None
+
+STORE_QUERY = Query("mongodb", pattern=STORE_PATTERN, description="Store to read the data from")
+GROUP_BY_QUERY = Query(None, description="Also compute the result per group of this categorical field (species, island, sex, ...)")
 
 @router.get("/simple")
-async def simple_regression(predictor: str = Query("flipper_length_mm")):
+async def simple_regression(request: Request, predictor: str = Query("flipper_length_mm"), store: str = STORE_QUERY,
+                            group_by: Optional[str] = GROUP_BY_QUERY):
     """Perform simple linear regression"""
+    def compute():
+        return analysis_service.run_regression(
+            'simple_regression', store, partial(get_penguins, store), predictor, group_by=group_by
+        )
+    
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
-        result = analysis_service.simple_regression(predictor)
-        return result
+        return await response_cache.respond(request, "part3.simple", compute)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /simple: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/subsets")
+async def all_subsets_regression(
+    request: Request,
+    predictors: str = Query("bill_length_mm,bill_depth_mm,flipper_length_mm",
+                            description="Comma-separated candidate predictors"),
+    target: str = Query("body_mass_g"),
+    store: str = STORE_QUERY
+):
+    """Fit all 2^k - 1 predictor subsets in one batch, ranked by adjusted R²"""
+    names = [name.strip() for name in predictors.split(',') if name.strip()]
+    
+    def compute():
+        return analysis_service.run_regression('all_subsets_regression', store, partial(get_penguins, store), names, target)
+    
+    try:
+        if not names:
+            raise ValueError("At least one predictor is required")
+        return await response_cache.respond(request, "part3.subsets", compute)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /subsets: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/multiple")
 async def multiple_regression(request: RegressionRequest):
     """Perform multiple linear regression"""
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
-        result = analysis_service.multiple_regression(request.predictors, request.target)
+        result = await run_in_threadpool(
+            analysis_service.run_regression, 'multiple_regression', request.store, partial(get_penguins, request.store),
+            request.predictors, request.target, request.group_by
+        )
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2,15 +2,21 @@
 Part 4: Classification and Prediction
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from config import settings
 from database import mongo_service
-from services.analysis import analysis_service
+from services.analysis import analysis_service, CLASSIFIER_FIELDS
+from services.dataset import build_frame
+from services.evaluation import MAX_FOLDS, MODEL_KEYS, SEARCH_STRATEGIES
+from services.jobs import job_manager, Job
+from services.shared_state import TrainingInProgress, shared_state
 import logging
-from pathlib import Path
+from typing import Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-MODELS_DIR = Path(__file__).parent.parent / "models"
+JOB_KINDS = ('cross_validation', 'hyperparameter_search')
 
 class PredictionInput(BaseModel):
     """Input for species prediction"""
@@ -19,27 +25,51 @@ class PredictionInput(BaseModel):
     flipper_length_mm: float
     body_mass_g: float
 
+def _model_info():
+    """Model metrics (out-of-fold where cross-validated), feature importances and the last cross-validation results"""
+    shared_state.sync_models()
+    penguins = mongo_service.get_all_penguins(CLASSIFIER_FIELDS)
+    df = build_frame(penguins)
+    
+    # Training-set scores are optimistic, so report the out-of-fold ones of every cross-validated model
+    training_metrics = analysis_service.get_classification_metrics(df)
+    cross_validation = analysis_service.get_cross_validation()
+    cv_models = cross_validation.get('models', {}) if cross_validation else {}
+    metrics = {}
+    for model_key, scores in training_metrics.items():
+        cv = cv_models.get(model_key)
+        if cv is None:
+            metrics[model_key] = scores
+            continue
+        metrics[model_key] = {
+            'accuracy': cv['accuracy'],
+            'accuracy_std': cv['accuracy_std'],
+            'precision': cv['precision'],
+            'recall': cv['recall'],
+            'f1_score': cv['f1_score'],
+            'confusion_matrix': cv['confusion_matrix'],
+            'evaluated_on': 'cross_validation'
+        }
+    
+    # Get feature importances for all models
+    feature_importances = analysis_service.get_feature_importances(df)
+    
+    trained_on_samples = len([p for p in penguins if p.get('culmenLength') and p.get('culmenDepth') and p.get('flipperLength') and p.get('bodyMass')])
+    
+    return {
+        "model_type": "Multiple (Random Forest, K-NN, Decision Tree)",
+        "metrics": metrics,
+        "training_metrics": training_metrics,
+        "cross_validation": cross_validation,
+        "feature_importances": feature_importances,
+        "trained_on_samples": trained_on_samples
+    }
+
 @router.get("/model-info")
 async def get_model_info():
     """Get classification model information for all models"""
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
-        # Get metrics for all models
-        metrics = analysis_service.get_classification_metrics()
-        
-        # Get feature importances for all models
-        feature_importances = analysis_service.get_feature_importances()
-        
-        trained_on_samples = len([p for p in penguins if p.get('culmenLength') and p.get('culmenDepth') and p.get('flipperLength') and p.get('bodyMass')])
-        
-        return {
-            "model_type": "Multiple (Random Forest, K-NN, Decision Tree)",
-            "metrics": metrics,
-            "feature_importances": feature_importances,
-            "trained_on_samples": trained_on_samples
-        }
+        return await run_in_threadpool(_model_info)
     except Exception as e:
         logger.error(f"Error in /model-info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -48,14 +78,18 @@ async def get_model_info():
 async def predict_species(data: PredictionInput):
     """Predict penguin species"""
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
+        shared_state.sync_models()
+        # Training data is only needed when no model is loaded yet
+        df = None
+        if analysis_service.classifier_rf is None:
+            df = build_frame(mongo_service.get_all_penguins(CLASSIFIER_FIELDS))
         
         prediction = analysis_service.predict_species(
             data.bill_length_mm,
             data.bill_depth_mm,
             data.flipper_length_mm,
-            data.body_mass_g
+            data.body_mass_g,
+            df=df
         )
         return prediction
     except Exception as e:
@@ -66,82 +100,232 @@ async def predict_species(data: PredictionInput):
 async def get_model_stats():
     """Get model training statistics and status"""
     try:
+        shared_state.sync_models()
         stats = analysis_service.get_model_stats()
         return stats
     except Exception as e:
         logger.error(f"Error in /stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _full_retrain():
+    """Retrain every classifier on all MongoDB data, remembering the newest _id it saw"""
+    penguins, newest = mongo_service.get_penguins_since(None, CLASSIFIER_FIELDS)
+    analysis_service.train_classifier(build_frame(penguins), trained_through=newest)
+    return len([p for p in penguins if p.get('culmenLength') and p.get('culmenDepth') and p.get('flipperLength') and p.get('bodyMass')])
+
+def _with_training_lock(func, *args):
+    """Run func while no other worker retrains, updates or promotes a model"""
+    with shared_state.training_lock():
+        return func(*args)
+
 @router.post("/retrain")
 async def retrain_model():
     """Force retraining of the classifier and save it"""
     try:
-        penguins = mongo_service.get_all_penguins()
-        analysis_service.load_data(penguins)
-        
         # Force retraining
-        analysis_service.train_classifier()
+        samples = await run_in_threadpool(_with_training_lock, _full_retrain)
         
         return {
             "status": "success",
             "message": "Model retrained and saved successfully",
-            "samples_trained": len([p for p in penguins if p.get('culmenLength') and p.get('culmenDepth') and p.get('flipperLength') and p.get('bodyMass')])
+            "samples_trained": samples
         }
+    except TrainingInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error in /retrain: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _update_models(allow_retrain: bool):
+    """Learn the penguins inserted since the last update, retraining fully only when the drift monitor asks"""
+    shared_state.sync_models()
+    since = analysis_service.training_watermark()
+    if since is None:
+        result = {'action': 'retrain', 'reasons': ["no record of which rows the models were trained on"]}
+    else:
+        penguins, newest = mongo_service.get_penguins_since(since, CLASSIFIER_FIELDS)
+        result = analysis_service.update_classifiers(build_frame(penguins), newest)
+    if result['action'] == 'retrain':
+        if not allow_retrain:
+            return {**result, 'action': 'retrain_required'}
+        result['samples_trained'] = _full_retrain()
+    return result
+
+@router.post("/update")
+async def update_models(
+    allow_retrain: bool = Query(True, description="Run the full retrain when the drift monitor asks for one")
+):
+    """Incrementally learn penguins added since the last training (K-NN and Random Forest)"""
+    try:
+        return await run_in_threadpool(_with_training_lock, _update_models, allow_retrain)
+    except TrainingInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /update: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/drift")
+async def get_drift_status():
+    """Rows appended since the last full retrain and the drift statistics behind the retrain decision"""
+    status = analysis_service.drift_status()
+    if status is None:
+        raise HTTPException(status_code=404, detail="No full retrain recorded yet; POST /retrain first")
+    return status
+
+def cross_validation_job(job: Job, models: list, folds: int, stratified: bool, workers: int):
+    """Background job: cross-validate the classifiers on the current MongoDB data"""
+    df = build_frame(mongo_service.get_all_penguins(CLASSIFIER_FIELDS))
+    return analysis_service.cross_validate_classifiers(df, models, folds, stratified, workers, job=job)
+
+@router.post("/cross-validate")
+async def submit_cross_validation(
+    folds: int = Query(5, ge=2, le=MAX_FOLDS, description="Number of folds"),
+    stratified: bool = Query(True, description="Keep the species proportions in every fold"),
+    models: Optional[str] = Query(None, description="Comma-separated subset of rf,knn,dt"),
+    workers: Optional[int] = Query(None, ge=1, description="Worker processes, at most CV_WORKERS")
+):
+    """Submit k-fold cross-validation of the classifiers as a background job"""
+    selected = [m.strip() for m in models.split(',') if m.strip()] if models else list(MODEL_KEYS)
+    invalid = [m for m in selected if m not in MODEL_KEYS]
+    if invalid or not selected:
+        raise HTTPException(status_code=400, detail=f"Invalid model(s): {', '.join(invalid) or models}")
+    workers = min(workers or settings.CV_WORKERS, settings.CV_WORKERS)
+    
+    job = job_manager.submit(
+        'cross_validation',
+        lambda job: cross_validation_job(job, selected, folds, stratified, workers),
+        params={'models': selected, 'folds': folds, 'stratified': stratified, 'workers': workers}
+    )
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/cross-validation")
+async def get_cross_validation():
+    """Get the last persisted cross-validation results"""
+    results = analysis_service.get_cross_validation()
+    if results is None:
+        raise HTTPException(status_code=404, detail="No cross-validation results yet; POST /cross-validate first")
+    return results
+
+def hyperparameter_search_job(job: Job, model: str, strategy: str, candidates: int, folds: int, workers: int,
+                              patience: Optional[int], max_latency_ms: Optional[float]):
+    """Background job: search one model family's hyperparameters on the current MongoDB data"""
+    df = build_frame(mongo_service.get_all_penguins(CLASSIFIER_FIELDS))
+    return analysis_service.search_hyperparameters(
+        model, df, strategy, candidates, folds, workers, patience, max_latency_ms, job=job
+    )
+
+@router.post("/search")
+async def submit_hyperparameter_search(
+    model: str = Query(..., description="Model family: rf, knn or dt"),
+    strategy: str = Query('halving', description="grid, random or halving (successive halving)"),
+    candidates: int = Query(20, ge=1, le=500, description="Candidates sampled by random and halving"),
+    folds: int = Query(5, ge=2, le=MAX_FOLDS, description="Stratified folds per candidate"),
+    patience: Optional[int] = Query(None, ge=1, description="Stop grid/random after this many candidates without improvement"),
+    max_latency_ms: Optional[float] = Query(None, gt=0, description="Only recommend candidates with a faster median single-row prediction"),
+    workers: Optional[int] = Query(None, ge=1, description="Worker processes, at most CV_WORKERS")
+):
+    """Submit a hyperparameter search of one classifier as a background job"""
+    if model not in MODEL_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
+    if strategy not in SEARCH_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Invalid strategy: {strategy}. Choose from {', '.join(SEARCH_STRATEGIES)}")
+    workers = min(workers or settings.CV_WORKERS, settings.CV_WORKERS)
+    
+    job = job_manager.submit(
+        'hyperparameter_search',
+        lambda job: hyperparameter_search_job(job, model, strategy, candidates, folds, workers, patience, max_latency_ms),
+        params={'model': model, 'strategy': strategy, 'candidates': candidates, 'folds': folds,
+                'patience': patience, 'max_latency_ms': max_latency_ms, 'workers': workers}
+    )
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/search/{model}")
+async def get_hyperparameter_search(model: str):
+    """Get the last persisted hyperparameter search of a model family"""
+    if model not in MODEL_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
+    results = analysis_service.get_hyperparameter_search(model)
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"No hyperparameter search for {model} yet; POST /search first")
+    return results
+
+def _promote_candidate(model: str, candidate: Optional[int]):
+    """Fetch the training data and retrain model with a search candidate's hyperparameters"""
+    df = build_frame(mongo_service.get_all_penguins(CLASSIFIER_FIELDS))
+    return analysis_service.promote_candidate(model, candidate, df)
+
+@router.post("/search/{model}/promote")
+async def promote_search_candidate(
+    model: str,
+    candidate: Optional[int] = Query(None, ge=0, description="Candidate id; the recommended one by default")
+):
+    """Retrain a model on all data with a search candidate's hyperparameters and save it"""
+    if model not in MODEL_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
+    try:
+        stats = await run_in_threadpool(_with_training_lock, _promote_candidate, model, candidate)
+        return {"status": "success", "model": model, "stats": stats}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TrainingInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /search/{model}/promote: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs")
+async def list_model_jobs(kind: Optional[str] = Query(None, description="cross_validation or hyperparameter_search")):
+    """List recent cross-validation and hyperparameter search jobs"""
+    if kind is not None and kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid job kind: {kind}")
+    jobs = [job for job in job_manager.list(kind) if job.kind in JOB_KINDS]
+    return {"jobs": [job.to_dict(include_result=False) for job in jobs]}
+
+@router.get("/jobs/{job_id}")
+async def get_model_job(job_id: str):
+    """Get the state (and results, once finished) of a cross-validation or search job"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}")
+async def cancel_model_job(job_id: str):
+    """Cancel a running cross-validation or search job"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind not in JOB_KINDS:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job_manager.cancel(job_id).to_dict(include_result=False)
+
+@router.get("/registry")
+async def get_model_registry():
+    """Manifests of the persisted classifiers (versions, schema, metrics, checksums) and what is loaded"""
+    return {"models": analysis_service.models.list(MODEL_KEYS), "stats": analysis_service.models.stats()}
+
+@router.post("/registry/{model}/activate")
+async def activate_model_version(model: str, version: int = Query(..., ge=1, description="Kept version to serve")):
+    """Serve another kept version of a model (rollback or roll forward)"""
+    if model not in MODEL_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
+    try:
+        entry = analysis_service.models.activate(model, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    shared_state.publish_models_changed()
+    return {"status": "success", "model": model, "version": entry}
+
 @router.delete("/model")
 async def delete_persisted_model(model: str = None):
-    """Delete persisted model file(s)"""
+    """Delete every persisted version of one or all models"""
+    if model and model not in MODEL_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
     try:
-        if model:
-            # Delete specific model
-            filename_map = {'rf': 'rf_classifier.pkl', 'knn': 'knn_classifier.pkl', 'dt': 'dt_classifier.pkl'}
-            if model not in filename_map:
-                raise HTTPException(status_code=400, detail=f"Invalid model: {model}")
-            
-            model_path = MODELS_DIR / filename_map[model]
-            metadata_path = MODELS_DIR / f"{model}_metadata.txt"
-            
-            if model_path.exists():
-                model_path.unlink()
-            if metadata_path.exists():
-                metadata_path.unlink()
-            
-            # Clear from memory
-            if model == 'rf':
-                analysis_service.classifier_rf = None
-            elif model == 'knn':
-                analysis_service.classifier_knn = None
-            elif model == 'dt':
-                analysis_service.classifier_dt = None
-            
-            return {
-                "status": "success",
-                "message": f"{model.upper()} model deleted successfully"
-            }
-        else:
-            # Delete all models
-            for model_key in ['rf', 'knn', 'dt']:
-                filename_map = {'rf': 'rf_classifier.pkl', 'knn': 'knn_classifier.pkl', 'dt': 'dt_classifier.pkl'}
-                model_path = MODELS_DIR / filename_map[model_key]
-                metadata_path = MODELS_DIR / f"{model_key}_metadata.txt"
-                
-                if model_path.exists():
-                    model_path.unlink()
-                if metadata_path.exists():
-                    metadata_path.unlink()
-            
-            # Clear from memory
-            analysis_service.classifier_rf = None
-            analysis_service.classifier_knn = None
-            analysis_service.classifier_dt = None
-            
-            return {
-                "status": "success",
-                "message": "All models deleted successfully"
-            }
+        analysis_service.delete_models([model] if model else list(MODEL_KEYS))
+        shared_state.publish_models_changed()
+        return {
+            "status": "success",
+            "message": f"{model.upper()} model deleted successfully" if model else "All models deleted successfully"
+        }
     except Exception as e:
         logger.error(f"Error in /delete: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,13 +1,28 @@
 """
 Part 5: Database Benchmarking
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import math
+import random
 import time
+import uuid
 import logging
+import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional, Union
 
-from database import mongo_service, cassandra_service, redis_service
+from database import mongo_service, cassandra_service, redis_service, get_penguins
+from services.analysis import analysis_service
+from services.jobs import job_manager, Job
+from services.shared_state import shared_state
+from responses import FastJSONResponse, dumps
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,6 +30,36 @@ logger = logging.getLogger(__name__)
 # Configuration for benchmarking
 BENCHMARK_QUERIES = 10  # Number of queries per database
 QUERY_BATCH_SIZE = 5    # Number of pagination queries
+SPECIES_LIST = ['Adelie', 'Chinstrap', 'Gentoo']
+TOTAL_QUERIES_PER_DB = BENCHMARK_QUERIES + len(SPECIES_LIST) * QUERY_BATCH_SIZE
+
+# Write benchmarks
+WRITE_RECORDS = 200      # Records written per workload
+WRITE_BATCH_SIZE = 50    # Records per bulk insert call
+WRITE_WORKLOADS = ['single_insert', 'bulk_insert', 'upsert', 'delete']
+REDIS_PIPELINE_DEPTHS = [1, 10, 100]
+WRITE_SCRATCH_PREFIX = 'bench_writes_'
+
+# Cold versus warm cache benchmarks
+COLD_SAMPLES = 3        # Cleared-cache, fresh-connection runs per database
+WARMUP_QUERIES = 5      # Untimed runs of every operation before the warm phase
+
+PROFILE_DESCRIPTION = "Attach store-side profiling (Mongo explain, Cassandra tracing, Redis SLOWLOG/LATENCY)"
+
+# Response serialization benchmark
+SERIALIZATION_ITERATIONS = 20      # Encodings timed per payload and encoder
+SERIALIZATION_DETAILED_ENTRIES = 5000  # detailed_results entries per database in the synthetic payload
+
+# Projection pushdown benchmark
+PROJECTION_ITERATIONS = 10
+PROJECTION_FIELDS = ['flipperLength', 'bodyMass']  # what /api/part3/simple reads
+
+# Kind of the jobs these routes submit, show and cancel
+JOB_KIND = 'benchmark'
+
+# Server-Sent Events stream settings
+SSE_POLL_INTERVAL = 0.25  # seconds between job state checks
+SSE_HEARTBEAT = 15.0      # seconds of silence before a keep-alive comment
 
 
 class BenchmarkResult:
@@ -25,6 +70,8 @@ class BenchmarkResult:
         self.min_time: float = float('inf')
         self.max_time: float = 0
         self.total_queries: int = 0
+        # Store-side profiling data, filled in when a benchmark runs with profile=True
+        self.server_profile: Optional[Dict[str, Any]] = None
 
     def add_time(self, time_ms: float):
         """Add a query time measurement"""
@@ -34,6 +81,14 @@ class BenchmarkResult:
         self.max_time = max(self.max_time, time_ms)
         self.total_queries += 1
 
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile of the recorded times"""
+        if not self.times:
+            return 0
+        ordered = sorted(self.times)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[rank - 1]
+
     def get_summary(self) -> Dict[str, float]:
         """Get summary statistics"""
         if self.total_queries == 0:
@@ -41,6 +96,9 @@ class BenchmarkResult:
                 'avg_time': 0,
                 'min_time': 0,
                 'max_time': 0,
+                'p50': 0,
+                'p95': 0,
+                'p99': 0,
                 'throughput': 0,
                 'total_queries': 0
             }
@@ -52,12 +110,96 @@ class BenchmarkResult:
             'avg_time': avg_time,
             'min_time': self.min_time,
             'max_time': self.max_time,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
             'throughput': throughput,
             'total_queries': self.total_queries
         }
 
 
-def benchmark_mongodb() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
+ProgressCallback = Callable[[BenchmarkResult], None]
+PhaseProgressCallback = Callable[[str, BenchmarkResult], None]  # (phase, that phase's result so far)
+
+
+def _timed_query(result: BenchmarkResult, detailed: List[Dict[str, Any]], operation: str,
+                 query: Callable[[], Any], on_progress: Optional[ProgressCallback] = None,
+                 **extra) -> float:
+    """Run one query, record its time and report progress"""
+    start = time.time()
+    query()
+    end = time.time()
+    time_ms = (end - start) * 1000
+    result.add_time(time_ms)
+    detailed.append({'time': time_ms, 'operation': operation, **extra})
+    if on_progress:
+        on_progress(result)
+    return time_ms
+
+
+def _benchmark_query_filters() -> Dict[str, Dict[str, Any]]:
+    """The MongoDB filters issued by the benchmarks, keyed by operation"""
+    filters = {'get_all': {}}
+    for species in SPECIES_LIST:
+        filters[f'get_by_species_{species}'] = {'species': species}
+    return filters
+
+
+def _benchmark_cql() -> Dict[str, tuple]:
+    """The Cassandra statements issued by the benchmarks, keyed by operation"""
+    queries = {'get_all': (cassandra_service.SELECT_ALL, None)}
+    for species in SPECIES_LIST:
+        queries[f'get_by_species_{species}'] = (cassandra_service.SELECT_BY_SPECIES, [species])
+    return queries
+
+
+def _client_times_by_operation(detailed: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Average client-side time per operation"""
+    totals: Dict[str, List[float]] = {}
+    for entry in detailed:
+        totals.setdefault(entry['operation'], []).append(entry['time'])
+    return {operation: sum(times) / len(times) for operation, times in totals.items()}
+
+
+def _with_overhead(stats: Dict[str, Any], client_ms: Optional[float], server_ms: Optional[float]) -> Dict[str, Any]:
+    """Add client time and the client-minus-server gap (network, driver, decoding)"""
+    stats['client_avg_ms'] = client_ms
+    if client_ms is not None and server_ms is not None:
+        stats['overhead_ms'] = client_ms - server_ms
+    return stats
+
+
+def profile_mongodb(detailed: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """explain('executionStats') for each benchmark operation (one extra, untimed run each)"""
+    client_times = _client_times_by_operation(detailed)
+    profile = {}
+    for operation, query_filter in _benchmark_query_filters().items():
+        stats = mongo_service.explain_find(query_filter)
+        profile[operation] = _with_overhead(stats, client_times.get(operation), stats.get('execution_time_ms'))
+    return profile
+
+
+def profile_cassandra(detailed: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Query tracing for each benchmark operation (one extra, untimed run each)"""
+    client_times = _client_times_by_operation(detailed)
+    profile = {}
+    for operation, (query, params) in _benchmark_cql().items():
+        trace = cassandra_service.trace_query(query, params)
+        profile[operation] = _with_overhead(trace, client_times.get(operation), trace.get('duration_ms'))
+    return profile
+
+
+def _start_redis_profiling(result: BenchmarkResult) -> Optional[Dict[str, Any]]:
+    """Turn on SLOWLOG capture, recording the error instead if CONFIG is not allowed"""
+    try:
+        return redis_service.start_profiling()
+    except Exception as e:
+        logger.warning(f"Redis profiling unavailable: {e}")
+        result.server_profile = {'error': str(e)}
+        return None
+
+
+def benchmark_mongodb(on_progress: Optional[ProgressCallback] = None, profile: bool = False) -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     """Benchmark MongoDB"""
     result = BenchmarkResult()
     detailed = []
@@ -65,23 +207,16 @@ def benchmark_mongodb() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     try:
         # Test 1: Get all penguins
         for _ in range(BENCHMARK_QUERIES):
-            start = time.time()
-            penguins = mongo_service.get_all_penguins()
-            end = time.time()
-            time_ms = (end - start) * 1000
-            result.add_time(time_ms)
-            detailed.append({'time': time_ms, 'operation': 'get_all'})
+            _timed_query(result, detailed, 'get_all', mongo_service.get_all_penguins, on_progress)
         
         # Test 2: Get by species
-        species_list = ['Adelie', 'Chinstrap', 'Gentoo']
-        for species in species_list:
+        for species in SPECIES_LIST:
             for _ in range(QUERY_BATCH_SIZE):
-                start = time.time()
-                penguins = mongo_service.get_penguins_by_species(species)
-                end = time.time()
-                time_ms = (end - start) * 1000
-                result.add_time(time_ms)
-                detailed.append({'time': time_ms, 'operation': f'get_by_species_{species}'})
+                _timed_query(result, detailed, f'get_by_species_{species}',
+                             lambda: mongo_service.get_penguins_by_species(species), on_progress)
+        
+        if profile:
+            result.server_profile = profile_mongodb(detailed)
         
         logger.info(f"MongoDB benchmark completed: {result.total_queries} queries")
     except Exception as e:
@@ -91,7 +226,7 @@ def benchmark_mongodb() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     return result, detailed
 
 
-def benchmark_cassandra() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
+def benchmark_cassandra(on_progress: Optional[ProgressCallback] = None, profile: bool = False) -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     """Benchmark Cassandra"""
     result = BenchmarkResult()
     detailed = []
@@ -99,23 +234,16 @@ def benchmark_cassandra() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     try:
         # Test 1: Get all penguins
         for _ in range(BENCHMARK_QUERIES):
-            start = time.time()
-            penguins = cassandra_service.get_all_penguins()
-            end = time.time()
-            time_ms = (end - start) * 1000
-            result.add_time(time_ms)
-            detailed.append({'time': time_ms, 'operation': 'get_all'})
+            _timed_query(result, detailed, 'get_all', cassandra_service.get_all_penguins, on_progress)
         
         # Test 2: Get by species
-        species_list = ['Adelie', 'Chinstrap', 'Gentoo']
-        for species in species_list:
+        for species in SPECIES_LIST:
             for _ in range(QUERY_BATCH_SIZE):
-                start = time.time()
-                penguins = cassandra_service.get_penguins_by_species(species)
-                end = time.time()
-                time_ms = (end - start) * 1000
-                result.add_time(time_ms)
-                detailed.append({'time': time_ms, 'operation': f'get_by_species_{species}'})
+                _timed_query(result, detailed, f'get_by_species_{species}',
+                             lambda: cassandra_service.get_penguins_by_species(species), on_progress)
+        
+        if profile:
+            result.server_profile = profile_cassandra(detailed)
         
         logger.info(f"Cassandra benchmark completed: {result.total_queries} queries")
     except Exception as e:
@@ -125,135 +253,794 @@ def benchmark_cassandra() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     return result, detailed
 
 
-def benchmark_redis() -> tuple[BenchmarkResult, List[Dict[str, float]]]:
+def benchmark_redis(on_progress: Optional[ProgressCallback] = None, profile: bool = False) -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     """Benchmark Redis"""
     result = BenchmarkResult()
     detailed = []
+    previous_config = _start_redis_profiling(result) if profile else None
     
     try:
         # Test 1: Get all penguins
         for _ in range(BENCHMARK_QUERIES):
-            start = time.time()
-            penguins = redis_service.get_all_penguins()
-            end = time.time()
-            time_ms = (end - start) * 1000
-            result.add_time(time_ms)
-            detailed.append({'time': time_ms, 'operation': 'get_all'})
+            _timed_query(result, detailed, 'get_all', redis_service.get_all_penguins, on_progress)
         
-        # Test 2: Get all and filter (simulating by species)
-        species_list = ['Adelie', 'Chinstrap', 'Gentoo']
-        for species in species_list:
+        # Test 2: Get all and filter in memory (simulating by species)
+        for species in SPECIES_LIST:
             for _ in range(QUERY_BATCH_SIZE):
-                start = time.time()
-                all_penguins = redis_service.get_all_penguins()
-                # Filter in memory
-                filtered = [p for p in all_penguins if p.get('species') == species]
-                end = time.time()
-                time_ms = (end - start) * 1000
-                result.add_time(time_ms)
-                detailed.append({'time': time_ms, 'operation': f'get_by_species_{species}'})
+                _timed_query(result, detailed, f'get_by_species_{species}',
+                             lambda: [p for p in redis_service.get_all_penguins() if p.get('species') == species],
+                             on_progress)
         
         logger.info(f"Redis benchmark completed: {result.total_queries} queries")
     except Exception as e:
         logger.error(f"Redis benchmark error: {e}")
         raise
+    finally:
+        if previous_config is not None:
+            result.server_profile = redis_service.stop_profiling(previous_config)
+            result.server_profile['client_time_ms'] = result.total_time
+            result.server_profile['overhead_ms'] = result.total_time - result.server_profile['server_time_ms']
     
     return result, detailed
 
 
+# Benchmark runners keyed by the database names used in the API
+BENCHMARKS: Dict[str, Callable[..., tuple]] = {
+    'mongodb': benchmark_mongodb,
+    'cassandra': benchmark_cassandra,
+    'redis': benchmark_redis
+}
+
+
+def _run_per_database(databases: List[str], isolated: bool, run_one: Callable[[str], Any]) -> Dict[str, Any]:
+    """Call run_one for each database, in parallel threads unless isolation is required"""
+    if isolated or len(databases) <= 1:
+        return {db: run_one(db) for db in databases}
+    with ThreadPoolExecutor(max_workers=len(databases), thread_name_prefix='benchmark') as pool:
+        futures = {db: pool.submit(run_one, db) for db in databases}
+        return {db: future.result() for db, future in futures.items()}
+
+
+def run_benchmarks(databases: List[str], isolated: bool = False,
+                   progress_for: Optional[Callable[[str], ProgressCallback]] = None,
+                   profile: bool = False) -> Dict[str, Any]:
+    """Run benchmarks for several databases, in parallel unless isolation is required"""
+    benchmark_start = time.time()
+    outcomes = _run_per_database(
+        databases, isolated,
+        lambda db: BENCHMARKS[db](progress_for(db) if progress_for else None, profile)
+    )
+    
+    total_duration = time.time() - benchmark_start
+    
+    response = {
+        "benchmarks": {db: result.get_summary() for db, (result, _) in outcomes.items()},
+        "detailed_results": {db: detailed for db, (_, detailed) in outcomes.items()},
+        "isolated": isolated,
+        "total_duration": total_duration,
+        "timestamp": datetime.now().isoformat()
+    }
+    if profile:
+        response["server_profiles"] = {db: result.server_profile for db, (result, _) in outcomes.items()}
+    return response
+
+
+WriteProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def _synthetic_penguins(count: int) -> List[Dict[str, Any]]:
+    """Deterministic penguin-shaped records for write benchmarks"""
+    rng = random.Random(42)
+    return [
+        {
+            'studyName': 'BENCHMARK',
+            'sampleNumber': i + 1,
+            'species': SPECIES_LIST[i % len(SPECIES_LIST)],
+            'region': 'Anvers',
+            'island': rng.choice(['Biscoe', 'Dream', 'Torgersen']),
+            'stage': 'Adult, 1 Egg Stage',
+            'individualId': f'B{i + 1}',
+            'clutchCompletion': 'Yes',
+            'dateEgg': '2007-11-11',
+            'culmenLength': round(rng.uniform(32.0, 60.0), 1),
+            'culmenDepth': round(rng.uniform(13.0, 22.0), 1),
+            'flipperLength': rng.randint(170, 232),
+            'bodyMass': rng.randint(2700, 6300),
+            'sex': rng.choice(['MALE', 'FEMALE']),
+            'delta15N': round(rng.uniform(7.6, 10.1), 5),
+            'delta13C': round(rng.uniform(-27.1, -23.8), 5),
+            'comments': None
+        }
+        for i in range(count)
+    ]
+
+
+def _batches(items: List[Any], size: int) -> List[List[Any]]:
+    """Split items into consecutive batches of at most size"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _write_cell(result: BenchmarkResult, records: int) -> Dict[str, Any]:
+    """Latency summary plus record throughput for one workload/setting"""
+    summary = result.get_summary()
+    seconds = result.total_time / 1000
+    summary['records'] = records
+    summary['records_per_second'] = records / seconds if seconds > 0 else 0
+    return summary
+
+
+def _run_write_matrix(settings: List[str], run_workload: Callable[[str, str], BenchmarkResult],
+                      setup: Callable[[], None], cleanup: Callable[[], None], records: int,
+                      on_progress: Optional[WriteProgressCallback] = None) -> Dict[str, Dict[str, Any]]:
+    """Run every workload under every setting, always cleaning up the scratch data"""
+    matrix: Dict[str, Dict[str, Any]] = {}
+    total_cells = len(settings) * len(WRITE_WORKLOADS)
+    try:
+        setup()
+        for setting in settings:
+            matrix[setting] = {}
+            for workload in WRITE_WORKLOADS:
+                matrix[setting][workload] = _write_cell(run_workload(setting, workload), records)
+                if on_progress:
+                    on_progress({
+                        'completed': sum(len(cells) for cells in matrix.values()),
+                        'total': total_cells,
+                        'setting': setting,
+                        'workload': workload,
+                        'metrics': matrix[setting][workload]
+                    })
+    finally:
+        cleanup()
+    return matrix
+
+
+def benchmark_mongodb_writes(records: int = WRITE_RECORDS,
+                             on_progress: Optional[WriteProgressCallback] = None) -> Dict[str, Dict[str, Any]]:
+    """Write workloads against a throwaway collection for each write concern"""
+    penguins = _synthetic_penguins(records)
+    name = f"{WRITE_SCRATCH_PREFIX}{uuid.uuid4().hex[:8]}"
+    
+    def run_workload(setting: str, workload: str) -> BenchmarkResult:
+        result, detailed = BenchmarkResult(), []
+        collection = mongo_service.scratch_collection(name, setting)
+        if workload in ('single_insert', 'bulk_insert'):
+            # Start every insert workload from an empty collection
+            mongo_service.drop_collection(name)
+            collection.create_index('sampleNumber')
+        
+        if workload == 'single_insert':
+            for doc in [dict(p) for p in penguins]:
+                _timed_query(result, detailed, workload, lambda: collection.insert_one(doc))
+        elif workload == 'bulk_insert':
+            for docs in _batches([dict(p) for p in penguins], WRITE_BATCH_SIZE):
+                _timed_query(result, detailed, workload, lambda: collection.insert_many(docs, ordered=False))
+        elif workload == 'upsert':
+            for p in penguins:
+                _timed_query(result, detailed, workload, lambda: collection.update_one(
+                    {'sampleNumber': p['sampleNumber']}, {'$set': {'bodyMass': p['bodyMass'] + 1}}, upsert=True))
+        elif workload == 'delete':
+            for p in penguins:
+                _timed_query(result, detailed, workload,
+                             lambda: collection.delete_one({'sampleNumber': p['sampleNumber']}))
+        return result
+    
+    return _run_write_matrix(list(mongo_service.WRITE_CONCERNS), run_workload,
+                             setup=lambda: None, cleanup=lambda: mongo_service.drop_collection(name),
+                             records=records, on_progress=on_progress)
+
+
+def benchmark_cassandra_writes(records: int = WRITE_RECORDS,
+                               on_progress: Optional[WriteProgressCallback] = None) -> Dict[str, Dict[str, Any]]:
+    """Write workloads against a throwaway keyspace for each consistency level"""
+    penguins = _synthetic_penguins(records)
+    keyspace = f"{WRITE_SCRATCH_PREFIX}{uuid.uuid4().hex[:8]}"
+    rows = [cassandra_service.row_values(p) for p in penguins]
+    
+    def run_workload(setting: str, workload: str) -> BenchmarkResult:
+        result, detailed = BenchmarkResult(), []
+        statements = cassandra_service.prepare_scratch_statements(keyspace, setting)
+        if workload in ('single_insert', 'bulk_insert'):
+            cassandra_service.session.execute(f"TRUNCATE {keyspace}.penguins")
+        
+        if workload == 'single_insert':
+            for row in rows:
+                _timed_query(result, detailed, workload,
+                             lambda: cassandra_service.session.execute(statements['insert'], row))
+        elif workload == 'bulk_insert':
+            for batch in _batches(rows, WRITE_BATCH_SIZE):
+                _timed_query(result, detailed, workload,
+                             lambda: cassandra_service.execute_concurrent(statements['insert'], batch))
+        elif workload == 'upsert':
+            for p in penguins:
+                _timed_query(result, detailed, workload, lambda: cassandra_service.session.execute(
+                    statements['upsert'], (p['bodyMass'] + 1, p['species'], p['sampleNumber'])))
+        elif workload == 'delete':
+            for p in penguins:
+                _timed_query(result, detailed, workload, lambda: cassandra_service.session.execute(
+                    statements['delete'], (p['species'], p['sampleNumber'])))
+        return result
+    
+    return _run_write_matrix(list(cassandra_service.CONSISTENCY_LEVELS), run_workload,
+                             setup=lambda: cassandra_service.create_scratch_keyspace(keyspace),
+                             cleanup=lambda: cassandra_service.drop_keyspace(keyspace),
+                             records=records, on_progress=on_progress)
+
+
+def benchmark_redis_writes(records: int = WRITE_RECORDS,
+                           on_progress: Optional[WriteProgressCallback] = None) -> Dict[str, Dict[str, Any]]:
+    """Write workloads under a throwaway key prefix for each pipeline depth"""
+    penguins = _synthetic_penguins(records)
+    prefix = f"{WRITE_SCRATCH_PREFIX}{uuid.uuid4().hex[:8]}:"
+    mappings = [(f"{prefix}{p['sampleNumber']}", redis_service.encode_penguin(p)) for p in penguins]
+    
+    def send(commands: List[Callable[[Any], None]]):
+        """Send a group of commands in one round trip"""
+        pipe = redis_service.redis.pipeline(transaction=False)
+        for command in commands:
+            command(pipe)
+        pipe.execute()
+    
+    def run_workload(setting: str, workload: str) -> BenchmarkResult:
+        result, detailed = BenchmarkResult(), []
+        depth = int(setting.split('=')[1])
+        if workload in ('single_insert', 'bulk_insert'):
+            redis_service.delete_prefix(prefix)
+        
+        if workload == 'single_insert':
+            commands = [lambda pipe, k=key, m=mapping: pipe.hset(k, mapping=m) for key, mapping in mappings]
+        elif workload == 'bulk_insert':
+            # One HSET per record, always shipped WRITE_BATCH_SIZE at a time
+            commands = [lambda pipe, k=key, m=mapping: pipe.hset(k, mapping=m) for key, mapping in mappings]
+            depth = WRITE_BATCH_SIZE
+        elif workload == 'upsert':
+            commands = [
+                lambda pipe, k=key, m=mapping: pipe.hset(k, 'bodyMass', str(int(m['bodyMass']) + 1))
+                for key, mapping in mappings
+            ]
+        else:
+            commands = [lambda pipe, k=key: pipe.delete(k) for key, _ in mappings]
+        
+        for group in _batches(commands, depth):
+            _timed_query(result, detailed, workload, lambda: send(group))
+        return result
+    
+    return _run_write_matrix([f"depth={depth}" for depth in REDIS_PIPELINE_DEPTHS], run_workload,
+                             setup=lambda: None, cleanup=lambda: redis_service.delete_prefix(prefix),
+                             records=records, on_progress=on_progress)
+
+
+# Write benchmark runners keyed by the database names used in the API
+WRITE_BENCHMARKS: Dict[str, Callable[..., Dict[str, Dict[str, Any]]]] = {
+    'mongodb': benchmark_mongodb_writes,
+    'cassandra': benchmark_cassandra_writes,
+    'redis': benchmark_redis_writes
+}
+
+
+def run_write_benchmarks(databases: List[str], records: int = WRITE_RECORDS, isolated: bool = False,
+                         progress_for: Optional[Callable[[str], WriteProgressCallback]] = None) -> Dict[str, Any]:
+    """Run the write matrix for several databases, in parallel unless isolation is required"""
+    benchmark_start = time.time()
+    matrix = _run_per_database(
+        databases, isolated,
+        lambda db: WRITE_BENCHMARKS[db](records, progress_for(db) if progress_for else None)
+    )
+    return {
+        "matrix": matrix,
+        "workloads": WRITE_WORKLOADS,
+        "records": records,
+        "batch_size": WRITE_BATCH_SIZE,
+        "isolated": isolated,
+        "total_duration": time.time() - benchmark_start,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _store_queries(db: str, service: Any) -> Dict[str, Callable[[], Any]]:
+    """The benchmark operations for a database, bound to a given service instance"""
+    queries = {'get_all': service.get_all_penguins}
+    for species in SPECIES_LIST:
+        if db == 'redis':
+            # Redis has no species index: fetch everything and filter in memory
+            queries[f'get_by_species_{species}'] = (
+                lambda s=species: [p for p in service.get_all_penguins() if p.get('species') == s])
+        else:
+            queries[f'get_by_species_{species}'] = lambda s=species: service.get_penguins_by_species(s)
+    return queries
+
+
+def _services() -> Dict[str, Any]:
+    """Shared service instances keyed by database name"""
+    return {'mongodb': mongo_service, 'cassandra': cassandra_service, 'redis': redis_service}
+
+
+def _phase_summary(result: BenchmarkResult, detailed: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Phase summary with a per-operation breakdown"""
+    return {**result.get_summary(), 'by_operation': _client_times_by_operation(detailed)}
+
+
+def benchmark_cold_warm(db: str, on_progress: Optional[PhaseProgressCallback] = None) -> Dict[str, Any]:
+    """Time each operation cold (cleared caches, fresh connection) and warm (steady state)"""
+    service = _services()[db]
+    cold_progress = (lambda result: on_progress('cold', result)) if on_progress else None
+    warm_progress = (lambda result: on_progress('warm', result)) if on_progress else None
+    cold, cold_detailed = BenchmarkResult(), []
+    connect = BenchmarkResult()
+    cache_actions = []
+    
+    # Cold phase: every sample clears what the server lets us clear and opens a new connection,
+    # then runs each operation once
+    for sample in range(COLD_SAMPLES):
+        cache_actions.append(service.clear_caches())
+        fresh = type(service)()
+        start = time.time()
+        fresh.connect()
+        connect.add_time((time.time() - start) * 1000)
+        try:
+            for operation, query in _store_queries(db, fresh).items():
+                _timed_query(cold, cold_detailed, operation, query, cold_progress, phase='cold', sample=sample + 1)
+        finally:
+            fresh.disconnect()
+    
+    # Warm phase: prime the shared connection and caches, then measure the steady state
+    queries = _store_queries(db, service)
+    for _ in range(WARMUP_QUERIES):
+        for query in queries.values():
+            query()
+    warm, warm_detailed = BenchmarkResult(), []
+    for i in range(BENCHMARK_QUERIES):
+        for operation, query in queries.items():
+            _timed_query(warm, warm_detailed, operation, query, warm_progress, phase='warm', query_num=i + 1)
+    
+    cold_summary = _phase_summary(cold, cold_detailed)
+    warm_summary = _phase_summary(warm, warm_detailed)
+    logger.info(f"{db} cold/warm benchmark completed")
+    
+    return {
+        'cold': cold_summary,
+        'warm': warm_summary,
+        'connect': connect.get_summary(),
+        'first_request_ms': connect.total_time / COLD_SAMPLES + cold_summary['by_operation'].get('get_all', 0),
+        'cold_to_warm_p50_ratio': cold_summary['p50'] / warm_summary['p50'] if warm_summary['p50'] > 0 else None,
+        'cache_actions': cache_actions[-1] if cache_actions else {},
+        'detailed_results': cold_detailed + warm_detailed
+    }
+
+
+def run_cold_warm_benchmarks(databases: List[str], isolated: bool = True,
+                             progress_for: Optional[Callable[[str], PhaseProgressCallback]] = None) -> Dict[str, Any]:
+    """Run cold/warm benchmarks for several databases (isolated by default so cold runs stay cold)"""
+    benchmark_start = time.time()
+    phases = _run_per_database(
+        databases, isolated,
+        lambda db: benchmark_cold_warm(db, progress_for(db) if progress_for else None)
+    )
+    return {
+        "phases": phases,
+        "cold_samples": COLD_SAMPLES,
+        "warmup_queries": WARMUP_QUERIES,
+        "isolated": isolated,
+        "total_duration": time.time() - benchmark_start,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _parse_databases(databases: Optional[str]) -> List[str]:
+    """Parse a comma-separated database list, defaulting to all"""
+    if not databases:
+        return list(BENCHMARKS.keys())
+    selected = [db.strip().lower() for db in databases.split(',') if db.strip()]
+    unknown = [db for db in selected if db not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown database(s): {', '.join(unknown)}")
+    return selected
+
+
+def benchmark_job(job: Job, databases: List[str], isolated: bool, profile: bool = False) -> Dict[str, Any]:
+    """Job body: run benchmarks while publishing live progress"""
+    for db in databases:
+        job.update_progress(db, {
+            'completed': 0,
+            'total': TOTAL_QUERIES_PER_DB,
+            'metrics': BenchmarkResult().get_summary()
+        })
+    
+    def progress_for(db: str) -> ProgressCallback:
+        def on_progress(result: BenchmarkResult):
+            job.update_progress(db, {
+                'completed': result.total_queries,
+                'total': TOTAL_QUERIES_PER_DB,
+                'metrics': result.get_summary()
+            })
+            job.check_cancelled()
+        return on_progress
+    
+    return run_benchmarks(databases, isolated=isolated, progress_for=progress_for, profile=profile)
+
+
+def cold_warm_benchmark_job(job: Job, databases: List[str], isolated: bool) -> Dict[str, Any]:
+    """Job body: run cold/warm phases while publishing live progress"""
+    operations = 1 + len(SPECIES_LIST)
+    totals = {'cold': COLD_SAMPLES * operations, 'warm': BENCHMARK_QUERIES * operations}
+    
+    def progress_for(db: str) -> PhaseProgressCallback:
+        phases: Dict[str, Dict[str, Any]] = {}
+        
+        def on_progress(phase: str, result: BenchmarkResult):
+            phases[phase] = {'completed': result.total_queries, 'total': totals[phase], 'metrics': result.get_summary()}
+            job.update_progress(db, {
+                'completed': sum(p['completed'] for p in phases.values()),
+                'total': sum(totals.values()),
+                'phase': phase,
+                'metrics': phases[phase]['metrics'],
+                'phases': dict(phases)
+            })
+            job.check_cancelled()
+        return on_progress
+    
+    return run_cold_warm_benchmarks(databases, isolated=isolated, progress_for=progress_for)
+
+
+def write_benchmark_job(job: Job, databases: List[str], records: int, isolated: bool) -> Dict[str, Any]:
+    """Job body: run the write matrix while publishing live progress"""
+    def progress_for(db: str) -> WriteProgressCallback:
+        def on_progress(progress: Dict[str, Any]):
+            job.update_progress(db, progress)
+            job.check_cancelled()
+        return on_progress
+    
+    return run_write_benchmarks(databases, records=records, isolated=isolated, progress_for=progress_for)
+
+
 @router.post("/mongodb")
-async def benchmark_single_mongodb():
+async def benchmark_single_mongodb(profile: bool = Query(False, description=PROFILE_DESCRIPTION)):
     """Run benchmark for MongoDB only"""
     try:
-        result, detailed = benchmark_mongodb()
-        return {
+        result, detailed = await run_in_threadpool(benchmark_mongodb, None, profile)
+        response = {
             "database": "MongoDB",
             "metrics": result.get_summary(),
             "detailed_results": detailed,
             "timestamp": datetime.now().isoformat()
         }
+        if profile:
+            response["server_profile"] = result.server_profile
+        return FastJSONResponse(response)
     except Exception as e:
         logger.error(f"Benchmark error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/cassandra")
-async def benchmark_single_cassandra():
+async def benchmark_single_cassandra(profile: bool = Query(False, description=PROFILE_DESCRIPTION)):
     """Run benchmark for Cassandra only"""
     try:
-        result, detailed = benchmark_cassandra()
-        return {
+        result, detailed = await run_in_threadpool(benchmark_cassandra, None, profile)
+        response = {
             "database": "Cassandra",
             "metrics": result.get_summary(),
             "detailed_results": detailed,
             "timestamp": datetime.now().isoformat()
         }
+        if profile:
+            response["server_profile"] = result.server_profile
+        return FastJSONResponse(response)
     except Exception as e:
         logger.error(f"Benchmark error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/redis")
-async def benchmark_single_redis():
+async def benchmark_single_redis(profile: bool = Query(False, description=PROFILE_DESCRIPTION)):
     """Run benchmark for Redis only"""
     try:
-        result, detailed = benchmark_redis()
-        return {
+        result, detailed = await run_in_threadpool(benchmark_redis, None, profile)
+        response = {
             "database": "Redis",
             "metrics": result.get_summary(),
             "detailed_results": detailed,
             "timestamp": datetime.now().isoformat()
         }
+        if profile:
+            response["server_profile"] = result.server_profile
+        return FastJSONResponse(response)
     except Exception as e:
         logger.error(f"Benchmark error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/all")
-async def benchmark_all_databases():
-    """Run benchmark for all databases"""
-    benchmark_start = time.time()
-    
+async def benchmark_all_databases(
+    isolated: bool = Query(False, description="Run databases one after another instead of in parallel"),
+    profile: bool = Query(False, description=PROFILE_DESCRIPTION)
+):
+    """Run benchmark for all databases (blocking; prefer POST /jobs for long runs)"""
     try:
-        # Run benchmarks for all three databases
-        mongo_result, mongo_detailed = benchmark_mongodb()
-        cassandra_result, cassandra_detailed = benchmark_cassandra()
-        redis_result, redis_detailed = benchmark_redis()
-        
-        benchmark_end = time.time()
-        total_duration = benchmark_end - benchmark_start
-        
-        return {
-            "benchmarks": {
-                "mongodb": mongo_result.get_summary(),
-                "cassandra": cassandra_result.get_summary(),
-                "redis": redis_result.get_summary()
-            },
-            "detailed_results": {
-                "mongodb": mongo_detailed,
-                "cassandra": cassandra_detailed,
-                "redis": redis_detailed
-            },
-            "total_duration": total_duration,
-            "timestamp": datetime.now().isoformat()
-        }
+        return FastJSONResponse(
+            await run_in_threadpool(run_benchmarks, list(BENCHMARKS.keys()), isolated, None, profile)
+        )
     except Exception as e:
         logger.error(f"Benchmark error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/writes")
+async def benchmark_writes(
+    databases: Optional[str] = Query(None, description="Comma-separated subset of mongodb,cassandra,redis"),
+    records: int = Query(WRITE_RECORDS, ge=WRITE_BATCH_SIZE, le=100000, description="Records per write workload"),
+    isolated: bool = Query(False, description="Run databases one after another instead of in parallel")
+):
+    """Run the write throughput/latency matrix (write concern x consistency level x pipeline depth)"""
+    try:
+        selected = _parse_databases(databases)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return FastJSONResponse(await run_in_threadpool(run_write_benchmarks, selected, records, isolated))
+    except Exception as e:
+        logger.error(f"Write benchmark error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/cold-warm")
+async def benchmark_cold_warm_endpoint(
+    databases: Optional[str] = Query(None, description="Comma-separated subset of mongodb,cassandra,redis"),
+    isolated: bool = Query(True, description="Run databases one after another so cold runs are not disturbed")
+):
+    """Compare first-request (cold cache, fresh connection) with steady-state latency"""
+    try:
+        selected = _parse_databases(databases)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return FastJSONResponse(await run_in_threadpool(run_cold_warm_benchmarks, selected, isolated))
+    except Exception as e:
+        logger.error(f"Cold/warm benchmark error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/jobs")
+async def submit_benchmark_job(
+    databases: Optional[str] = Query(None, description="Comma-separated subset of mongodb,cassandra,redis"),
+    isolated: bool = Query(False, description="Run databases one after another instead of in parallel"),
+    profile: bool = Query(False, description=PROFILE_DESCRIPTION),
+    suite: str = Query("reads", pattern="^(reads|writes|cold_warm)$",
+                       description="Read benchmarks, the write matrix or cold/warm cache phases"),
+    records: int = Query(WRITE_RECORDS, ge=WRITE_BATCH_SIZE, le=100000, description="Records per write workload")
+):
+    """Submit a benchmark as a background job"""
+    try:
+        selected = _parse_databases(databases)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if suite == 'cold_warm':
+        job = job_manager.submit(
+            JOB_KIND,
+            lambda job: cold_warm_benchmark_job(job, selected, isolated),
+            params={'suite': suite, 'databases': selected, 'isolated': isolated}
+        )
+    elif suite == 'writes':
+        job = job_manager.submit(
+            JOB_KIND,
+            lambda job: write_benchmark_job(job, selected, records, isolated),
+            params={'suite': suite, 'databases': selected, 'records': records, 'isolated': isolated}
+        )
+    else:
+        job = job_manager.submit(
+            JOB_KIND,
+            lambda job: benchmark_job(job, selected, isolated, profile),
+            params={'suite': suite, 'databases': selected, 'isolated': isolated, 'profile': profile}
+        )
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "events_url": f"/api/benchmark/jobs/{job.id}/events"
+    }
+
+
+@router.get("/jobs")
+async def list_benchmark_jobs():
+    """List recent benchmark jobs"""
+    return {"jobs": [job.to_dict(include_result=False) for job in job_manager.list(JOB_KIND)]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_benchmark_job(job_id: str):
+    """Get the current state (and result, once finished) of a benchmark job"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind != JOB_KIND:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return FastJSONResponse(job.to_dict())
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_benchmark_job(job_id: str):
+    """Cancel a running benchmark job"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind != JOB_KIND:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job_manager.cancel(job_id).to_dict(include_result=False)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_benchmark_job(job_id: str):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    job = job_manager.get(job_id)
+    if job is None or job.kind != JOB_KIND:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    async def event_stream():
+        current = job
+        last_version = -1
+        last_sent = time.monotonic()
+        while True:
+            # A job running in another worker is re-read from its published state
+            if not isinstance(current, Job):
+                current = await run_in_threadpool(job_manager.get, job_id) or current
+            if current.finished:
+                yield f"event: {current.status}\ndata: {dumps(current.to_dict()).decode()}\n\n"
+                return
+            if current.version != last_version:
+                last_version = current.version
+                last_sent = time.monotonic()
+                yield f"event: progress\ndata: {dumps(current.to_dict(include_result=False)).decode()}\n\n"
+            elif time.monotonic() - last_sent > SSE_HEARTBEAT:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so nginx forwards events as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/info")
 async def get_benchmark_info():
     """Get benchmark configuration information"""
     return {
         "benchmark_queries": BENCHMARK_QUERIES,
         "query_batch_size": QUERY_BATCH_SIZE,
-        "total_queries_per_db": BENCHMARK_QUERIES + (3 * QUERY_BATCH_SIZE),
+        "total_queries_per_db": TOTAL_QUERIES_PER_DB,
+        "write_benchmark": {
+            "records": WRITE_RECORDS,
+            "batch_size": WRITE_BATCH_SIZE,
+            "workloads": WRITE_WORKLOADS,
+            "mongodb_write_concerns": list(mongo_service.WRITE_CONCERNS),
+            "cassandra_consistency_levels": list(cassandra_service.CONSISTENCY_LEVELS),
+            "redis_pipeline_depths": REDIS_PIPELINE_DEPTHS
+        },
         "description": "Database benchmarking compares query performance across MongoDB, Cassandra, and Redis"
     }
 
 
-def benchmark_mongodb_detailed(label: str = "benchmark") -> tuple[BenchmarkResult, List[Dict[str, float]]]:
+def _synthetic_benchmark_payload(entries: int) -> Dict[str, Any]:
+    """A run_benchmarks-shaped result with many detailed_results entries"""
+    operations = ['get_all'] + [f'get_by_species_{species}' for species in SPECIES_LIST]
+    results = {}
+    for db in BENCHMARKS:
+        result = BenchmarkResult()
+        detailed = []
+        for i in range(entries):
+            time_ms = random.uniform(0.5, 25.0)
+            result.add_time(time_ms)
+            detailed.append({'time': time_ms, 'operation': operations[i % len(operations)], 'query_num': i + 1})
+        results[db] = {"metrics": result.get_summary(), "detailed_results": detailed}
+    return {"results": results, "timestamp": datetime.now().isoformat()}
+
+
+def _stdlib_encode(payload: Any) -> bytes:
+    """FastAPI's default path: jsonable_encoder followed by stdlib json"""
+    return json.dumps(jsonable_encoder(payload, custom_encoder={np.generic: lambda value: value.item()})).encode()
+
+
+def _time_encoder(encode: Callable[[Any], bytes], payload: Any, iterations: int) -> Dict[str, float]:
+    """Average encoding time and output size of one encoder"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        body = encode(payload)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {"avg_ms": elapsed_ms / iterations, "bytes": len(body)}
+
+
+def benchmark_serialization(iterations: int = SERIALIZATION_ITERATIONS,
+                            entries: int = SERIALIZATION_DETAILED_ENTRIES) -> Dict[str, Any]:
+    """Compare stdlib and orjson encoding of the scatter and benchmark payloads"""
+    scatter = analysis_service.get_scatter_data(df=shared_state.dataset_snapshot())
+    payloads = {
+        "scatter": (scatter, len(scatter['bill_scatter']) + len(scatter['flipper_scatter'])),
+        "benchmark_detailed_results": (_synthetic_benchmark_payload(entries), entries * len(BENCHMARKS))
+    }
+    
+    results = {}
+    for name, (payload, items) in payloads.items():
+        before = _time_encoder(_stdlib_encode, payload, iterations)
+        after = _time_encoder(dumps, payload, iterations)
+        results[name] = {
+            "items": items,
+            "stdlib": before,
+            "orjson": after,
+            "speedup": before['avg_ms'] / after['avg_ms'] if after['avg_ms'] > 0 else 0
+        }
+    
+    return {"iterations": iterations, "payloads": results, "timestamp": datetime.now().isoformat()}
+
+
+@router.post("/serialization")
+async def benchmark_serialization_endpoint(
+    iterations: int = Query(SERIALIZATION_ITERATIONS, ge=1, le=1000, description="Encodings timed per payload"),
+    entries: int = Query(SERIALIZATION_DETAILED_ENTRIES, ge=1, le=100000,
+                         description="Synthetic detailed_results entries per database")
+):
+    """Time response encoding before (jsonable_encoder + json) and after (orjson)"""
+    try:
+        return await run_in_threadpool(benchmark_serialization, iterations, entries)
+    except Exception as e:
+        logger.error(f"Serialization benchmark error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _time_fetch(store: str, fields: Optional[List[str]], iterations: int) -> Dict[str, Any]:
+    """Average fetch time and decoded size of get_penguins with a projection"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        penguins = get_penguins(store, fields)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {
+        "fields": len(fields) if fields else len(penguins[0]) if penguins else 0,
+        "avg_ms": elapsed_ms / iterations,
+        "bytes": len(dumps(penguins))
+    }
+
+
+def benchmark_projection(databases: List[str], iterations: int = PROJECTION_ITERATIONS,
+                         fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Compare fetching every field with fetching only the fields an endpoint needs"""
+    fields = fields or PROJECTION_FIELDS
+    results = {}
+    for db in databases:
+        try:
+            full = _time_fetch(db, None, iterations)
+            projected = _time_fetch(db, fields, iterations)
+            results[db] = {
+                "all_fields": full,
+                "projected": projected,
+                "speedup": full['avg_ms'] / projected['avg_ms'] if projected['avg_ms'] > 0 else 0,
+                "bytes_ratio": projected['bytes'] / full['bytes'] if full['bytes'] else 0
+            }
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Projection benchmark error for {db}: {e}")
+            results[db] = {"error": str(e)}
+    return {"iterations": iterations, "fields": fields, "results": results, "timestamp": datetime.now().isoformat()}
+
+
+@router.post("/projection")
+async def benchmark_projection_endpoint(
+    databases: Optional[str] = Query(None, description="Comma-separated subset of mongodb,cassandra,redis"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to project (default: the /api/part3/simple columns)"),
+    iterations: int = Query(PROJECTION_ITERATIONS, ge=1, le=1000, description="Fetches timed per variant")
+):
+    """Time full-document reads against projected reads in each store"""
+    try:
+        selected = _parse_databases(databases)
+        field_list = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        return await run_in_threadpool(benchmark_projection, selected, iterations, field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Projection benchmark error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def benchmark_mongodb_detailed(label: str = "benchmark", on_progress: Optional[ProgressCallback] = None,
+                               profile: bool = False) -> tuple[BenchmarkResult, List[Dict[str, float]]]:
     """Benchmark MongoDB with detailed operation tracking"""
     result = BenchmarkResult()
     detailed = []
@@ -261,33 +1048,18 @@ def benchmark_mongodb_detailed(label: str = "benchmark") -> tuple[BenchmarkResul
     try:
         # Test 1: Get all penguins (10 queries)
         for i in range(BENCHMARK_QUERIES):
-            start = time.time()
-            penguins = mongo_service.get_all_penguins()
-            end = time.time()
-            time_ms = (end - start) * 1000
-            result.add_time(time_ms)
-            detailed.append({
-                'time': time_ms,
-                'operation': 'get_all',
-                'query_num': i + 1,
-                'label': label
-            })
+            _timed_query(result, detailed, 'get_all', mongo_service.get_all_penguins, on_progress,
+                         query_num=i + 1, label=label)
         
         # Test 2: Get by species (5 queries per species)
-        species_list = ['Adelie', 'Chinstrap', 'Gentoo']
-        for species in species_list:
+        for species in SPECIES_LIST:
             for i in range(QUERY_BATCH_SIZE):
-                start = time.time()
-                penguins = mongo_service.get_penguins_by_species(species)
-                end = time.time()
-                time_ms = (end - start) * 1000
-                result.add_time(time_ms)
-                detailed.append({
-                    'time': time_ms,
-                    'operation': f'get_by_species_{species}',
-                    'query_num': i + 1,
-                    'label': label
-                })
+                _timed_query(result, detailed, f'get_by_species_{species}',
+                             lambda: mongo_service.get_penguins_by_species(species), on_progress,
+                             query_num=i + 1, label=label)
+        
+        if profile:
+            result.server_profile = profile_mongodb(detailed)
         
         logger.info(f"MongoDB {label} benchmark completed: {result.total_queries} queries")
     except Exception as e:
@@ -297,35 +1069,79 @@ def benchmark_mongodb_detailed(label: str = "benchmark") -> tuple[BenchmarkResul
     return result, detailed
 
 
+class ShardingRequest(BaseModel):
+    """Shard key options for the sharding benchmark"""
+    shard_key: Dict[str, Union[int, str]] = Field(
+        default_factory=lambda: {'species': 1},
+        description="Key document, e.g. {'species': 1, 'sampleNumber': 1} or {'_id': 'hashed'}"
+    )
+    presplit_chunks: int = Field(0, ge=0, le=1024, description="Pre-split into this many chunks (0 = leave to MongoDB)")
+    balance: bool = Field(True, description="Spread chunks across shards before the 'after' phase")
+    reshard: bool = Field(False, description="Reshard if the collection is already sharded on another key")
+    profile: bool = Field(True, description="Attach explain('executionStats') to both comparison phases")
+
+
+def _query_routing() -> Dict[str, Dict[str, Any]]:
+    """Whether each benchmark query is targeted to one shard or scatter-gather"""
+    return {
+        operation: mongo_service.explain_query_routing(query_filter)
+        for operation, query_filter in _benchmark_query_filters().items()
+    }
+
+
+def _enable_sharding(options: ShardingRequest) -> Dict[str, Any]:
+    """Enable sharding with the requested key, pre-splitting and balancing"""
+    return mongo_service.enable_sharding(
+        shard_key=options.shard_key,
+        presplit_chunks=options.presplit_chunks,
+        balance=options.balance,
+        reshard=options.reshard
+    )
+
+
+def _run_phase(label: str, profile: bool = False) -> Dict[str, Any]:
+    """Benchmark one sharding phase and capture how its queries are routed"""
+    result, detailed = benchmark_mongodb_detailed(label, profile=profile)
+    phase = {
+        "metrics": result.get_summary(),
+        "detailed_results": detailed,
+        "query_routing": _query_routing()
+    }
+    if profile:
+        phase["server_profile"] = result.server_profile
+    return phase
+
+
 @router.post("/sharding/before")
-async def benchmark_before_sharding():
+async def benchmark_before_sharding(profile: bool = Query(False, description=PROFILE_DESCRIPTION)):
     """Benchmark MongoDB BEFORE sharding is enabled"""
     try:
         # Ensure indexes exist
-        mongo_service.create_indexes()
+        await run_in_threadpool(mongo_service.create_indexes)
         
         # Run benchmark before sharding
-        result, detailed = benchmark_mongodb_detailed("before_sharding")
-        summary = result.get_summary()
+        phase = await run_in_threadpool(_run_phase, "before_sharding", profile)
         
-        return {
+        return FastJSONResponse({
             "phase": "before_sharding",
             "description": "Benchmark without sharding enabled - single node operation",
-            "metrics": summary,
-            "detailed_results": detailed,
+            **phase,
             "timestamp": datetime.now().isoformat()
-        }
+        })
     except Exception as e:
         logger.error(f"Benchmark error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/sharding/enable")
-async def enable_mongodb_sharding():
+async def enable_mongodb_sharding(options: Optional[ShardingRequest] = None):
     """Enable sharding on MongoDB collection"""
+    options = options or ShardingRequest()
     try:
-        sharding_result = mongo_service.enable_sharding(shard_key='species')
-        sharding_status = mongo_service.get_sharding_status()
+        sharding_result = await run_in_threadpool(_enable_sharding, options)
+        if sharding_result.get('status') == 'error':
+            raise HTTPException(status_code=400, detail=sharding_result['message'])
+        sharding_status = await run_in_threadpool(mongo_service.get_sharding_status)
         
         return {
             "action": "enable_sharding",
@@ -333,100 +1149,118 @@ async def enable_mongodb_sharding():
             "sharding_status": sharding_status,
             "timestamp": datetime.now().isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Sharding error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/sharding/after")
-async def benchmark_after_sharding():
+async def benchmark_after_sharding(profile: bool = Query(False, description=PROFILE_DESCRIPTION)):
     """Benchmark MongoDB AFTER sharding is enabled"""
     try:
         # Run benchmark after sharding
-        result, detailed = benchmark_mongodb_detailed("after_sharding")
-        summary = result.get_summary()
-        sharding_status = mongo_service.get_sharding_status()
+        phase = await run_in_threadpool(_run_phase, "after_sharding", profile)
+        sharding_status = await run_in_threadpool(mongo_service.get_sharding_status)
         
-        return {
+        return FastJSONResponse({
             "phase": "after_sharding",
             "description": "Benchmark with sharding enabled - distributed operation",
-            "metrics": summary,
             "sharding_status": sharding_status,
-            "detailed_results": detailed,
+            **phase,
             "timestamp": datetime.now().isoformat()
-        }
+        })
     except Exception as e:
         logger.error(f"Benchmark error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sharding_comparison(options: ShardingRequest) -> Dict[str, Any]:
+    """Run before -> enable -> after and compare the two phases"""
+    # Phase 1: Benchmark before sharding
+    mongo_service.create_indexes()
+    before = _run_phase("before_sharding", options.profile)
+    before_summary = before['metrics']
+    
+    # Phase 2: Enable sharding, pre-split and balance
+    sharding_result = _enable_sharding(options)
+    if sharding_result.get('status') == 'error':
+        raise ValueError(sharding_result['message'])
+    
+    # Wait a moment for sharding to stabilize
+    time.sleep(1)
+    
+    # Phase 3: Benchmark after sharding
+    after = _run_phase("after_sharding", options.profile)
+    after_summary = after['metrics']
+    sharding_status = mongo_service.get_sharding_status()
+    
+    # Calculate improvements
+    improvement = {}
+    if before_summary['avg_time'] > 0:
+        improvement['avg_time_improvement'] = (
+            (before_summary['avg_time'] - after_summary['avg_time']) / 
+            before_summary['avg_time'] * 100
+        )
+        improvement['throughput_improvement'] = (
+            (after_summary['throughput'] - before_summary['throughput']) / 
+            before_summary['throughput'] * 100 if before_summary['throughput'] > 0 else 0
+        )
+    
+    key = sharding_result.get('shard_key', options.shard_key)
+    
+    return {
+        "comparison": {
+            "before_sharding": {
+                "description": "Single node operation without sharding",
+                "metrics": before_summary,
+                "queries": len(before['detailed_results']),
+                "query_routing": before['query_routing'],
+                "server_profile": before.get('server_profile')
+            },
+            "sharding_action": sharding_result,
+            "after_sharding": {
+                "description": f"Distributed operation with sharding on {key} key",
+                "metrics": after_summary,
+                "queries": len(after['detailed_results']),
+                "query_routing": after['query_routing'],
+                "server_profile": after.get('server_profile'),
+                "distribution": sharding_status.get('distribution')
+            }
+        },
+        "improvement_metrics": {
+            "avg_time_improvement_percent": improvement.get('avg_time_improvement', 0),
+            "throughput_improvement_percent": improvement.get('throughput_improvement', 0),
+            "note": "Positive improvement % means after sharding is faster"
+        },
+        "comparison_table": {
+            "metric": ["Avg Time (ms)", "Min Time (ms)", "Max Time (ms)", "Throughput (req/s)"],
+            "before": [
+                round(before_summary['avg_time'], 2),
+                round(before_summary['min_time'], 2),
+                round(before_summary['max_time'], 2),
+                round(before_summary['throughput'], 2)
+            ],
+            "after": [
+                round(after_summary['avg_time'], 2),
+                round(after_summary['min_time'], 2),
+                round(after_summary['max_time'], 2),
+                round(after_summary['throughput'], 2)
+            ]
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 @router.post("/sharding/comparison")
-async def sharding_comparison():
+async def sharding_comparison(options: Optional[ShardingRequest] = None):
     """Run complete sharding comparison: before -> enable -> after"""
+    options = options or ShardingRequest()
     try:
-        # Phase 1: Benchmark before sharding
-        mongo_service.create_indexes()
-        before_result, before_detailed = benchmark_mongodb_detailed("before_sharding")
-        before_summary = before_result.get_summary()
-        
-        # Phase 2: Enable sharding
-        sharding_result = mongo_service.enable_sharding(shard_key='species')
-        
-        # Wait a moment for sharding to stabilize
-        time.sleep(1)
-        
-        # Phase 3: Benchmark after sharding
-        after_result, after_detailed = benchmark_mongodb_detailed("after_sharding")
-        after_summary = after_result.get_summary()
-        
-        # Calculate improvements
-        improvement = {}
-        if before_summary['avg_time'] > 0:
-            improvement['avg_time_improvement'] = (
-                (before_summary['avg_time'] - after_summary['avg_time']) / 
-                before_summary['avg_time'] * 100
-            )
-            improvement['throughput_improvement'] = (
-                (after_summary['throughput'] - before_summary['throughput']) / 
-                before_summary['throughput'] * 100 if before_summary['throughput'] > 0 else 0
-            )
-        
-        return {
-            "comparison": {
-                "before_sharding": {
-                    "description": "Single node operation without sharding",
-                    "metrics": before_summary,
-                    "queries": len(before_detailed)
-                },
-                "sharding_action": sharding_result,
-                "after_sharding": {
-                    "description": "Distributed operation with sharding on 'species' key",
-                    "metrics": after_summary,
-                    "queries": len(after_detailed)
-                }
-            },
-            "improvement_metrics": {
-                "avg_time_improvement_percent": improvement.get('avg_time_improvement', 0),
-                "throughput_improvement_percent": improvement.get('throughput_improvement', 0),
-                "note": "Positive improvement % means after sharding is faster"
-            },
-            "comparison_table": {
-                "metric": ["Avg Time (ms)", "Min Time (ms)", "Max Time (ms)", "Throughput (req/s)"],
-                "before": [
-                    round(before_summary['avg_time'], 2),
-                    round(before_summary['min_time'], 2),
-                    round(before_summary['max_time'], 2),
-                    round(before_summary['throughput'], 2)
-                ],
-                "after": [
-                    round(after_summary['avg_time'], 2),
-                    round(after_summary['min_time'], 2),
-                    round(after_summary['max_time'], 2),
-                    round(after_summary['throughput'], 2)
-                ]
-            },
-            "timestamp": datetime.now().isoformat()
-        }
+        return await run_in_threadpool(_sharding_comparison, options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Sharding comparison error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
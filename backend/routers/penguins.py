@@ -0,0 +1,97 @@
+"""
+Raw penguin records with cursor-based pagination
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import base64
+import binascii
+import orjson
+import logging
+
+from database import mongo_service, cassandra_service, redis_service
+from fields import STORE_PATTERN
+from responses import FastJSONResponse, dumps
+from services.cache import response_cache
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def _encode_cursor(store: str, species: Optional[str], key: Any) -> Optional[str]:
+    """Opaque cursor carrying the store, the species filter and the resume key"""
+    if key is None:
+        return None
+    payload = dumps({'store': store, 'species': species, 'key': key})
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: Optional[str], store: str, species: Optional[str]) -> Any:
+    """Resume key from a cursor, checking it was issued for the same query"""
+    if not cursor:
+        return None
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or payload.get('store') != store or payload.get('species') != species:
+        raise ValueError("Cursor was issued for a different store or species filter")
+    return payload.get('key')
+
+
+def fetch_page(store: str, key: Any, limit: int, species: Optional[str] = None) -> Tuple[List[Dict], Any]:
+    """One page from the chosen store and the key to resume from (None when done)"""
+    if store == 'mongodb':
+        return mongo_service.get_penguins_page(tuple(key) if key else None, limit, species)
+    if store == 'cassandra':
+        page, paging_state = cassandra_service.get_penguins_page(bytes.fromhex(key) if key else None, limit, species)
+        return page, paging_state.hex() if paging_state else None
+    if species:
+        return redis_service.get_penguins_by_species_page(species, key or 0, limit)
+    return redis_service.get_penguins_page(tuple(key) if key else None, limit, response_cache.dataset_version())
+
+
+def _stream_pages(store: str, key: Any, limit: int, species: Optional[str]) -> Iterator[bytes]:
+    """NDJSON lines, fetching one page at a time until the store is exhausted"""
+    while True:
+        page, key = fetch_page(store, key, limit, species)
+        if page:
+            yield b''.join(dumps(penguin) + b'\n' for penguin in page)
+        if key is None:
+            return
+
+
+@router.get("")
+async def list_penguins(
+    store: str = Query("mongodb", pattern=STORE_PATTERN, description="Backing store to read from"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Records per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    species: Optional[str] = Query(None, description="Only return this species"),
+    format: str = Query("json", pattern="^(json|ndjson)$",
+                        description="One JSON page, or NDJSON streaming every page from the cursor on")
+):
+    """Browse raw penguin records page by page"""
+    try:
+        key = _decode_cursor(cursor, store, species)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == 'ndjson':
+        return StreamingResponse(_stream_pages(store, key, limit, species), media_type="application/x-ndjson")
+
+    try:
+        page, next_key = await run_in_threadpool(fetch_page, store, key, limit, species)
+        response: Dict[str, Any] = {
+            "store": store,
+            "count": len(page),
+            "items": page,
+            "next_cursor": _encode_cursor(store, species, next_key)
+        }
+        return FastJSONResponse(response)
+    except Exception as e:
+        logger.error(f"Error listing penguins from {store}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,82 @@
+"""
+Sampling profiler controls and results
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+import logging
+
+from responses import FastJSONResponse
+from services.profiler import profiler_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_REQUESTS = 100
+
+
+@router.post("/routes")
+async def arm_route_profile(
+    path: str = Query(..., description="Request path to profile, e.g. /api/part2/scatter"),
+    requests: int = Query(1, ge=1, le=MAX_PROFILE_REQUESTS, description="Number of upcoming requests to capture"),
+    interval_ms: float = Query(None, ge=0.5, le=100, description="Sampling interval (default PROFILER_INTERVAL_MS)")
+):
+    """Sample the next requests to a path"""
+    try:
+        profile = profiler_service.arm_route(path, requests, interval_ms)
+        return profile.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/routes")
+async def disarm_route_profile(path: str = Query(..., description="Request path armed earlier")):
+    """Stop waiting for requests to a path and keep what was captured"""
+    profile = profiler_service.disarm(path)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No profile armed for {path}")
+    return profile.to_dict()
+
+
+@router.post("/process")
+async def profile_process(
+    seconds: float = Query(5.0, gt=0, le=MAX_PROFILE_SECONDS, description="How long to sample"),
+    interval_ms: float = Query(None, ge=0.5, le=100, description="Sampling interval (default PROFILER_INTERVAL_MS)")
+):
+    """Sample every thread of this worker for a while"""
+    try:
+        profile = await run_in_threadpool(profiler_service.profile_process, seconds, interval_ms)
+        return profile.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in /process: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """List recent profiles of this worker"""
+    return {"profiles": [profile.to_dict() for profile in profiler_service.list()]}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed|summary)$",
+                        description="speedscope JSON, collapsed stacks, or the summary only")
+):
+    """Download a profile (open speedscope files at https://www.speedscope.app)"""
+    profile = profiler_service.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    if format == 'summary':
+        return profile.to_dict()
+    if format == 'collapsed':
+        return PlainTextResponse(profile.collapsed(), headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile_id}.collapsed.txt"'
+        })
+    return FastJSONResponse(profile.speedscope(), headers={
+        "Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'
+    })
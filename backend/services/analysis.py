@@ -3,161 +3,271 @@ Analysis services for Parts 1-4
 """
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Tuple
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.neighbors import KNeighborsClassifier
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple, Union
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
-from scipy import stats
 import logging
-import joblib
+import json
 import os
+import threading
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 
+from config import settings
+from fields import resolve_field
+from metrics import timed, timer
+from services.dataset import (
+    CATEGORY_COLUMNS, NUMERIC_COLUMNS, build_frame, decimal_values, finite_or_none, group_codes, memory_usage
+)
+from services.cache import response_cache
+from services.binning import SortedColumn, bin_edges, equal_width_edges
+from services.evaluation import (
+    MODEL_KEYS, classifier_params, cross_validate, describe_params, hyperparameter_search, make_classifier,
+    trainable_params
+)
+from services.downsampling import (
+    SCATTER_MODES, grid_bins, hex_bins, in_bounds, resolve_bounds, stratified_sample, uniform_sample
+)
+from services.model_registry import ModelRegistry
+from services.online_learning import DriftMonitor, append_knn, grow_forest
+from services.online_stats import CoMoments, ColumnSummary, FixedHistogram
+from services.regression import (
+    SufficientStats, correlation, fit_all_subsets, fit_ols, grouped_sufficient_stats, select_stats, sufficient_stats
+)
+
 logger = logging.getLogger(__name__)
 MODELS_DIR = Path(__file__).parent.parent / "models"
+CV_RESULTS_PATH = MODELS_DIR / "cv_metrics.json"
+DRIFT_STATE_PATH = MODELS_DIR / "drift.json"
+
+
+def search_results_path(model_key: str) -> Path:
+    """Where the last hyperparameter search of a model family is kept"""
+    return MODELS_DIR / f"{model_key}_search.json"
+
+CLASSIFIER_FIELDS = NUMERIC_COLUMNS + ['species']
+# Inputs of every classifier, in column order, as recorded in the model manifests
+FEATURE_SCHEMA = [{'name': column, 'dtype': 'float64'} for column in NUMERIC_COLUMNS]
+
+# Scatter plot -> (response key, x column, y column, category column)
+SCATTER_PLOTS = {
+    'bill': ('bill_scatter', 'culmenLength', 'culmenDepth', 'species'),
+    'flipper': ('flipper_scatter', 'flipperLength', 'bodyMass', 'sex')
+}
+
+FieldsSpec = Union[None, List[str], Callable[..., List[str]]]
+
+
+def with_group(fields: List[str], group_by: Optional[str]) -> List[str]:
+    """Fields of a method plus its grouping column, if any"""
+    return fields + [group_by] if group_by else fields
+
+
+def uses_fields(fields: FieldsSpec):
+    """Declare the dataset fields an analysis method reads.
+
+    fields is a list, a function of the method's arguments returning one,
+    or None when the method needs every field.
+    """
+    def decorator(method):
+        method.fields = fields
+        return method
+    return decorator
+
+def count_entries(counts: pd.Series, key: str) -> List[Dict[str, Any]]:
+    """Value counts as [{key: value, 'count': n}, ...] in the order given"""
+    return [{key: value, 'count': int(count)} for value, count in counts.items()]
+
+
+def sex_buckets(counts: pd.Series) -> Counter:
+    """Sex value counts folded into MALE, FEMALE and incorrect (anything else, missing included)"""
+    buckets = Counter()
+    for sex, count in counts.items():
+        sex_upper = str(sex).upper() if pd.notna(sex) else ''
+        buckets[sex_upper if sex_upper in ('MALE', 'FEMALE') else 'incorrect'] += int(count)
+    return buckets
+
+
+def sex_entries(buckets: Counter) -> List[Dict[str, Any]]:
+    """MALE, FEMALE and incorrect counts, leaving out empty ones"""
+    return [{'sex': sex, 'count': buckets[sex]} for sex in ('MALE', 'FEMALE', 'incorrect') if buckets[sex] > 0]
+
+
+def histogram_entries(counts: np.ndarray, bin_edges: np.ndarray) -> List[Dict[str, Any]]:
+    """Histogram counts labelled with their bin range"""
+    return [
+        {'bin': f"{bin_edges[i]:.1f}-{bin_edges[i+1]:.1f}", 'count': int(count)}
+        for i, count in enumerate(counts)
+    ]
+
 
 class AnalysisService:
     """Service for data analysis and statistics"""
     
     def __init__(self):
         self.df = None
-        # Classifiers
-        self.classifier_rf = None  # Random Forest
-        self.classifier_knn = None  # K-NN
-        self.classifier_dt = None  # Decision Tree
         self.label_encoders = {}
         self.feature_scaler = None
-        # Model metadata
-        self.model_metadata = {
-            'rf': {'samples': None, 'date': None},
-            'knn': {'samples': None, 'date': None},
-            'dt': {'samples': None, 'date': None}
-        }
+        # Store -> (dataset version, stats of every measurement column or None when slices would be wrong)
+        self._store_stats: Dict[str, Tuple[str, Optional[SufficientStats]]] = {}
+        self._store_stats_lock = threading.Lock()
+        # Persisted classifiers; only manifests are read until a model is used or warmed
+        self.models = ModelRegistry(MODELS_DIR, mmap=settings.MODEL_MMAP, compress=settings.MODEL_COMPRESS,
+                                    keep=settings.MODEL_VERSIONS_KEPT)
+        # Called after the persisted classifiers change (lets other workers reload them)
+        self.on_models_changed: Optional[Callable[[], None]] = None
         # Create models directory if it doesn't exist
         MODELS_DIR.mkdir(parents=True, exist_ok=True)
-        # Load classifiers if they exist
-        self._load_classifiers()
-    
-    def _load_classifier(self):
-        """Load classifier from disk if available"""
-        classifier_path = MODELS_DIR / "classifier.pkl"
-        if classifier_path.exists():
-            try:
-                self.classifier_rf = joblib.load(classifier_path)
-                logger.info("Loaded classifier from disk")
-                # Load metadata
-                self._load_model_metadata()
-            except Exception as e:
-                logger.error(f"Failed to load classifier: {e}")
-                self.classifier_rf = None
-    
-    def _load_classifiers(self):
-        """Load all classifiers from disk if available"""
-        models = {
-            'rf': ('classifier_rf', 'rf_classifier.pkl'),
-            'knn': ('classifier_knn', 'knn_classifier.pkl'),
-            'dt': ('classifier_dt', 'dt_classifier.pkl')
-        }
-        
-        for model_key, (attr_name, filename) in models.items():
-            classifier_path = MODELS_DIR / filename
-            if classifier_path.exists():
-                try:
-                    classifier = joblib.load(classifier_path)
-                    setattr(self, attr_name, classifier)
-                    logger.info(f"Loaded {model_key.upper()} classifier from disk")
-                except Exception as e:
-                    logger.error(f"Failed to load {model_key.upper()} classifier: {e}")
-        
-        # Load metadata for all models
-        self._load_all_model_metadata()
-    
-    def _load_model_metadata(self):
-        """Load model metadata from disk"""
-        metadata_path = MODELS_DIR / "model_metadata.txt"
-        if metadata_path.exists():
-            try:
-                with open(metadata_path, 'r') as f:
-                    lines = f.readlines()
-                    if len(lines) >= 2:
-                        self.model_metadata['rf']['samples'] = int(lines[0].strip().split(': ')[1])
-                        self.model_metadata['rf']['date'] = lines[1].strip().split(': ', 1)[1]
-            except Exception as e:
-                logger.error(f"Failed to load model metadata: {e}")
-    
-    def _load_all_model_metadata(self):
-        """Load metadata for all models from disk"""
-        for model_key in ['rf', 'knn', 'dt']:
-            metadata_path = MODELS_DIR / f"{model_key}_metadata.txt"
-            if metadata_path.exists():
-                try:
-                    with open(metadata_path, 'r') as f:
-                        lines = f.readlines()
-                        if len(lines) >= 2:
-                            self.model_metadata[model_key]['samples'] = int(lines[0].strip().split(': ')[1])
-                            self.model_metadata[model_key]['date'] = lines[1].strip().split(': ', 1)[1]
-                except Exception as e:
-                    logger.error(f"Failed to load {model_key.upper()} metadata: {e}")
-    
-    def _save_model_metadata(self, samples: int):
-        """Save model metadata to disk"""
-        try:
-            metadata_path = MODELS_DIR / "model_metadata.txt"
-            with open(metadata_path, 'w') as f:
-                f.write(f"samples: {samples}\n")
-                f.write(f"trained_date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            self.model_metadata['rf']['samples'] = samples
-            self.model_metadata['rf']['date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        except Exception as e:
-            logger.error(f"Failed to save model metadata: {e}")
     
-    def _save_classifier(self):
-        """Save classifier to disk"""
-        try:
-            classifier_path = MODELS_DIR / "classifier.pkl"
-            joblib.dump(self.classifier_rf, classifier_path)
-            logger.info("Saved classifier to disk")
-        except Exception as e:
-            logger.error(f"Failed to save classifier: {e}")
+    # Classifiers, loaded from the registry on first use
+    @property
+    def classifier_rf(self):
+        return self.models.get('rf')  # Random Forest
     
-    def _save_all_models(self, model_key: str, classifier, samples: int):
-        """Save classifier and metadata to disk"""
-        try:
-            filename_map = {'rf': 'rf_classifier.pkl', 'knn': 'knn_classifier.pkl', 'dt': 'dt_classifier.pkl'}
-            classifier_path = MODELS_DIR / filename_map[model_key]
-            joblib.dump(classifier, classifier_path)
-            logger.info(f"Saved {model_key.upper()} classifier to disk")
-            
-            # Save metadata
-            metadata_path = MODELS_DIR / f"{model_key}_metadata.txt"
-            with open(metadata_path, 'w') as f:
-                f.write(f"samples: {samples}\n")
-                f.write(f"trained_date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            self.model_metadata[model_key]['samples'] = samples
-            self.model_metadata[model_key]['date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        except Exception as e:
-            logger.error(f"Failed to save {model_key.upper()} model and metadata: {e}")
+    @property
+    def classifier_knn(self):
+        return self.models.get('knn')  # K-NN
+    
+    @property
+    def classifier_dt(self):
+        return self.models.get('dt')  # Decision Tree
+    
+    def reload_classifiers(self):
+        """Drop in-memory classifiers that are no longer the persisted version (reloaded on next use)"""
+        self.models.refresh(MODEL_KEYS)
+    
+    def delete_models(self, models: List[str]):
+        """Remove every persisted version of the given classifiers"""
+        for model_key in models:
+            self.models.delete(model_key)
     
     def load_data(self, penguins: List[Dict]):
-        """Load penguin data into pandas DataFrame"""
-        self.df = pd.DataFrame(penguins)
-        # Clean species names
-        self.df['species'] = self.df['species'].str.strip()
+        """Load penguin data into a typed, compact DataFrame"""
+        self.df = build_frame(penguins)
         logger.info(f"Loaded {len(self.df)} penguins")
     
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """Memory footprint of the loaded dataset"""
+        return memory_usage(self.df)
+    
+    def fields_for(self, method: str, *args, **kwargs) -> Optional[List[str]]:
+        """Fields a method declared with @uses_fields for these arguments (None = all)"""
+        spec = getattr(getattr(type(self), method), 'fields', None)
+        return spec(*args, **kwargs) if callable(spec) else spec
+    
+    def run_projected(self, method: str, fetch: Callable[[Optional[List[str]]], List[Dict]], *args, **kwargs) -> Any:
+        """Fetch only the fields method declares, build a frame from them and run method on it.
+
+        The frame is private to the call, so the shared dataset is left untouched.
+        """
+        df = build_frame(fetch(self.fields_for(method, *args, **kwargs)))
+        with timer('analysis', method):
+            return getattr(self, method)(*args, df=df, **kwargs)
+    
+    def run_streaming(self, method: str, stream: Callable[[Optional[List[str]]], Iterator[List[Dict]]],
+                      *args, **kwargs) -> Any:
+        """Run a streaming method over frames built chunk by chunk from only the fields it declares.
+
+        Memory stays bounded by the chunk size, however large the collection is.
+        """
+        fields = self.fields_for(method, *args, **kwargs)
+        
+        def chunks() -> Iterator[pd.DataFrame]:
+            return (build_frame(chunk) for chunk in stream(fields))
+        
+        with timer('analysis', method):
+            return getattr(self, method)(*args, chunks=chunks, **kwargs)
+    
+    def store_stats(self, store: str, fetch: Callable[[Optional[List[str]]], List[Dict]]) -> Optional[SufficientStats]:
+        """Sufficient statistics of every measurement column of a store, kept per dataset version.
+
+        Any subset of the columns is a slice of these as long as no row is
+        missing only some of them; otherwise None, and callers compute their own.
+        """
+        version = response_cache.dataset_version()
+        cached = self._store_stats.get(store)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._store_stats_lock:
+            cached = self._store_stats.get(store)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            data = build_frame(fetch(NUMERIC_COLUMNS))[NUMERIC_COLUMNS]
+            missing = data.isna()
+            partial_rows = (missing.any(axis=1) & ~missing.all(axis=1)).any()
+            ss = None if partial_rows or missing.all(axis=1).all() else self.regression_stats(NUMERIC_COLUMNS, data)
+            self._store_stats[store] = (version, ss)
+            return ss
+    
+    def run_regression(self, method: str, store: str, fetch: Callable[[Optional[List[str]]], List[Dict]],
+                       *args, **kwargs) -> Any:
+        """Run a Part 3 regression from the cached statistics of the store when they cover it.
+
+        Grouped fits and columns other than the measurements fall back to run_projected.
+        """
+        columns = {resolve_field(name) for name in self.fields_for(method, *args, **kwargs)}
+        if columns <= set(NUMERIC_COLUMNS):
+            ss = self.store_stats(store, fetch)
+            if ss is not None:
+                with timer('analysis', method):
+                    return getattr(self, method)(*args, stats=ss, **kwargs)
+        return self.run_projected(method, fetch, *args, **kwargs)
+    
     # PART 1: DESCRIPTIVE STATISTICS
-    def get_part1_summary(self) -> Dict[str, Any]:
-        """Get descriptive statistics for Part 1"""
-        numeric_cols = ['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass']
+    @staticmethod
+    def group_column(group_by: str) -> str:
+        """Validated categorical column to group by"""
+        col = resolve_field(group_by)
+        if col not in CATEGORY_COLUMNS:
+            raise ValueError(f"Cannot group by {group_by}. Available: {', '.join(CATEGORY_COLUMNS)}")
+        return col
+    
+    def grouped_stats(self, df: pd.DataFrame, columns: List[str], group_by: str) -> List[Tuple[str, SufficientStats]]:
+        """Sufficient statistics of columns for every non-empty group, from one pass over the complete rows"""
+        data = df[columns + [self.group_column(group_by)]].dropna()
+        codes, labels = group_codes(data.iloc[:, -1])
+        groups = grouped_sufficient_stats(decimal_values(data[columns]), codes, len(labels), columns)
+        return [(label, ss) for label, ss in zip(labels, groups) if ss.n > 0]
+    
+    def grouped_numeric_stats(self, df: pd.DataFrame, group_by: str) -> Dict[str, Any]:
+        """Part 1 numeric statistics for every group with a single groupby-reduce"""
+        col = self.group_column(group_by)
+        values = pd.DataFrame({c: decimal_values(df[c]) for c in NUMERIC_COLUMNS}, index=df.index)
+        grouped = values.groupby(df[col], observed=True, sort=True)
+        aggregated = grouped.agg(['count', 'mean', 'median', 'min', 'max', 'std'])
+        sizes = grouped.size()
         
+        groups = {}
+        for label, row in aggregated.iterrows():
+            size = int(sizes[label])
+            groups[str(label)] = {
+                'total_penguins': size,
+                'numeric_stats': [
+                    {
+                        'variable': c,
+                        'mean': finite_or_none(row[(c, 'mean')]),
+                        'median': finite_or_none(row[(c, 'median')]),
+                        'min': finite_or_none(row[(c, 'min')]),
+                        'max': finite_or_none(row[(c, 'max')]),
+                        'std': finite_or_none(row[(c, 'std')]),
+                        'count': int(row[(c, 'count')]),
+                        'missing_count': size - int(row[(c, 'count')])
+                    }
+                    for c in NUMERIC_COLUMNS
+                ]
+            }
+        return groups
+    
+    @uses_fields(None)
+    def get_part1_summary(self, group_by: Optional[str] = None, df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Get descriptive statistics for Part 1, optionally per group as well"""
+        df = self.df if df is None else df
         # Calculate stats for numeric columns
         numeric_stats = []
-        for col in numeric_cols:
-            col_data = pd.to_numeric(self.df[col], errors='coerce')
+        for col in NUMERIC_COLUMNS:
+            col_data = pd.Series(decimal_values(df[col]))
             numeric_stats.append({
                 'variable': col,
                 'mean': float(col_data.mean()) if col_data.notna().sum() > 0 else None,
@@ -171,281 +281,466 @@ class AnalysisService:
         
         # Missing values
         missing_values = {}
-        for col in self.df.columns:
-            missing_count = int(self.df[col].isna().sum())
+        for col in df.columns:
+            missing_count = int(df[col].isna().sum())
             if missing_count > 0:
                 missing_values[col] = missing_count
         
-        # Species counts
-        species_counts = []
-        for species, count in self.df['species'].value_counts().items():
-            species_counts.append({'species': species, 'count': int(count)})
-        
-        # Island counts
-        island_counts = []
-        for island, count in self.df['island'].value_counts().items():
-            island_counts.append({'island': island, 'count': int(count)})
-        
+        species_counts = count_entries(df['species'].value_counts(), 'species')
+        island_counts = count_entries(df['island'].value_counts(), 'island')
         # Sex counts - group non-MALE/FEMALE values as "incorrect"
-        sex_counts = []
-        male_count = 0
-        female_count = 0
-        incorrect_count = 0
-        
-        for sex, count in self.df['sex'].value_counts(dropna=False).items():
-            sex_upper = str(sex).upper() if pd.notna(sex) else ''
-            if sex_upper == 'MALE':
-                male_count += count
-            elif sex_upper == 'FEMALE':
-                female_count += count
-            else:
-                incorrect_count += count
-        
-        if male_count > 0:
-            sex_counts.append({'sex': 'MALE', 'count': int(male_count)})
-        if female_count > 0:
-            sex_counts.append({'sex': 'FEMALE', 'count': int(female_count)})
-        if incorrect_count > 0:
-            sex_counts.append({'sex': 'incorrect', 'count': int(incorrect_count)})
+        sex_counts = sex_entries(sex_buckets(df['sex'].value_counts(dropna=False)))
         
-        return {
-            'total_penguins': len(self.df),
+        summary = {
+            'total_penguins': len(df),
             'missing_values': missing_values,
             'numeric_stats': numeric_stats,
             'species_counts': species_counts,
             'island_counts': island_counts,
             'sex_counts': sex_counts
         }
+        if group_by:
+            summary['group_by'] = group_by
+            summary['groups'] = self.grouped_numeric_stats(df, group_by)
+        return summary
     
-    # PART 2: VISUALIZATION
-    def get_distribution_data(self, variable: str, bins: int = 10) -> Dict[str, Any]:
-        """Get distribution data for a variable"""
-        col_map = {
-            'bill_length_mm': 'culmenLength',
-            'bill_depth_mm': 'culmenDepth',
-            'flipper_length_mm': 'flipperLength',
-            'body_mass_g': 'bodyMass'
+    @uses_fields(None)
+    def stream_part1_summary(self, chunks: Callable[[], Iterator[pd.DataFrame]]) -> Dict[str, Any]:
+        """Part 1 summary from one pass over streamed chunks (medians from quantile sketches)"""
+        numeric = ColumnSummary(NUMERIC_COLUMNS)
+        total = 0
+        present = pd.Series(dtype=np.int64)
+        species = pd.Series(dtype=np.int64)
+        islands = pd.Series(dtype=np.int64)
+        sexes = Counter()
+        for df in chunks():
+            total += len(df)
+            present = present.add(df.notna().sum(), fill_value=0)
+            numeric.update(np.column_stack([decimal_values(df[col]) for col in NUMERIC_COLUMNS]))
+            species = species.add(df['species'].value_counts(), fill_value=0)
+            islands = islands.add(df['island'].value_counts(), fill_value=0)
+            sexes.update(sex_buckets(df['sex'].value_counts(dropna=False)))
+        
+        described = numeric.describe()
+        numeric_stats = [
+            {
+                'variable': col,
+                'mean': finite_or_none(described['mean'][j]),
+                'median': finite_or_none(described['median'][j]),
+                'min': finite_or_none(described['min'][j]),
+                'max': finite_or_none(described['max'][j]),
+                'std': finite_or_none(described['std'][j]),
+                'count': int(described['count'][j]),
+                'missing_count': total - int(described['count'][j])
+            }
+            for j, col in enumerate(NUMERIC_COLUMNS)
+        ]
+        missing = total - present
+        return {
+            'total_penguins': total,
+            'missing_values': {col: int(count) for col, count in missing.items() if count > 0},
+            'numeric_stats': numeric_stats,
+            'species_counts': count_entries(species.sort_values(ascending=False, kind='stable'), 'species'),
+            'island_counts': count_entries(islands.sort_values(ascending=False, kind='stable'), 'island'),
+            'sex_counts': sex_entries(sexes)
         }
-        col = col_map.get(variable, variable)
+    
+    # PART 2: VISUALIZATION
+    @uses_fields(lambda variable, group_by=None: with_group([variable], group_by))
+    def sorted_column(self, variable: str, group_by: Optional[str] = None,
+                      df: Optional[pd.DataFrame] = None) -> SortedColumn:
+        """Sorted values of a numeric variable, and of each group, for histograms and quantiles"""
+        df = self.df if df is None else df
+        col = resolve_field(variable)
         
-        if col not in self.df.columns:
+        if col not in df.columns:
             raise ValueError(f"Unknown variable: {variable}")
         
-        col_data = pd.to_numeric(self.df[col], errors='coerce').dropna()
-        
-        # Histogram
-        counts, bin_edges = np.histogram(col_data, bins=bins)
-        histogram = []
-        for i, count in enumerate(counts):
-            bin_label = f"{bin_edges[i]:.1f}-{bin_edges[i+1]:.1f}"
-            histogram.append({'bin': bin_label, 'count': int(count)})
-        
-        # Quartiles
-        quartiles = {
-            'q0': float(col_data.min()),
-            'q1': float(col_data.quantile(0.25)),
-            'q2': float(col_data.quantile(0.5)),
-            'q3': float(col_data.quantile(0.75)),
-            'q4': float(col_data.max())
-        }
+        col_data = df[col]
+        if not pd.api.types.is_numeric_dtype(col_data):
+            raise ValueError(f"Variable is not numeric: {variable}")
+        valid = col_data.notna()
+        groups = df.loc[valid, self.group_column(group_by)] if group_by else None
+        return SortedColumn(decimal_values(col_data[valid]), groups)
+    
+    @staticmethod
+    def distribution_from_sorted(variable: str, column: SortedColumn, bins: Union[int, str] = 10,
+                                 resolutions: Optional[List[int]] = None,
+                                 group_by: Optional[str] = None) -> Dict[str, Any]:
+        """Distribution of a sorted column: every histogram and quartile is a lookup.
+
+        bins is a bin count or a strategy (fd, sturges, auto) resolved on the
+        overall values; resolutions adds histograms with other bin counts.
+        Groups are histogrammed on the overall bins so they overlay.
+        """
+        if column.count == 0:
+            raise ValueError(f"No values for variable: {variable}")
+        edges = bin_edges(column.values, str(bins))
+        extra_edges = [bin_edges(column.values, str(count)) for count in resolutions or []]
+        
+        def describe(part: SortedColumn) -> Dict[str, Any]:
+            result = {
+                'histogram': histogram_entries(part.histogram(edges), edges),
+                'quartiles': part.quartiles(),
+                'count': part.count,
+                'mean': part.mean,
+                'std': finite_or_none(part.std)
+            }
+            if extra_edges:
+                result['resolutions'] = [
+                    {'bins': len(extra) - 1, 'histogram': histogram_entries(part.histogram(extra), extra)}
+                    for extra in extra_edges
+                ]
+            return result
+        
+        distribution = {'variable': variable, 'bins': len(edges) - 1, 'bin_edges': edges, **describe(column)}
+        if group_by:
+            distribution['group_by'] = group_by
+            distribution['groups'] = {label: describe(part) for label, part in column.groups.items()}
+        return distribution
+    
+    @uses_fields(lambda variable, bins=10, group_by=None: with_group([variable], group_by))
+    def get_distribution_data(self, variable: str, bins: Union[int, str] = 10, group_by: Optional[str] = None,
+                              df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Get distribution data for a variable, optionally per group on the same bins"""
+        column = self.sorted_column(variable, group_by, df=df)
+        return self.distribution_from_sorted(variable, column, bins, group_by=group_by)
+    
+    @uses_fields(lambda variable, bins=10: [variable])
+    def stream_distribution_data(self, variable: str, bins: Union[int, str] = 10,
+                                 chunks: Callable[[], Iterator[pd.DataFrame]] = None) -> Dict[str, Any]:
+        """Distribution of a variable from two passes over streamed chunks.
+
+        The first pass collects moments, the range and a quantile sketch; the
+        second counts the histogram on the same bins np.histogram would use
+        (fd and auto bins use the sketched quartiles).
+        """
+        col = resolve_field(variable)
+        summary = ColumnSummary([col])
+        for df in chunks():
+            if col not in df.columns:
+                raise ValueError(f"Unknown variable: {variable}")
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                raise ValueError(f"Variable is not numeric: {variable}")
+            summary.update(decimal_values(df[col])[:, None])
+        described = {key: values[0] for key, values in summary.describe().items()}
+        if described['count'] == 0:
+            raise ValueError(f"No values for variable: {variable}")
+        
+        edges = equal_width_edges(described['min'], described['max'], int(described['count']),
+                                  described['q1'], described['q3'], str(bins))
+        histogram = FixedHistogram(edges)
+        for df in chunks():
+            histogram.update(decimal_values(df[col]))
         
         return {
             'variable': variable,
-            'histogram': histogram,
-            'quartiles': quartiles,
-            'count': len(col_data),
-            'mean': float(col_data.mean()),
-            'std': float(col_data.std())
+            'bins': len(edges) - 1,
+            'bin_edges': edges,
+            'histogram': histogram_entries(histogram.counts, edges),
+            'quartiles': {
+                'q0': float(described['min']),
+                'q1': float(described['q1']),
+                'q2': float(described['median']),
+                'q3': float(described['q3']),
+                'q4': float(described['max'])
+            },
+            'count': int(described['count']),
+            'mean': float(described['mean']),
+            'std': float(described['std'])
         }
     
-    def get_correlation_matrix(self) -> Dict[str, Any]:
-        """Get correlation matrix for numeric variables"""
-        numeric_cols = ['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass']
-        cor_df = self.df[numeric_cols].corr()
+    @uses_fields(lambda group_by=None: with_group(NUMERIC_COLUMNS, group_by))
+    def get_correlation_matrix(self, group_by: Optional[str] = None,
+                               df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Get correlation matrix for numeric variables, optionally per group"""
+        df = self.df if df is None else df
+        cor_df = df[NUMERIC_COLUMNS].corr()
         
-        variables = numeric_cols
-        correlation_matrix = []
-        for col in numeric_cols:
-            row = []
-            for col2 in numeric_cols:
-                val = cor_df.loc[col, col2]
-                row.append(float(val) if not pd.isna(val) else 0.0)
-            correlation_matrix.append(row)
+        variables = NUMERIC_COLUMNS
+        # Left as a float array; the response layer serializes it natively
+        correlation_matrix = cor_df.fillna(0.0).to_numpy()
         
-        return {
+        result = {
             'variables': variables,
             'correlations': correlation_matrix
         }
+        if group_by:
+            # Per group over rows complete for every variable
+            result['group_by'] = group_by
+            result['groups'] = {
+                label: {'count': ss.n, 'correlations': correlation(ss)}
+                for label, ss in self.grouped_stats(df, NUMERIC_COLUMNS, group_by)
+            }
+        return result
     
-    def get_scatter_data(self) -> Dict[str, Any]:
-        """Get scatter plot data for Part 2 analysis"""
+    @uses_fields(NUMERIC_COLUMNS)
+    def stream_correlation_matrix(self, chunks: Callable[[], Iterator[pd.DataFrame]]) -> Dict[str, Any]:
+        """Correlation matrix from co-moments accumulated over streamed chunks"""
+        moments = CoMoments(NUMERIC_COLUMNS)
+        for df in chunks():
+            moments.update(df[NUMERIC_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan))
+        return {
+            'variables': NUMERIC_COLUMNS,
+            'correlations': np.nan_to_num(moments.correlation(), nan=0.0)
+        }
+    
+    @uses_fields(NUMERIC_COLUMNS + ['species', 'sex'])
+    def get_scatter_data(self, mode: str = 'full', plot: Optional[str] = None, max_points: int = 2000,
+                         width: int = 500, height: int = 400, bin_size: float = 8.0,
+                         bounds: Optional[Dict[str, Optional[float]]] = None, seed: int = 0,
+                         df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Get scatter plot data for Part 2 analysis at a level of detail.
+
+        mode is full (every point), uniform or stratified (at most max_points,
+        the latter in proportion per species/sex), or grid / hexbin (counts per
+        cell of bin_size pixels on a width x height plot). bounds (xmin, xmax,
+        ymin, ymax) restrict one plot to a viewport before reducing it.
+        """
+        df = self.df if df is None else df
+        if mode not in SCATTER_MODES:
+            raise ValueError(f"Unknown scatter mode: {mode}. Choose from {', '.join(SCATTER_MODES)}")
+        if plot is not None and plot not in SCATTER_PLOTS:
+            raise ValueError(f"Unknown plot: {plot}. Choose from {', '.join(SCATTER_PLOTS)}")
+        bounds = {side: value for side, value in (bounds or {}).items() if value is not None}
+        if bounds and plot is None:
+            raise ValueError("Viewport bounds apply to a single plot: set plot to bill or flipper")
+        
         # Prepare data
-        df_clean = self.df[['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass', 'species', 'sex']].copy()
+        df_clean = df[['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass', 'species', 'sex']]
         df_clean = df_clean.dropna(subset=['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass'])
+        rng = np.random.default_rng(seed)
         
-        # Scatter 1: Bill length vs depth by species
-        bill_scatter = []
-        for species in df_clean['species'].unique():
-            species_data = df_clean[df_clean['species'] == species]
-            for _, row in species_data.iterrows():
-                bill_scatter.append({
-                    'x': float(row['culmenLength']),
-                    'y': float(row['culmenDepth']),
-                    'species': species
-                })
-        
-        # Scatter 2: Flipper length vs body mass by sex
-        flipper_scatter = []
-        for sex in df_clean['sex'].unique():
-            if pd.notna(sex) and str(sex).upper() in ['MALE', 'FEMALE']:
-                sex_data = df_clean[df_clean['sex'] == sex]
-                for _, row in sex_data.iterrows():
-                    flipper_scatter.append({
-                        'x': float(row['flipperLength']),
-                        'y': float(row['bodyMass']),
-                        'sex': str(sex).upper()
-                    })
+        result = {}
+        lod = {'mode': mode, 'plots': {}}
+        for name in ([plot] if plot else SCATTER_PLOTS):
+            key, x_col, y_col, category = SCATTER_PLOTS[name]
+            groups = df_clean[category]
+            keep = groups.notna().to_numpy()
+            if category == 'sex':
+                # Only MALE/FEMALE are plotted
+                keep = keep & groups.astype(str).str.upper().isin(['MALE', 'FEMALE']).to_numpy()
+            # Codes in order of first appearance, as groupby(sort=False)
+            codes, uniques = pd.factorize(groups[keep])
+            labels = np.array([str(label).upper() if category == 'sex' else label for label in uniques], dtype=object)
+            # Points keep their float32 values; the response layer writes them natively
+            x = df_clean[x_col].to_numpy()[keep]
+            y = df_clean[y_col].to_numpy()[keep]
+            
+            viewport = resolve_bounds(x, y, **bounds)
+            inside = in_bounds(x, y, viewport)
+            x, y, codes = x[inside], y[inside], codes[inside]
+            
+            if mode in ('grid', 'hexbin'):
+                binning = grid_bins if mode == 'grid' else hex_bins
+                cells = binning(x.astype(np.float64), y.astype(np.float64), codes, viewport, width, height, bin_size)
+                order = np.argsort(cells.codes, kind='stable')
+                result[key] = [
+                    {'x': cx, 'y': cy, category: label, 'count': int(count)}
+                    for cx, cy, label, count in zip(
+                        cells.x[order], cells.y[order], labels[cells.codes[order]], cells.counts[order]
+                    )
+                ]
+            else:
+                if mode == 'uniform':
+                    rows = uniform_sample(len(x), max_points, rng)
+                elif mode == 'stratified':
+                    rows = stratified_sample(codes, max_points, rng)
+                else:
+                    rows = np.arange(len(x))
+                rows = rows[np.argsort(codes[rows], kind='stable')]
+                result[key] = [
+                    {'x': px, 'y': py, category: label}
+                    for px, py, label in zip(x[rows], y[rows], labels[codes[rows]])
+                ]
+            lod['plots'][name] = {
+                'points': int(len(x)),
+                'returned': len(result[key]),
+                'bounds': dict(zip(('xmin', 'xmax', 'ymin', 'ymax'), viewport))
+            }
         
-        return {
-            'bill_scatter': bill_scatter,
-            'flipper_scatter': flipper_scatter
-        }
+        result['lod'] = lod
+        return result
     
     # PART 3: REGRESSION
-    def simple_regression(self, predictor: str, target: str = 'bodyMass') -> Dict[str, Any]:
-        """Perform simple linear regression"""
-        col_map = {
-            'bill_length_mm': 'culmenLength',
-            'bill_depth_mm': 'culmenDepth',
-            'flipper_length_mm': 'flipperLength',
-            'body_mass_g': 'bodyMass'
-        }
-        
-        pred_col = col_map.get(predictor, predictor)
-        tgt_col = col_map.get(target, target)
-        
-        # Clean data
-        data = self.df[[pred_col, tgt_col]].dropna()
+    def regression_stats(self, columns: List[str], df: Optional[pd.DataFrame] = None,
+                         stats: Optional[SufficientStats] = None) -> SufficientStats:
+        """Sufficient statistics of the given columns over their complete rows (sliced from stats if given)"""
+        if stats is not None:
+            return select_stats(stats, columns)
+        df = self.df if df is None else df
+        data = df[columns].dropna()
         if len(data) == 0:
             raise ValueError("No valid data for regression")
-        
-        x = data[pred_col].values.reshape(-1, 1)
-        y = data[tgt_col].values
-        
-        # Fit model
-        from sklearn.linear_model import LinearRegression
-        model = LinearRegression()
-        model.fit(x, y)
-        
-        # Calculate metrics
-        y_pred = model.predict(x)
-        residuals = y - y_pred
-        ss_res = np.sum(residuals ** 2)
-        ss_tot = np.sum((y - np.mean(y)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot)
-        
-        # P-value
-        n = len(x)
-        dof = n - 2
-        t_stat = model.coef_[0] / (np.std(residuals) / np.sqrt(np.sum((x - x.mean()) ** 2)))
-        p_value = 2 * (1 - stats.t.cdf(abs(t_stat), dof))
+        return sufficient_stats(decimal_values(data), columns)
+    
+    @staticmethod
+    def _simple_result(predictor: str, target: str, ss: SufficientStats, pred_col: str, tgt_col: str) -> Dict[str, Any]:
+        fit = fit_ols(ss, [pred_col], tgt_col, names=[predictor])
+        intercept = fit['intercept']
+        coefficient = fit['coefficients'][predictor]
+        equation = None
+        if intercept is not None and coefficient is not None:
+            equation = f"y = {intercept:.2f} + {coefficient:.4f}*x"
         
         return {
             'predictor': predictor,
             'target': target,
-            'intercept': float(model.intercept_),
-            'coefficient': float(model.coef_[0]),
-            'r_squared': float(r_squared),
-            'p_value': float(p_value),
-            'equation': f"y = {model.intercept_:.2f} + {model.coef_[0]:.4f}*x",
-            'residual_std': float(np.std(residuals)),
-            'samples_used': len(data)
+            'intercept': intercept,
+            'coefficient': coefficient,
+            'std_error': fit['std_errors'][predictor],
+            't_stat': fit['t_stats'][predictor],
+            'r_squared': fit['r_squared'],
+            'p_value': fit['p_values'][predictor],
+            'equation': equation,
+            'residual_std': fit['residual_std'],
+            'samples_used': ss.n
         }
     
-    def multiple_regression(self, predictors: List[str], target: str = 'bodyMass') -> Dict[str, Any]:
-        """Perform multiple linear regression"""
-        col_map = {
-            'bill_length_mm': 'culmenLength',
-            'bill_depth_mm': 'culmenDepth',
-            'flipper_length_mm': 'flipperLength',
-            'body_mass_g': 'bodyMass'
-        }
-        
-        pred_cols = [col_map.get(p, p) for p in predictors]
-        tgt_col = col_map.get(target, target)
+    @uses_fields(lambda predictor, target='bodyMass', group_by=None: with_group([predictor, target], group_by))
+    def simple_regression(self, predictor: str, target: str = 'bodyMass', group_by: Optional[str] = None,
+                          df: Optional[pd.DataFrame] = None, stats: Optional[SufficientStats] = None) -> Dict[str, Any]:
+        """Perform simple linear regression (on df if given, else the loaded dataset), optionally per group"""
+        df = self.df if df is None else df
+        pred_col = resolve_field(predictor)
+        tgt_col = resolve_field(target)
+        columns = [pred_col, tgt_col]
         
-        # Clean data
-        all_cols = pred_cols + [tgt_col]
-        data = self.df[all_cols].dropna()
-        if len(data) == 0:
-            raise ValueError("No valid data for regression")
-        
-        x = data[pred_cols].values
-        y = data[tgt_col].values
-        
-        # Fit model
-        from sklearn.linear_model import LinearRegression
-        model = LinearRegression()
-        model.fit(x, y)
+        result = self._simple_result(predictor, target, self.regression_stats(columns, df, stats), pred_col, tgt_col)
+        if group_by:
+            result['group_by'] = group_by
+            result['groups'] = {
+                label: self._simple_result(predictor, target, ss, pred_col, tgt_col)
+                for label, ss in self.grouped_stats(df, columns, group_by)
+            }
+        return result
+    
+    @staticmethod
+    def _multiple_result(predictors: List[str], target: str, ss: SufficientStats,
+                         pred_cols: List[str], tgt_col: str) -> Dict[str, Any]:
+        fit = fit_ols(ss, pred_cols, tgt_col, names=predictors)
         
-        # Calculate metrics
-        y_pred = model.predict(x)
-        residuals = y - y_pred
-        ss_res = np.sum(residuals ** 2)
-        ss_tot = np.sum((y - np.mean(y)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot)
+        return {
+            'predictors': predictors,
+            'target': target,
+            'intercept': fit['intercept'],
+            'coefficients': fit['coefficients'],
+            'std_errors': fit['std_errors'],
+            't_stats': fit['t_stats'],
+            'p_values': fit['p_values'],
+            'r_squared': fit['r_squared'],
+            'adj_r_squared': fit['adj_r_squared'],
+            'p_value': fit['p_value'],
+            'residual_std': fit['residual_std'],
+            'samples_used': ss.n
+        }
+    
+    @uses_fields(lambda predictors, target='bodyMass', group_by=None: with_group(list(predictors) + [target], group_by))
+    def multiple_regression(self, predictors: List[str], target: str = 'bodyMass', group_by: Optional[str] = None,
+                            df: Optional[pd.DataFrame] = None,
+                            stats: Optional[SufficientStats] = None) -> Dict[str, Any]:
+        """Perform multiple linear regression (on df if given, else the loaded dataset), optionally per group"""
+        df = self.df if df is None else df
+        pred_cols = [resolve_field(p) for p in predictors]
+        tgt_col = resolve_field(target)
+        columns = pred_cols + [tgt_col]
         
-        # P-value
-        n = len(x)
-        dof = n - len(pred_cols) - 1
-        f_stat = (ss_tot - ss_res) / (ss_res / dof)
-        p_value = 1 - stats.f.cdf(f_stat, len(pred_cols), dof)
+        result = self._multiple_result(predictors, target, self.regression_stats(columns, df, stats), pred_cols, tgt_col)
+        if group_by:
+            result['group_by'] = group_by
+            result['groups'] = {
+                label: self._multiple_result(predictors, target, ss, pred_cols, tgt_col)
+                for label, ss in self.grouped_stats(df, columns, group_by)
+            }
+        return result
+    
+    @uses_fields(lambda predictors, target='bodyMass': list(predictors) + [target])
+    def all_subsets_regression(self, predictors: List[str], target: str = 'bodyMass',
+                               df: Optional[pd.DataFrame] = None,
+                               stats: Optional[SufficientStats] = None) -> Dict[str, Any]:
+        """Fit every non-empty subset of predictors from one set of sufficient statistics"""
+        pred_cols = [resolve_field(p) for p in predictors]
+        tgt_col = resolve_field(target)
+        if len(set(pred_cols)) != len(pred_cols) or tgt_col in pred_cols:
+            raise ValueError("Predictors must be distinct and must not include the target")
         
-        coefficients = {pred: float(coef) for pred, coef in zip(predictors, model.coef_)}
+        # Complete rows over all candidate columns, so every subset is fitted on the same sample
+        ss = self.regression_stats(pred_cols + [tgt_col], df, stats)
+        models = fit_all_subsets(ss, pred_cols, tgt_col, names=predictors)
+        ranked = sorted(models, key=lambda model: -np.inf if model['adj_r_squared'] is None
+                        else model['adj_r_squared'], reverse=True)
         
         return {
             'predictors': predictors,
             'target': target,
-            'intercept': float(model.intercept_),
-            'coefficients': coefficients,
-            'r_squared': float(r_squared),
-            'p_value': float(p_value),
-            'residual_std': float(np.std(residuals)),
-            'samples_used': len(data)
+            'samples_used': ss.n,
+            'models_evaluated': len(models),
+            'best': ranked[0],
+            'models': ranked
         }
     
     # PART 4: CLASSIFICATION
-    def train_classifier(self):
-        """Train all classifiers (Random Forest, K-NN, Decision Tree)"""
+    @uses_fields(CLASSIFIER_FIELDS)
+    @timed('model')
+    def train_classifier(self, df: Optional[pd.DataFrame] = None, trained_through: Optional[str] = None):
+        """Train all classifiers (Random Forest, K-NN, Decision Tree).
+
+        trained_through is the newest MongoDB _id in df; incremental updates
+        resume from it.
+        """
+        df = self.df if df is None else df
         # Prepare data
-        feature_cols = ['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass']
-        data = self.df[feature_cols + ['species']].dropna()
+        data = df[CLASSIFIER_FIELDS].dropna()
         
-        X = data[feature_cols].values
-        y = data['species'].values
+        X = data[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        y = data['species'].to_numpy(dtype=object)
         n_samples = len(data)
         
-        # Train Random Forest
-        self.classifier_rf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        self.classifier_rf.fit(X, y)
-        self._save_all_models('rf', self.classifier_rf, n_samples)
-        
-        # Train K-NN
-        self.classifier_knn = KNeighborsClassifier(n_neighbors=5)
-        self.classifier_knn.fit(X, y)
-        self._save_all_models('knn', self.classifier_knn, n_samples)
-        
-        # Train Decision Tree
-        self.classifier_dt = DecisionTreeClassifier(random_state=42, max_depth=10)
-        self.classifier_dt.fit(X, y)
-        self._save_all_models('dt', self.classifier_dt, n_samples)
+        # Retraining keeps each model's current hyperparameters (e.g. a promoted search candidate)
+        for model_key in MODEL_KEYS:
+            self._train_model(model_key, X, y, trainable_params(model_key, self.model_params(model_key)),
+                              trained_through=trained_through, update={'kind': 'full'})
+        # New rows are compared with this training set until the next full retrain
+        self._save_drift_monitor(DriftMonitor.fit(X, y, NUMERIC_COLUMNS, sorted(set(y)), trained_through))
         
         logger.info(f"Trained all classifiers on {n_samples} samples")
+        if self.on_models_changed is not None:
+            self.on_models_changed()
     
-    def predict_species(self, bill_length: float, bill_depth: float, flipper_length: float, body_mass: float) -> Dict[str, Any]:
-        """Predict penguin species using Random Forest"""
+    def _train_model(self, model_key: str, X: np.ndarray, y: np.ndarray, params: Dict[str, Any], **info):
+        """Fit one classifier with the given hyperparameters and save it as a new registry version"""
+        n_jobs = {'rf': -1, 'knn': settings.KNN_QUERY_JOBS}.get(model_key)
+        classifier = make_classifier(model_key, params, n_jobs=n_jobs)
+        classifier.fit(X, y)
+        if model_key == 'rf':
+            # Trees are built on every core, but single-row predictions are faster without the thread pool
+            classifier.set_params(n_jobs=1)
+        try:
+            self.models.save(
+                model_key, classifier, samples=len(y), trained_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                features=FEATURE_SCHEMA, target='species', classes=[str(c) for c in classifier.classes_],
+                params=classifier_params(model_key, classifier),
+                metrics={'training_accuracy': float(np.mean(classifier.predict(X) == y))}, **info
+            )
+        except Exception as e:
+            logger.error(f"Failed to save {model_key.upper()} classifier: {e}")
+            self.models.put(model_key, classifier)
+    
+    def model_params(self, model_key: str) -> Dict[str, Any]:
+        """Hyperparameters of the active classifier version, or the defaults when there is none"""
+        entry = self.models.current(model_key)
+        if entry is not None and entry.get('params'):
+            return entry['params']
+        # Imported artifacts predate the manifest and have to be read
+        return classifier_params(model_key, self.models.get(model_key) if entry is not None else None)
+    
+    @uses_fields(CLASSIFIER_FIELDS)
+    @timed('model')
+    def predict_species(self, bill_length: float, bill_depth: float, flipper_length: float, body_mass: float,
+                        df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Predict penguin species using Random Forest (df is only read if the model must be trained)"""
         if self.classifier_rf is None:
-            self.train_classifier()
+            self.train_classifier(df)
         
         X = np.array([[bill_length, bill_depth, flipper_length, body_mass]])
         prediction = self.classifier_rf.predict(X)[0]
@@ -461,17 +756,19 @@ class AnalysisService:
             'confidence': float(max(probabilities))
         }
     
-    def get_classification_metrics(self) -> Dict[str, Any]:
-        """Get classification metrics for all models"""
+    @uses_fields(CLASSIFIER_FIELDS)
+    @timed('model')
+    def get_classification_metrics(self, df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Training-set classification metrics for all models (optimistic; see get_cross_validation)"""
+        df = self.df if df is None else df
         if self.classifier_rf is None:
-            self.train_classifier()
+            self.train_classifier(df)
         
         # Prepare data
-        feature_cols = ['culmenLength', 'culmenDepth', 'flipperLength', 'bodyMass']
-        data = self.df[feature_cols + ['species']].dropna()
+        data = df[CLASSIFIER_FIELDS].dropna()
         
-        X = data[feature_cols].values
-        y = data['species'].values
+        X = data[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        y = data['species'].to_numpy(dtype=object)
         
         metrics_dict = {}
         
@@ -497,15 +794,258 @@ class AnalysisService:
                 'confusion_matrix': {
                     'species': list(classifier.classes_),
                     'matrix': cm.tolist()
-                }
+                },
+                'evaluated_on': 'training_set'
             }
         
         return metrics_dict
     
-    def get_feature_importances(self) -> Dict[str, Any]:
+    def _save_drift_monitor(self, monitor: DriftMonitor):
+        tmp_path = DRIFT_STATE_PATH.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(monitor.to_dict(), f)
+        os.replace(tmp_path, DRIFT_STATE_PATH)
+    
+    def get_drift_monitor(self) -> Optional[DriftMonitor]:
+        """Drift monitor of the last full retrain, if any"""
+        if not DRIFT_STATE_PATH.exists():
+            return None
+        try:
+            with open(DRIFT_STATE_PATH, 'r') as f:
+                return DriftMonitor.from_dict(json.load(f))
+        except Exception as e:
+            logger.error(f"Failed to load drift monitor: {e}")
+            return None
+    
+    def training_watermark(self) -> Optional[str]:
+        """Newest MongoDB _id the models have learned, if known"""
+        monitor = self.get_drift_monitor()
+        return monitor.trained_through if monitor is not None else None
+    
+    def drift_status(self) -> Optional[Dict[str, Any]]:
+        """What the drift monitor would decide now, without new rows"""
+        monitor = self.get_drift_monitor()
+        if monitor is None:
+            return None
+        return {
+            'trained_through': monitor.trained_through,
+            **monitor.check(settings.DRIFT_PSI_THRESHOLD, settings.DRIFT_ACCURACY_DROP, settings.INCREMENTAL_MAX_GROWTH)
+        }
+    
+    @timed('model')
+    def update_classifiers(self, df: pd.DataFrame, newest: Optional[str]) -> Dict[str, Any]:
+        """Learn penguins added since the last update without a full retrain, unless the drift monitor objects.
+
+        df holds only the new rows and newest is the _id to resume from next
+        time. K-NN appends them to its side index and the random forest gets
+        extra trees fitted on them, so the cost grows with the new rows. The
+        decision tree cannot grow and waits for the next full retrain.
+        Returns action 'retrain' (nothing changed, a full retrain is needed),
+        'none' or 'incremental'.
+        """
+        monitor = self.get_drift_monitor()
+        if monitor is None or monitor.trained_through is None:
+            return {'action': 'retrain', 'reasons': ["no record of which rows the models were trained on"]}
+        
+        data = df.reindex(columns=CLASSIFIER_FIELDS).dropna()
+        if data.empty:
+            monitor.trained_through = newest or monitor.trained_through
+            self._save_drift_monitor(monitor)
+            return {'action': 'none', 'trained_through': monitor.trained_through, **monitor.check(
+                settings.DRIFT_PSI_THRESHOLD, settings.DRIFT_ACCURACY_DROP, settings.INCREMENTAL_MAX_GROWTH)}
+        X = data[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        y = data['species'].astype(str).to_numpy(dtype=object)
+        
+        rf, knn = self.classifier_rf, self.classifier_knn
+        if rf is None or not isinstance(knn, Pipeline):
+            return {'action': 'retrain', 'reasons': ["models are missing or predate the scaled K-NN pipeline"]}
+        unseen = sorted(set(y) - set(rf.classes_))
+        if unseen:
+            return {'action': 'retrain', 'reasons': [f"new species: {', '.join(unseen)}"]}
+        
+        rf_entry, knn_entry = self.models.current('rf'), self.models.current('knn')
+        if monitor.reference_accuracy is None:
+            monitor.reference_accuracy = (rf_entry.get('metrics') or {}).get('cv_accuracy_mean')
+        # Prequential check: score the served model on rows it has not learned yet
+        monitor.update(X, y, int(np.sum(rf.predict(X) == y)))
+        decision = monitor.check(settings.DRIFT_PSI_THRESHOLD, settings.DRIFT_ACCURACY_DROP,
+                                 settings.INCREMENTAL_MAX_GROWTH)
+        if decision['retrain']:
+            return {'action': 'retrain', **decision}
+        
+        # Incremental versions keep the hyperparameters of the full retrain they grew from
+        grown = grow_forest(rf, X, y, monitor.samples, rf_entry['params']['n_estimators'], settings.CV_WORKERS)
+        appended = append_knn(knn, X, y, settings.KNN_DELTA_LIMIT)
+        versions = {}
+        for model_key, classifier, entry in (('rf', grown, rf_entry), ('knn', appended, knn_entry)):
+            saved = self.models.save(
+                model_key, classifier, samples=(entry.get('samples') or 0) + len(y),
+                trained_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), features=FEATURE_SCHEMA,
+                target='species', classes=entry.get('classes'), params=entry.get('params'), trained_through=newest,
+                update={'kind': 'incremental', 'base_version': entry['version'], 'appended_rows': len(y)}
+            )
+            versions[model_key] = saved['version']
+        monitor.trained_through = newest
+        self._save_drift_monitor(monitor)
+        logger.info(f"Appended {len(y)} rows to RF v{versions['rf']} ({len(grown.estimators_)} trees) "
+                    f"and K-NN v{versions['knn']}")
+        if self.on_models_changed is not None:
+            self.on_models_changed()
+        return {
+            'action': 'incremental',
+            'new_rows': len(y),
+            'trained_through': newest,
+            'versions': versions,
+            'rf_trees': len(grown.estimators_),
+            'knn_pending_rows': len(appended[-1].delta_codes),
+            **decision
+        }
+    
+    def cross_validate_classifiers(self, df: Optional[pd.DataFrame] = None, models: Optional[List[str]] = None,
+                                   folds: int = 5, stratified: bool = True, workers: Optional[int] = None,
+                                   job=None) -> Dict[str, Any]:
+        """k-fold cross-validated metrics of the classifiers, persisted next to the models.
+
+        Folds of every model are fitted in a pool of at most workers processes
+        (CV_WORKERS by default); job, if given, receives per-fold progress and
+        can cancel the run.
+        """
+        df = self.df if df is None else df
+        data = df[CLASSIFIER_FIELDS].dropna()
+        X = data[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        y = data['species'].astype(str).to_numpy(dtype=object)
+        models = list(models or MODEL_KEYS)
+        
+        def on_fold(result: Dict[str, Any]):
+            if job is not None:
+                job.update_progress(f"{result['model']}:{result['fold']}", {
+                    'fit_seconds': result['fit_seconds'],
+                    'accuracy': float(np.trace(result['confusion_matrix']) / result['test_size'])
+                })
+        
+        results = cross_validate(
+            X, y, models, folds=folds, stratified=stratified, workers=workers or settings.CV_WORKERS,
+            on_fold=on_fold, check_cancelled=job.check_cancelled if job is not None else None,
+            params={model_key: trainable_params(model_key, self.model_params(model_key)) for model_key in models}
+        )
+        results['date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entries = {model_key: self.models.current(model_key) for model_key in models}
+        results['trained_date'] = {key: entry and entry.get('trained_date') for key, entry in entries.items()}
+        self._save_cross_validation(results)
+        # The scores describe the active versions' hyperparameters, so they join their manifest metrics
+        # (except for an unscaled legacy K-NN, which the scaled pipeline evaluated here is not)
+        for model_key, entry in entries.items():
+            if entry is not None and entry.get('scaled_features', True):
+                scores = results['models'][model_key]
+                self.models.annotate(model_key, entry['version'], metrics={
+                    'cv_accuracy_mean': scores['accuracy_mean'], 'cv_accuracy_std': scores['accuracy_std'],
+                    'cv_folds': folds
+                })
+        logger.info(f"Cross-validated {', '.join(models)} with {folds} folds in {results['wall_seconds']:.1f}s")
+        return results
+    
+    def _save_cross_validation(self, results: Dict[str, Any]):
+        """Write cross-validation results atomically, merging models evaluated separately"""
+        saved = self.get_cross_validation() or {}
+        if saved.get('folds') == results['folds'] and saved.get('stratified') == results['stratified']:
+            results = {**results, 'models': {**saved.get('models', {}), **results['models']},
+                       'trained_date': {**saved.get('trained_date', {}), **results['trained_date']}}
+        tmp_path = CV_RESULTS_PATH.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(results, f)
+        os.replace(tmp_path, CV_RESULTS_PATH)
+    
+    def get_cross_validation(self) -> Optional[Dict[str, Any]]:
+        """Last persisted cross-validation results, if any"""
+        if not CV_RESULTS_PATH.exists():
+            return None
+        try:
+            with open(CV_RESULTS_PATH, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load cross-validation results: {e}")
+            return None
+    
+    def search_hyperparameters(self, model_key: str, df: Optional[pd.DataFrame] = None, strategy: str = 'grid',
+                               n_candidates: int = 20, folds: int = 5, workers: Optional[int] = None,
+                               patience: Optional[int] = None, max_latency_ms: Optional[float] = None,
+                               job=None) -> Dict[str, Any]:
+        """Hyperparameter search of one model family, persisted until a candidate is promoted.
+
+        Candidates are evaluated in a pool of at most workers processes
+        (CV_WORKERS by default); job, if given, receives every finished
+        candidate and can cancel the search.
+        """
+        df = self.df if df is None else df
+        data = df[CLASSIFIER_FIELDS].dropna()
+        X = data[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        y = data['species'].astype(str).to_numpy(dtype=object)
+        
+        def on_candidate(candidate: Dict[str, Any]):
+            if job is not None:
+                job.update_progress(f"{candidate['round']}:{candidate['id']}", {
+                    key: candidate[key] for key in ('params', 'fraction', 'accuracy_mean', 'latency_p50_ms')
+                })
+        
+        results = hyperparameter_search(
+            X, y, model_key, strategy=strategy, n_candidates=n_candidates, folds=folds,
+            workers=workers or settings.CV_WORKERS, patience=patience, max_latency_ms=max_latency_ms,
+            on_candidate=on_candidate, check_cancelled=job.check_cancelled if job is not None else None
+        )
+        results['date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        results['current_params'] = self.model_params(model_key)
+        path = search_results_path(model_key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(results, f)
+        os.replace(tmp_path, path)
+        logger.info(f"Searched {len(results['candidates'])} {model_key.upper()} candidates in {results['wall_seconds']:.1f}s")
+        return results
+    
+    def get_hyperparameter_search(self, model_key: str) -> Optional[Dict[str, Any]]:
+        """Last persisted hyperparameter search of a model family, if any"""
+        path = search_results_path(model_key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load {model_key.upper()} search results: {e}")
+            return None
+    
+    @uses_fields(CLASSIFIER_FIELDS)
+    @timed('model')
+    def promote_candidate(self, model_key: str, candidate: Optional[int] = None,
+                          df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """Retrain a model on all data with the parameters of a search candidate (the recommended one by default)"""
+        search = self.get_hyperparameter_search(model_key)
+        if search is None:
+            raise ValueError(f"No hyperparameter search for {model_key}; run one first")
+        if candidate is None:
+            if search.get('recommended') is None:
+                raise ValueError(f"No candidate of the last {model_key} search met its latency budget "
+                                 f"(max_latency_ms={search.get('max_latency_ms')}); pass a candidate id to promote one")
+            candidate = search['recommended']
+        chosen = next((c for c in search['candidates'] if c['id'] == candidate), None)
+        if chosen is None:
+            raise ValueError(f"Candidate {candidate} is not among the final candidates of the last {model_key} search")
+        
+        df = self.df if df is None else df
+        data = df[CLASSIFIER_FIELDS].dropna()
+        X = data[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        y = data['species'].to_numpy(dtype=object)
+        self._train_model(model_key, X, y, chosen['params'])
+        logger.info(f"Promoted {model_key.upper()} candidate {candidate}: {chosen['params']}")
+        if self.on_models_changed is not None:
+            self.on_models_changed()
+        return self.get_model_stats()[model_key]
+    
+    @uses_fields(CLASSIFIER_FIELDS)
+    def get_feature_importances(self, df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
         """Get feature importances for all classifiers that support it"""
         if self.classifier_rf is None:
-            self.train_classifier()
+            self.train_classifier(df)
         
         feature_names = ['bill_length_mm', 'bill_depth_mm', 'flipper_length_mm', 'body_mass_g']
         importances_dict = {}
@@ -531,36 +1071,26 @@ class AnalysisService:
     
     def get_model_stats(self) -> Dict[str, Any]:
         """Get model training statistics for all models"""
-        models_info = {
-            'rf': {
-                'name': 'Random Forest',
-                'description': '100 Estimators',
-                'path': MODELS_DIR / 'rf_classifier.pkl',
-                'exists': (MODELS_DIR / 'rf_classifier.pkl').exists()
-            },
-            'knn': {
-                'name': 'K-Nearest Neighbors',
-                'description': '5 Neighbors',
-                'path': MODELS_DIR / 'knn_classifier.pkl',
-                'exists': (MODELS_DIR / 'knn_classifier.pkl').exists()
-            },
-            'dt': {
-                'name': 'Decision Tree',
-                'description': 'Max Depth 10',
-                'path': MODELS_DIR / 'dt_classifier.pkl',
-                'exists': (MODELS_DIR / 'dt_classifier.pkl').exists()
-            }
-        }
+        names = {'rf': 'Random Forest', 'knn': 'K-Nearest Neighbors', 'dt': 'Decision Tree'}
         
         stats_dict = {}
-        for model_key, info in models_info.items():
+        for model_key, name in names.items():
+            entry = self.models.current(model_key) or {}
+            params = self.model_params(model_key)
             stats_dict[model_key] = {
-                'name': info['name'],
-                'description': info['description'],
-                'exists': info['exists'],
-                'path': str(info['path']),
-                'trained_samples': self.model_metadata[model_key]['samples'],
-                'trained_date': self.model_metadata[model_key]['date']
+                'name': name,
+                'description': describe_params(model_key, params, entry.get('scaled_features', True)),
+                'params': params,
+                'legacy': entry.get('legacy', False),
+                'exists': bool(entry),
+                'path': str(self.models.artifact_path(model_key, entry)) if entry else None,
+                'version': entry.get('version'),
+                'loaded': self.models.is_loaded(model_key),
+                'size_bytes': entry.get('size_bytes'),
+                'checksum': entry.get('checksum'),
+                'metrics': entry.get('metrics'),
+                'trained_samples': entry.get('samples'),
+                'trained_date': entry.get('trained_date')
             }
         
         return stats_dict
@@ -0,0 +1,262 @@
+"""
+Response cache for read-only analysis endpoints
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from config import settings
+from database import mongo_service, redis_service
+from metrics import count_cache
+from responses import FastJSONResponse, dumps
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'cache:dataset_version'
+KEY_PREFIX = 'cache:resp:'
+VERSION_CHECK_INTERVAL = 5.0  # seconds a resolved dataset version is trusted
+LOCK_TTL_MS = 30000           # cross-worker compute lock lifetime
+LOCK_WAIT = 10.0              # seconds to wait for another worker's result
+
+# An entry is (etag, JSON body)
+CacheEntry = Tuple[str, str]
+
+# Query parameter annotation -> validator, shared by every route
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def resolved_params(request: Request) -> Dict[str, Any]:
+    """Query parameters as the endpoint received them.
+
+    Only declared parameters count, missing ones take their default and
+    values are parsed to their declared type (so "10" and "10.0", "true" and
+    "1" agree). Field names keep the caller's spelling, which the responses
+    echo, so an alias gets its own entry.
+    """
+    dependant = getattr(request.scope.get('route'), 'dependant', None)
+    if dependant is None:
+        return dict(request.query_params)
+    params = {}
+    for field in dependant.query_params:
+        value = field.default
+        if field.alias in request.query_params:
+            annotation = field.field_info.annotation
+            if annotation not in _adapters:
+                _adapters[annotation] = TypeAdapter(annotation)
+            try:
+                value = _adapters[annotation].validate_python(request.query_params[field.alias])
+            except Exception:
+                value = request.query_params[field.alias]
+        params[field.name] = value
+    return params
+
+
+class ResponseCache:
+    """Two-tier (in-process LRU, then Redis) cache of JSON responses keyed by dataset version"""
+
+    def __init__(self, local_size: int = 256, ttl: int = 3600, enabled: bool = True):
+        self.local_size = local_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self._local: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._local_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    # Dataset version
+    def dataset_version(self) -> str:
+        """Explicit version counter in Redis combined with a fingerprint of the Mongo collection"""
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked < VERSION_CHECK_INTERVAL:
+            return self._version
+
+        counter = '0'
+        if redis_service.redis is not None:
+            try:
+                counter = redis_service.redis.get(VERSION_KEY) or '0'
+            except Exception as e:
+                logger.warning(f"Cache version lookup failed: {e}")
+        fingerprint = mongo_service.get_dataset_fingerprint()
+
+        self._version = hashlib.sha1(f"{counter}:{fingerprint}".encode()).hexdigest()[:12]
+        self._version_checked = now
+        return self._version
+
+    def invalidate(self) -> str:
+        """Bump the version so every worker stops serving the current entries"""
+        if redis_service.redis is not None:
+            redis_service.redis.incr(VERSION_KEY)
+        with self._local_lock:
+            self._local.clear()
+        self._version = None
+        return self.dataset_version()
+
+    # Keys and stats
+    @staticmethod
+    def make_key(route: str, params: Dict[str, Any], version: str) -> str:
+        """Cache key from the route, its normalized parameters and the dataset version"""
+        normalized = json.dumps(sorted((k, str(v)) for k, v in params.items()))
+        digest = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+        return f"{KEY_PREFIX}{route}:{version}:{digest}"
+
+    def _count(self, route: str, outcome: str):
+        count_cache(route, outcome)
+        with self._stats_lock:
+            counts = self._stats.setdefault(route, {
+                'local_hits': 0, 'redis_hits': 0, 'coalesced': 0, 'misses': 0, 'not_modified': 0
+            })
+            counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and hit ratio per route"""
+        with self._stats_lock:
+            routes = {route: dict(counts) for route, counts in self._stats.items()}
+        for counts in routes.values():
+            hits = counts['local_hits'] + counts['redis_hits'] + counts['coalesced']
+            total = hits + counts['misses']
+            counts['hit_ratio'] = hits / total if total else 0.0
+        return {
+            'enabled': self.enabled,
+            'dataset_version': self._version,
+            'local_entries': len(self._local),
+            'routes': routes
+        }
+
+    # Tiers
+    def _local_get(self, key: str) -> Optional[CacheEntry]:
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+            return entry
+
+    def _local_put(self, key: str, entry: CacheEntry):
+        with self._local_lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _redis_get(self, key: str) -> Optional[CacheEntry]:
+        if redis_service.redis is None:
+            return None
+        try:
+            value = redis_service.redis.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read failed: {e}")
+            return None
+        if value is None:
+            return None
+        etag, _, body = value.partition('\n')
+        return etag, body
+
+    def _redis_put(self, key: str, entry: CacheEntry):
+        if redis_service.redis is None:
+            return
+        try:
+            redis_service.redis.set(key, f"{entry[0]}\n{entry[1]}", ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache write failed: {e}")
+
+    def _compute(self, key: str, compute: Callable[[], Any]) -> Tuple[CacheEntry, bool]:
+        """Compute and store an entry, letting only one worker compute it at a time.
+
+        Returns the entry and whether another worker produced it.
+        """
+        lock_key = f"{key}:lock"
+        locked = False
+        if redis_service.redis is not None:
+            try:
+                locked = bool(redis_service.redis.set(lock_key, '1', nx=True, px=LOCK_TTL_MS))
+                if not locked:
+                    deadline = time.monotonic() + LOCK_WAIT
+                    while time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        entry = self._redis_get(key)
+                        if entry is not None:
+                            return entry, True
+            except Exception as e:
+                logger.warning(f"Cache lock failed: {e}")
+
+        try:
+            body = dumps(compute())
+            etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+            entry = (etag, body.decode())
+            self._redis_put(key, entry)
+            return entry, False
+        finally:
+            if locked:
+                try:
+                    redis_service.redis.delete(lock_key)
+                except Exception:
+                    pass
+
+    async def _get_entry(self, route: str, key: str, compute: Callable[[], Any]) -> CacheEntry:
+        """Local tier, then Redis, then a single-flight computation"""
+        entry = self._local_get(key)
+        if entry is not None:
+            self._count(route, 'local_hits')
+            return entry
+
+        entry = await run_in_threadpool(self._redis_get, key)
+        if entry is not None:
+            self._count(route, 'redis_hits')
+            self._local_put(key, entry)
+            return entry
+
+        # Concurrent misses in this process wait on the first one's computation
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._count(route, 'coalesced')
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry, coalesced = await run_in_threadpool(self._compute, key, compute)
+            self._count(route, 'coalesced' if coalesced else 'misses')
+            self._local_put(key, entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def respond(self, request: Request, route: str, compute: Callable[[], Any]) -> Any:
+        """Serve a cached JSON response for route, honouring If-None-Match"""
+        if not self.enabled:
+            return FastJSONResponse(await run_in_threadpool(compute))
+
+        version = await run_in_threadpool(self.dataset_version)
+        key = self.make_key(route, resolved_params(request), version)
+        etag, body = await self._get_entry(route, key, compute)
+
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'X-Dataset-Version': version}
+        if_none_match = request.headers.get('if-none-match', '')
+        if if_none_match == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self._count(route, 'not_modified')
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    local_size=settings.RESPONSE_CACHE_LOCAL_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
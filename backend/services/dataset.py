@@ -0,0 +1,81 @@
+"""
+Compact columnar representation of the penguins dataset
+"""
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fields import MEASUREMENT_FIELDS, fields_of_type
+from metrics import timed
+
+# Column types come from the schema registry
+FLOAT_COLUMNS = fields_of_type('float32')      # missing values as NaN
+INT_COLUMNS = fields_of_type('int32')          # nullable Int32 (values plus a null mask)
+CATEGORY_COLUMNS = fields_of_type('category')  # categorical codes
+
+# Measurement columns used throughout the analyses
+NUMERIC_COLUMNS = MEASUREMENT_FIELDS
+
+# Decimal digits a float32 value holds reliably
+SIGNIFICANT_DIGITS = 7
+
+
+@timed('dataframe')
+def build_frame(penguins: List[Dict]) -> pd.DataFrame:
+    """Build the typed DataFrame, coercing every column once at load time"""
+    df = pd.DataFrame.from_records(penguins)
+    if 'species' in df.columns:
+        df['species'] = df['species'].str.strip()
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
+    for col in INT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int32')
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def decimal_values(values: Union[pd.Series, pd.DataFrame]) -> np.ndarray:
+    """float64 copy of float32 values that keeps the decimal values as entered.
+
+    A plain upcast exposes float32 rounding (32.1 -> 32.0999985), which moves
+    values sitting exactly on a bin edge or label boundary. Rounding to the 7
+    significant digits float32 holds recovers the entered value without a
+    round trip through strings. Other numeric columns are upcast as they are.
+    """
+    if isinstance(values, pd.DataFrame):
+        return np.column_stack([decimal_values(values[col]) for col in values.columns])
+    data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    if values.dtype != np.float32:
+        return data  # integers and float64 are exact already
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(data)))
+    scale = 10.0 ** (SIGNIFICANT_DIGITS - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+    return np.round(data * scale) / scale
+
+
+def memory_usage(df: pd.DataFrame) -> Dict[str, Any]:
+    """Deep memory footprint of the frame, in total and per row"""
+    total = int(df.memory_usage(deep=True, index=False).sum())
+    return {
+        'rows': len(df),
+        'bytes': total,
+        'bytes_per_row': total / len(df) if len(df) else 0.0
+    }
+
+
+def group_codes(series: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """Integer group codes (-1 where missing) and the label of each code"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), [str(label) for label in series.cat.categories]
+    codes, labels = pd.factorize(series)
+    return codes, [str(label) for label in labels]
+
+
+def finite_or_none(value: float) -> Optional[float]:
+    """Plain float, with NaN/inf (undefined statistics) as None"""
+    return float(value) if np.isfinite(value) else None
@@ -0,0 +1,122 @@
+"""
+Level-of-detail reduction of scatter plots: viewport bounds, sampling and 2-D binning
+"""
+import numpy as np
+from typing import NamedTuple, Optional, Tuple
+
+SCATTER_MODES = ('full', 'uniform', 'stratified', 'grid', 'hexbin')
+
+# (xmin, xmax, ymin, ymax)
+Bounds = Tuple[float, float, float, float]
+
+
+class Bins(NamedTuple):
+    """Occupied cells of a 2-D binning, one row per (cell, category)"""
+    x: np.ndarray       # cell centers in data units
+    y: np.ndarray
+    codes: np.ndarray   # category code of the row
+    counts: np.ndarray
+
+
+def resolve_bounds(x: np.ndarray, y: np.ndarray, xmin: Optional[float] = None, xmax: Optional[float] = None,
+                   ymin: Optional[float] = None, ymax: Optional[float] = None) -> Bounds:
+    """Viewport with any missing side taken from the data range"""
+    def side(value, data, reduce):
+        if value is not None:
+            return float(value)
+        return float(reduce(data)) if len(data) else 0.0
+    bounds = (side(xmin, x, np.min), side(xmax, x, np.max), side(ymin, y, np.min), side(ymax, y, np.max))
+    if bounds[0] > bounds[1] or bounds[2] > bounds[3]:
+        raise ValueError("Viewport minimums must not exceed maximums")
+    return bounds
+
+
+def in_bounds(x: np.ndarray, y: np.ndarray, bounds: Bounds) -> np.ndarray:
+    xmin, xmax, ymin, ymax = bounds
+    return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+
+
+def uniform_sample(n: int, max_points: int, rng: np.random.Generator) -> np.ndarray:
+    """Sorted indices of at most max_points rows drawn without replacement"""
+    if n <= max_points:
+        return np.arange(n)
+    return np.sort(rng.choice(n, size=max_points, replace=False))
+
+
+def stratified_sample(codes: np.ndarray, max_points: int, rng: np.random.Generator) -> np.ndarray:
+    """Sorted indices of at most max_points rows, allocated to categories in proportion to their size.
+
+    Quotas use largest remainders and give every category at least one point,
+    so small groups stay visible.
+    """
+    n = len(codes)
+    if n <= max_points:
+        return np.arange(n)
+    sizes = np.bincount(codes)
+    present = sizes > 0
+    exact = sizes * (max_points / n)
+    quotas = np.floor(exact).astype(np.int64)
+    quotas[present] = np.maximum(quotas[present], 1)
+    spare = max_points - quotas.sum()
+    if spare > 0:
+        order = np.argsort(-(exact - np.floor(exact)), kind='stable')
+        quotas[order[:spare]] += 1
+    elif spare < 0:
+        # The minimums of small categories come out of the largest one
+        quotas[np.argmax(quotas)] += spare
+    quotas = np.minimum(quotas, sizes)
+
+    # Random rank of each row within its category; keep the ranks below the quota
+    order = np.lexsort((rng.random(n), codes))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = np.arange(n) - starts[codes[order]]
+    return np.flatnonzero(ranks < quotas[codes])
+
+
+def _aggregate(cells: np.ndarray, codes: np.ndarray, centers_x: np.ndarray, centers_y: np.ndarray) -> Bins:
+    """Count rows per (cell, category) and attach the cell centers"""
+    keys = np.stack([cells, codes], axis=1)
+    unique, first, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+    return Bins(centers_x[first], centers_y[first], unique[:, 1], counts)
+
+
+def grid_bins(x: np.ndarray, y: np.ndarray, codes: np.ndarray, bounds: Bounds,
+              width: int, height: int, bin_size: float) -> Bins:
+    """Square cells of bin_size pixels on a width x height plot of the viewport"""
+    xmin, xmax, ymin, ymax = bounds
+    nx = max(int(np.ceil(width / bin_size)), 1)
+    ny = max(int(np.ceil(height / bin_size)), 1)
+    sx = (xmax - xmin) / nx or 1.0
+    sy = (ymax - ymin) / ny or 1.0
+    ix = np.clip(((x - xmin) / sx).astype(np.int64), 0, nx - 1)
+    iy = np.clip(((y - ymin) / sy).astype(np.int64), 0, ny - 1)
+    return _aggregate(iy * nx + ix, codes, xmin + (ix + 0.5) * sx, ymin + (iy + 0.5) * sy)
+
+
+def hex_bins(x: np.ndarray, y: np.ndarray, codes: np.ndarray, bounds: Bounds,
+             width: int, height: int, bin_size: float) -> Bins:
+    """Pointy-top hexagons of radius bin_size pixels on a width x height plot of the viewport.
+
+    Hexagon centers form two offset rectangular lattices; each point goes to
+    the nearer of its candidate centers in pixel space (as matplotlib's hexbin).
+    """
+    xmin, xmax, ymin, ymax = bounds
+    px_per_x = width / ((xmax - xmin) or 1.0)
+    px_per_y = height / ((ymax - ymin) or 1.0)
+    px = (x - xmin) * px_per_x
+    py = (y - ymin) * px_per_y
+
+    dx = np.sqrt(3) * bin_size   # center spacing within a row
+    dy = 3.0 * bin_size          # spacing between rows of the same lattice
+    ax, ay = np.round(px / dx), np.round(py / dy)
+    bx, by = np.floor(px / dx) + 0.5, np.floor(py / dy) + 0.5
+    nearer_a = (px - ax * dx) ** 2 + (py - ay * dy) ** 2 <= (px - bx * dx) ** 2 + (py - by * dy) ** 2
+    cx = np.where(nearer_a, ax, bx) * dx
+    cy = np.where(nearer_a, ay, by) * dy
+
+    # Doubled lattice coordinates are integers and identify the cell
+    col = np.rint(2 * cx / dx).astype(np.int64)
+    row = np.rint(2 * cy / dy).astype(np.int64)
+    span = int(np.ceil(2 * width / dx)) + 3
+    return _aggregate(row * span + col, codes, xmin + cx / px_per_x, ymin + cy / px_per_y)
@@ -0,0 +1,396 @@
+"""
+Classifier definitions, parallel k-fold cross-validation and hyperparameter search
+"""
+import math
+import multiprocessing
+import time
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import product
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import confusion_matrix
+from sklearn.model_selection import KFold, StratifiedKFold
+
+MODEL_KEYS = ('rf', 'knn', 'dt')
+MAX_FOLDS = 20
+CV_SEED = 42
+
+# Hyperparameters used until a search candidate is promoted
+DEFAULT_PARAMS: Dict[str, Dict[str, Any]] = {
+    'rf': {'n_estimators': 100, 'max_depth': None, 'min_samples_leaf': 1},
+    'knn': {'n_neighbors': 5, 'weights': 'uniform', 'algorithm': 'kd_tree', 'leaf_size': 30},
+    'dt': {'max_depth': 10, 'min_samples_leaf': 1, 'criterion': 'gini'}
+}
+# Spatial indexes of the K-NN model: O(log n) queries in 4 dimensions instead of brute force
+KNN_INDEXES = ('kd_tree', 'ball_tree')
+
+# Values tried by the hyperparameter search (the grid is their product)
+SEARCH_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    'rf': {'n_estimators': [10, 25, 50, 100, 200], 'max_depth': [None, 4, 8, 16], 'min_samples_leaf': [1, 2, 5]},
+    'knn': {'n_neighbors': [1, 3, 5, 7, 9, 11, 15, 21, 31], 'weights': ['uniform', 'distance'],
+            'algorithm': list(KNN_INDEXES)},
+    'dt': {'max_depth': [2, 3, 4, 6, 8, 10, 15, None], 'min_samples_leaf': [1, 2, 5, 10], 'criterion': ['gini', 'entropy']}
+}
+SEARCH_STRATEGIES = ('grid', 'random', 'halving')
+LATENCY_CALLS = 50  # single-row predictions timed per candidate
+
+
+def make_classifier(model_key: str, params: Optional[Dict[str, Any]] = None, n_jobs: Optional[int] = None):
+    """Unfitted classifier with the default hyperparameters, overridden by params.
+
+    K-NN is a pipeline standardizing the features first (body mass would
+    dominate raw distances), and n_jobs sets its query threads.
+    """
+    if model_key not in DEFAULT_PARAMS:
+        raise ValueError(f"Unknown model: {model_key}. Choose from {', '.join(MODEL_KEYS)}")
+    params = {**DEFAULT_PARAMS[model_key], **(params or {})}
+    if model_key == 'rf':
+        return RandomForestClassifier(random_state=42, n_jobs=n_jobs, **params)
+    if model_key == 'knn':
+        if params['algorithm'] not in KNN_INDEXES:
+            raise ValueError(f"K-NN algorithm must be one of {', '.join(KNN_INDEXES)}")
+        return Pipeline([('scaler', StandardScaler()), ('knn', KNeighborsClassifier(n_jobs=n_jobs, **params))])
+    return DecisionTreeClassifier(random_state=42, **params)
+
+
+def describe_params(model_key: str, params: Optional[Dict[str, Any]] = None, scaled: bool = True) -> str:
+    """Short human-readable summary of a model's hyperparameters (scaled: K-NN standardizes its inputs)"""
+    params = {**DEFAULT_PARAMS[model_key], **(params or {})}
+    depth = params.get('max_depth')
+    if model_key == 'rf':
+        return f"{params['n_estimators']} Estimators" + (f", Max Depth {depth}" if depth is not None else "")
+    if model_key == 'knn':
+        index = {'kd_tree': 'KD-Tree', 'ball_tree': 'Ball Tree', 'brute': 'Brute-Force Search'}.get(
+            params['algorithm'], f"{str(params['algorithm']).title()} Search")
+        return f"{params['n_neighbors']} Neighbors" + (", Distance-Weighted" if params['weights'] == 'distance' else "") \
+            + f", {index} on {'Scaled' if scaled else 'Unscaled'} Features"
+    return f"Max Depth {depth}" if depth is not None else "Unlimited Depth"
+
+
+def classifier_params(model_key: str, classifier=None) -> Dict[str, Any]:
+    """Searchable hyperparameters of a fitted classifier (the defaults when there is none)"""
+    if classifier is None:
+        return dict(DEFAULT_PARAMS[model_key])
+    if isinstance(classifier, Pipeline):
+        classifier = classifier[-1]
+    # Attributes rather than get_params(), which fails on models pickled by older scikit-learn releases
+    # Legacy K-NN models report their own search ('auto'); see trainable_params
+    return {name: getattr(classifier, name, default) for name, default in DEFAULT_PARAMS[model_key].items()}
+
+
+def trainable_params(model_key: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Hyperparameters make_classifier accepts: a legacy K-NN's own search becomes the default index"""
+    params = dict(params)
+    if model_key == 'knn' and params.get('algorithm') not in KNN_INDEXES:
+        params['algorithm'] = DEFAULT_PARAMS['knn']['algorithm']
+    return params
+
+
+# Training data of a pool worker, sent once by the initializer rather than with every task
+_worker_data: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+
+def _init_worker(X: np.ndarray, y: np.ndarray, labels: np.ndarray):
+    global _worker_data
+    _worker_data = (X, y, labels)
+
+
+def _fit_fold(model_key: str, fold: int, train: np.ndarray, test: np.ndarray,
+              params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fit one model on one fold and score it on the held-out rows (runs in a pool worker)"""
+    X, y, labels = _worker_data
+    classifier = make_classifier(model_key, params, n_jobs=1)  # one core per task; the pool size caps CPU
+    start = time.perf_counter()
+    classifier.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predicted = classifier.predict(X[test])
+    predict_seconds = time.perf_counter() - start
+    return {
+        'model': model_key,
+        'fold': fold,
+        'train_size': len(train),
+        'test_size': len(test),
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds,
+        'confusion_matrix': confusion_matrix(y[test], predicted, labels=labels)
+    }
+
+
+def _aggregate(folds: List[Dict[str, Any]], labels: np.ndarray) -> Dict[str, Any]:
+    """Per-fold accuracy spread plus precision/recall/F1 from the pooled out-of-fold confusion matrix"""
+    folds = sorted(folds, key=lambda result: result['fold'])
+    matrix = sum(result['confusion_matrix'] for result in folds)
+    accuracies = np.array([np.trace(r['confusion_matrix']) / r['test_size'] for r in folds])
+    true_positives = np.diagonal(matrix).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.nan_to_num(true_positives / matrix.sum(axis=0))
+        recall = np.nan_to_num(true_positives / matrix.sum(axis=1))
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    return {
+        'accuracy': float(np.trace(matrix) / matrix.sum()),
+        'accuracy_mean': float(accuracies.mean()),
+        'accuracy_std': float(accuracies.std(ddof=1)) if len(accuracies) > 1 else 0.0,
+        'precision': {str(label): float(p) for label, p in zip(labels, precision)},
+        'recall': {str(label): float(r) for label, r in zip(labels, recall)},
+        'f1_score': {str(label): float(f) for label, f in zip(labels, f1)},
+        'confusion_matrix': {'species': [str(label) for label in labels], 'matrix': matrix.tolist()},
+        'fit_seconds': float(sum(r['fit_seconds'] for r in folds)),
+        'folds': [
+            {
+                'fold': r['fold'],
+                'accuracy': float(accuracy),
+                'train_size': r['train_size'],
+                'test_size': r['test_size'],
+                'fit_seconds': r['fit_seconds'],
+                'predict_seconds': r['predict_seconds']
+            }
+            for r, accuracy in zip(folds, accuracies)
+        ]
+    }
+
+
+def _check_folds(y: np.ndarray, folds: int, stratified: bool) -> np.ndarray:
+    """Validate the fold count for these labels and return the sorted labels"""
+    if not 2 <= folds <= MAX_FOLDS:
+        raise ValueError(f"folds must be between 2 and {MAX_FOLDS}")
+    labels = np.unique(y)
+    if stratified and np.bincount(np.searchsorted(labels, y)).min() < folds:
+        raise ValueError(f"Every species needs at least {folds} samples for stratified {folds}-fold cross-validation")
+    if len(y) < folds:
+        raise ValueError(f"Need at least {folds} samples for {folds}-fold cross-validation")
+    return labels
+
+
+def _pool(workers: int, X: np.ndarray, y: np.ndarray, labels: np.ndarray) -> ProcessPoolExecutor:
+    """Process pool whose workers hold the training data"""
+    # Spawned workers do not inherit the server's threads and locks
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker, initargs=(X, y, labels))
+
+
+def _drain(pending: List[Future], on_result: Callable[[Dict[str, Any]], bool],
+           check_cancelled: Optional[Callable[[], None]] = None) -> bool:
+    """Hand results to on_result as tasks finish; returns False if on_result asked to stop early.
+
+    Pending tasks are cancelled when stopping or when check_cancelled raises.
+    """
+    while pending:
+        done, remaining = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+        pending = list(remaining)
+        stop = False
+        for future in done:
+            stop = not on_result(future.result()) or stop
+        try:
+            if check_cancelled is not None:
+                check_cancelled()
+        except Exception:
+            for future in pending:
+                future.cancel()
+            raise
+        if stop:
+            for future in pending:
+                future.cancel()
+            return False
+    return True
+
+
+def cross_validate(X: np.ndarray, y: np.ndarray, models: List[str], folds: int = 5, stratified: bool = True,
+                   workers: int = 2, on_fold: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   check_cancelled: Optional[Callable[[], None]] = None,
+                   params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Out-of-fold metrics of every model, each (model, fold) fit running in a process pool.
+
+    At most workers processes (one core each) run at a time. on_fold is
+    called as folds finish; if check_cancelled raises, pending folds are dropped
+    and the exception propagates. params holds hyperparameters per model.
+    """
+    params = params or {}
+    for model_key in models:
+        make_classifier(model_key, params.get(model_key))
+    labels = _check_folds(y, folds, stratified)
+
+    splitter = StratifiedKFold(folds, shuffle=True, random_state=CV_SEED) if stratified \
+        else KFold(folds, shuffle=True, random_state=CV_SEED)
+    splits = list(splitter.split(X, y))
+
+    start = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+
+    def on_result(result: Dict[str, Any]) -> bool:
+        results.append(result)
+        if on_fold is not None:
+            on_fold(result)
+        return True
+
+    with _pool(workers, X, y, labels) as pool:
+        _drain([
+            pool.submit(_fit_fold, model_key, fold, train, test, params.get(model_key))
+            for model_key in models for fold, (train, test) in enumerate(splits)
+        ], on_result, check_cancelled)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'folds': folds,
+        'stratified': stratified,
+        'samples': int(len(y)),
+        'workers': max(1, workers),
+        'wall_seconds': elapsed,
+        'models': {
+            model_key: _aggregate([r for r in results if r['model'] == model_key], labels)
+            for model_key in models
+        }
+    }
+
+
+def search_space(model_key: str) -> List[Dict[str, Any]]:
+    """Every combination of the model's search values"""
+    make_classifier(model_key)
+    space = SEARCH_SPACES[model_key]
+    return [dict(zip(space, values)) for values in product(*space.values())]
+
+
+def _evaluate_candidate(model_key: str, candidate: int, params: Dict[str, Any],
+                        splits: List[Tuple[np.ndarray, np.ndarray]], fraction: float) -> Dict[str, Any]:
+    """Cross-validated accuracy of one candidate on a fraction of every training fold,
+    plus its single-row inference latency (runs in a pool worker)"""
+    X, y, _ = _worker_data
+    accuracies, fit_seconds = [], 0.0
+    classifier, test = None, None
+    for fold, (train, test) in enumerate(splits):
+        if fraction < 1.0:
+            # K-NN needs at least n_neighbors training rows
+            size = max(int(len(train) * fraction), params.get('n_neighbors', 1))
+            train = np.random.default_rng(fold).permutation(train)[:size]
+        classifier = make_classifier(model_key, params, n_jobs=1)
+        start = time.perf_counter()
+        classifier.fit(X[train], y[train])
+        fit_seconds += time.perf_counter() - start
+        accuracies.append(float(np.mean(classifier.predict(X[test]) == y[test])))
+
+    # Batch size 1, as /predict serves it
+    latencies = []
+    for i in range(LATENCY_CALLS + 3):
+        row = X[test[i % len(test)]][None, :]
+        start = time.perf_counter()
+        classifier.predict(row)
+        if i >= 3:  # warm-up calls are not counted
+            latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    return {
+        'id': candidate,
+        'params': params,
+        'fraction': fraction,
+        'accuracy_mean': float(np.mean(accuracies)),
+        'accuracy_std': float(np.std(accuracies, ddof=1)) if len(accuracies) > 1 else 0.0,
+        'fit_seconds': fit_seconds,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p95_ms': float(np.percentile(latencies, 95))
+    }
+
+
+def _rank_key(candidate: Dict[str, Any]) -> Tuple[float, float]:
+    """Higher accuracy first, then lower latency"""
+    return (-candidate['accuracy_mean'], candidate['latency_p50_ms'])
+
+
+def _mark_pareto(candidates: List[Dict[str, Any]]):
+    """Flag candidates no other candidate beats on both accuracy and latency"""
+    for candidate in candidates:
+        candidate['pareto'] = not any(
+            other['accuracy_mean'] >= candidate['accuracy_mean'] and other['latency_p50_ms'] <= candidate['latency_p50_ms']
+            and (other['accuracy_mean'] > candidate['accuracy_mean'] or other['latency_p50_ms'] < candidate['latency_p50_ms'])
+            for other in candidates
+        )
+
+
+def hyperparameter_search(X: np.ndarray, y: np.ndarray, model_key: str, strategy: str = 'grid',
+                          n_candidates: int = 20, folds: int = 5, workers: int = 2, eta: int = 3,
+                          patience: Optional[int] = None, max_latency_ms: Optional[float] = None,
+                          on_candidate: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          check_cancelled: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Search one model family's hyperparameters with stratified k-fold CV in a process pool.
+
+    grid tries the whole space, random n_candidates of it. halving starts
+    n_candidates on a small share of every training fold and keeps the best
+    1/eta for each round on eta times more data, up to the full folds.
+    With patience, a one-round search stops after that many finished
+    candidates without a better accuracy. The recommended candidate has the
+    best accuracy among those whose median single-row latency is within
+    max_latency_ms, ties going to the faster one.
+    """
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}. Choose from {', '.join(SEARCH_STRATEGIES)}")
+    space = search_space(model_key)
+    labels = _check_folds(y, folds, True)
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=CV_SEED).split(X, y))
+
+    rng = np.random.default_rng(CV_SEED)
+    if strategy == 'grid' or n_candidates >= len(space):
+        indices = list(range(len(space)))
+    else:
+        indices = sorted(rng.choice(len(space), size=n_candidates, replace=False).tolist())
+
+    if strategy == 'halving':
+        rounds = max(1, math.ceil(math.log(len(indices), eta))) if len(indices) > 1 else 1
+        # Smallest share still gives every fold a few rows per species
+        smallest = min(len(train) for train, _ in splits)
+        floor = min(1.0, 5 * len(labels) / smallest)
+        fractions = [max(floor, float(eta) ** (r - rounds + 1)) for r in range(rounds)]
+    else:
+        fractions = [1.0]
+
+    start = time.perf_counter()
+    evaluated: List[Dict[str, Any]] = []
+    stopped_early = False
+    with _pool(workers, X, y, labels) as pool:
+        for round_index, fraction in enumerate(fractions):
+            finished: List[Dict[str, Any]] = []
+            best, since_best = -1.0, 0
+
+            def on_result(candidate: Dict[str, Any]) -> bool:
+                nonlocal best, since_best
+                candidate['round'] = round_index
+                finished.append(candidate)
+                if on_candidate is not None:
+                    on_candidate(candidate)
+                if candidate['accuracy_mean'] > best:
+                    best, since_best = candidate['accuracy_mean'], 0
+                else:
+                    since_best += 1
+                return not (patience and len(fractions) == 1 and since_best >= patience)
+
+            completed = _drain([
+                pool.submit(_evaluate_candidate, model_key, index, space[index], splits, fraction)
+                for index in indices
+            ], on_result, check_cancelled)
+            stopped_early = stopped_early or not completed
+            evaluated.extend(finished)
+            if round_index < len(fractions) - 1:
+                survivors = sorted(finished, key=_rank_key)[:max(1, math.ceil(len(finished) / eta))]
+                indices = sorted(candidate['id'] for candidate in survivors)
+    elapsed = time.perf_counter() - start
+
+    final = [candidate for candidate in evaluated if candidate['round'] == len(fractions) - 1]
+    _mark_pareto(final)
+    eligible = [c for c in final if max_latency_ms is None or c['latency_p50_ms'] <= max_latency_ms]
+    recommended = min(eligible, key=_rank_key)['id'] if eligible else None
+    return {
+        'model': model_key,
+        'strategy': strategy,
+        'folds': folds,
+        'samples': int(len(y)),
+        'workers': max(1, workers),
+        'rounds': [{'fraction': fraction} for fraction in fractions],
+        'stopped_early': stopped_early,
+        'max_latency_ms': max_latency_ms,
+        'wall_seconds': elapsed,
+        'recommended': recommended,
+        'candidates': sorted(final, key=_rank_key),
+        'eliminated': sorted((c for c in evaluated if c['round'] < len(fractions) - 1), key=_rank_key)
+    }
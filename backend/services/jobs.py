@@ -0,0 +1,320 @@
+"""
+Background job tracking for long-running operations
+"""
+import json
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from config import settings
+from database import redis_service
+from responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Job states
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Job state shared between uvicorn workers: any worker can report or cancel any job
+JOB_KEY_PREFIX = 'jobs:state:'     # + job id -> JSON snapshot published by the worker running it
+JOB_CANCEL_PREFIX = 'jobs:cancel:' # + job id, set by whichever worker receives the cancel request
+JOB_INDEX_KEY = 'jobs:index'       # job ids by creation time
+JOB_TTL = 86400                    # seconds a published job stays visible
+CANCEL_CHECK_INTERVAL = 0.5        # seconds between cancel flag lookups of a running job
+PUBLISH_INTERVAL = 0.5             # seconds between progress-only publications of a running job
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+
+class Job:
+    """State of a single background job"""
+
+    def __init__(self, kind: str, params: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = PENDING
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        # Bumped on every change so streams can tell when to push an update
+        self.version = 0
+        self._cancel_event = threading.Event()
+        self._cancel_checked = 0.0
+        self._lock = threading.Lock()
+        # Called after every change (publishes the job to the other workers)
+        self.on_change: Optional[Callable[["Job"], None]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        if self._cancel_event.is_set():
+            return True
+        now = time.monotonic()
+        if now - self._cancel_checked >= CANCEL_CHECK_INTERVAL:
+            self._cancel_checked = now
+            if _remote_cancel_requested(self.id):
+                self.request_cancel()
+                return True
+        return False
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        """Move the job to a new state"""
+        with self._lock:
+            self.status = status
+            if status == RUNNING:
+                self.started_at = datetime.now().isoformat()
+            if status in FINISHED_STATES:
+                self.finished_at = datetime.now().isoformat()
+            if error is not None:
+                self.error = error
+            self.version += 1
+        self._changed()
+
+    def update_progress(self, key: str, value: Any):
+        """Record progress for one part of the job (e.g. one database)"""
+        with self._lock:
+            self.progress[key] = value
+            self.version += 1
+        self._changed()
+
+    def request_cancel(self):
+        """Ask the job to stop at its next checkpoint"""
+        self._cancel_event.set()
+        with self._lock:
+            self.version += 1
+        self._changed()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested (here or through another worker)"""
+        if self.cancel_requested:
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        """Serializable snapshot of the job"""
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'kind': self.kind,
+                'params': self.params,
+                'status': self.status,
+                'cancel_requested': self._cancel_event.is_set(),
+                'progress': dict(self.progress),
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+            if include_result:
+                data['result'] = self.result
+            return data
+
+
+class JobSnapshot:
+    """Read-only view of a job running in another worker, as last published to Redis"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.version = data['version']
+        self._data = data['job']
+        self.id = self._data['job_id']
+        self.kind = self._data['kind']
+        self.params = self._data['params']
+        self.status = self._data['status']
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def mark_cancel_requested(self):
+        """Show the cancel request before the running worker publishes it"""
+        self._data = {**self._data, 'cancel_requested': True}
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = dict(self._data)
+        if not include_result:
+            data.pop('result', None)
+        return data
+
+
+def _remote_cancel_requested(job_id: str) -> bool:
+    if redis_service.redis is None:
+        return False
+    try:
+        return bool(redis_service.redis.exists(JOB_CANCEL_PREFIX + job_id))
+    except Exception as e:
+        logger.warning(f"Job cancel lookup failed: {e}")
+        return False
+
+
+class JobManager:
+    """Runs jobs on a thread pool and keeps a bounded history of them.
+
+    Jobs run in the worker that accepted them. Each change is published to
+    Redis, so status, progress, listing and cancellation work from any uvicorn
+    worker; without Redis the job routes only see this worker's jobs.
+    """
+
+    def __init__(self, max_workers: int = 2, max_history: int = 50):
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Running job id -> (when it was last published, its status and cancel flag then)
+        self._published: Dict[str, Tuple[float, Tuple[str, bool]]] = {}
+
+    def submit(self, kind: str, func: Callable[[Job], Any], params: Optional[Dict[str, Any]] = None) -> Job:
+        """Submit func(job) to run in the background and return the job handle"""
+        job = Job(kind, params)
+        job.on_change = self._on_change
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._publish(job, index=True)
+        self._executor.submit(self._run, job, func)
+        logger.info(f"Submitted {kind} job {job.id}")
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Any]):
+        """Execute a job and record its outcome"""
+        if job.cancel_requested:
+            job.set_status(CANCELLED)
+            return
+        job.set_status(RUNNING)
+        try:
+            result = func(job)
+            job.result = result
+            job.set_status(COMPLETED)
+            logger.info(f"{job.kind} job {job.id} completed")
+        except JobCancelled:
+            job.set_status(CANCELLED)
+            logger.info(f"{job.kind} job {job.id} cancelled")
+        except Exception as e:
+            job.set_status(FAILED, error=str(e))
+            logger.error(f"{job.kind} job {job.id} failed: {e}")
+
+    def _on_change(self, job: Job):
+        """Publish status changes and cancel requests at once, progress at most every PUBLISH_INTERVAL.
+
+        Benchmarks report progress after every query, and a Redis write per
+        query would load the Redis server while it is being measured.
+        """
+        now = time.monotonic()
+        state = (job.status, job.cancel_requested)
+        with self._lock:
+            last = self._published.get(job.id)
+            if last is not None and last[1] == state and now - last[0] < PUBLISH_INTERVAL:
+                return
+            if job.finished:
+                self._published.pop(job.id, None)
+            else:
+                self._published[job.id] = (now, state)
+        self._publish(job)
+
+    def _publish(self, job: Job, index: bool = False):
+        """Write the job's current state to Redis for the other workers"""
+        if redis_service.redis is None:
+            return
+        try:
+            payload = dumps({'version': job.version, 'job': job.to_dict()}).decode()
+            with redis_service.redis.pipeline() as pipe:
+                pipe.set(JOB_KEY_PREFIX + job.id, payload, ex=JOB_TTL)
+                if index:
+                    pipe.zadd(JOB_INDEX_KEY, {job.id: time.time()})
+                    pipe.zremrangebyrank(JOB_INDEX_KEY, 0, -self.max_history - 1)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Job publish failed for {job.id}: {e}")
+
+    def _snapshots(self, job_ids: List[str]) -> List[JobSnapshot]:
+        """Published jobs of other workers (expired ones are skipped)"""
+        if redis_service.redis is None or not job_ids:
+            return []
+        try:
+            payloads = redis_service.redis.mget([JOB_KEY_PREFIX + job_id for job_id in job_ids])
+        except Exception as e:
+            logger.warning(f"Job lookup failed: {e}")
+            return []
+        return [JobSnapshot(json.loads(payload)) for payload in payloads if payload is not None]
+
+    def _prune(self):
+        """Drop the oldest finished jobs once history exceeds max_history"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        while len(self._jobs) > self.max_history and finished:
+            del self._jobs[finished.pop(0)]
+
+    def get(self, job_id: str) -> Optional[Union[Job, JobSnapshot]]:
+        """Get a job by id: the live job if it runs here, else its last published state"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        snapshots = self._snapshots([job_id])
+        return snapshots[0] if snapshots else None
+
+    def list(self, kind: Optional[str] = None) -> List[Union[Job, JobSnapshot]]:
+        """List known jobs of every worker, newest first"""
+        with self._lock:
+            local = dict(self._jobs)
+        job_ids = list(reversed(local))
+        if redis_service.redis is not None:
+            try:
+                job_ids = redis_service.redis.zrevrange(JOB_INDEX_KEY, 0, self.max_history - 1)
+            except Exception as e:
+                logger.warning(f"Job listing failed: {e}")
+        remote = {job.id: job for job in self._snapshots([job_id for job_id in job_ids if job_id not in local])}
+        jobs = [local.get(job_id) or remote.get(job_id) for job_id in job_ids]
+        jobs = [job for job in jobs if job is not None]
+        if kind:
+            jobs = [job for job in jobs if job.kind == kind]
+        return jobs
+
+    def cancel(self, job_id: str) -> Optional[Union[Job, JobSnapshot]]:
+        """Request cancellation of a job; a job of another worker stops at its next checkpoint"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if isinstance(job, Job):
+            job.request_cancel()
+            return job
+        try:
+            redis_service.redis.set(JOB_CANCEL_PREFIX + job_id, '1', ex=JOB_TTL)
+        except Exception as e:
+            logger.warning(f"Job cancel failed for {job_id}: {e}")
+            return job
+        job.mark_cancel_requested()
+        return job
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker pool"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if not job.finished:
+                job.request_cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global job manager instance
+job_manager = JobManager(max_workers=settings.JOB_WORKERS)
@@ -0,0 +1,242 @@
+"""
+Versioned model registry: a JSON manifest and a few artifact versions per model family
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    """Write a JSON file atomically: readers see the old or the new manifest, never half of one"""
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Persisted classifiers under <root>/<model>/, each with a manifest of its versions.
+
+    Every version is one joblib artifact plus its manifest entry (sample
+    count, feature schema, hyperparameters, metrics, checksum). Uncompressed
+    artifacts are memory-mapped on load, so worker processes share their
+    arrays through the page cache; compressed ones trade that for size on disk.
+    Nothing is deserialized until a model is first used or warmed, and a
+    model whose checksum does not match its manifest is refused.
+    """
+
+    def __init__(self, root: Path, mmap: bool = True, compress: int = 0, keep: int = 3):
+        self.root = root
+        self.mmap = mmap
+        self.compress = compress
+        self.keep = max(1, keep)
+        self._manifests: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}  # model -> ((mtime_ns, size), manifest)
+        self._loaded: Dict[str, Tuple[Optional[int], Any]] = {}      # model -> (version, model)
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._save_lock = threading.Lock()
+        self._stats = {'loads': 0, 'load_seconds': 0.0, 'checksum_failures': 0}
+
+    def _manifest_path(self, key: str) -> Path:
+        return self.root / key / MANIFEST_FILE
+
+    def manifest(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifest of a model family, re-read only when the file changed"""
+        path = self._manifest_path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._manifests.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read {key.upper()} manifest: {e}")
+            return None
+        self._manifests[key] = (signature, manifest)
+        return manifest
+
+    def current(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifest entry of the active version, if any"""
+        manifest = self.manifest(key)
+        if not manifest:
+            return None
+        return next((v for v in manifest['versions'] if v['version'] == manifest.get('current')), None)
+
+    def artifact_path(self, key: str, entry: Dict[str, Any]) -> Path:
+        return self.root / key / entry['file']
+
+    def _load(self, key: str, entry: Dict[str, Any]) -> Optional[Any]:
+        path = self.artifact_path(key, entry)
+        start = time.perf_counter()
+        try:
+            if file_checksum(path) != entry['checksum']:
+                self._stats['checksum_failures'] += 1
+                logger.error(f"{key.upper()} v{entry['version']} does not match its manifest checksum; not loading it")
+                return None
+            model = joblib.load(path, mmap_mode='r' if self.mmap and not entry.get('compress') else None)
+        except Exception as e:
+            logger.error(f"Failed to load {key.upper()} v{entry['version']}: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+        self._stats['loads'] += 1
+        self._stats['load_seconds'] += elapsed
+        logger.info(f"Loaded {key.upper()} classifier v{entry['version']} in {elapsed * 1000:.0f}ms")
+        return model
+
+    def get(self, key: str) -> Optional[Any]:
+        """The active version of a model, loaded on first use (None when there is none)"""
+        loaded = self._loaded.get(key)
+        if loaded is not None:
+            return loaded[1]
+        # One thread loads while concurrent first requests wait for it
+        with self._load_locks[key]:
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                return loaded[1]
+            entry = self.current(key)
+            if entry is None:
+                return None
+            model = self._load(key, entry)
+            if model is not None:
+                with self._lock:
+                    self._loaded[key] = (entry['version'], model)
+            return model
+
+    def put(self, key: str, model: Any):
+        """Serve a model that could not be persisted from memory until a version is saved"""
+        with self._lock:
+            self._loaded[key] = (None, model)
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._loaded
+
+    def save(self, key: str, model: Any, **info) -> Dict[str, Any]:
+        """Persist a model as a new active version; info goes into its manifest entry"""
+        directory = self.root / key
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._save_lock:
+            manifest = self.manifest(key) or {'format': MANIFEST_FORMAT, 'model': key, 'current': None, 'versions': []}
+            version = max((v['version'] for v in manifest['versions']), default=0) + 1
+            filename = f"v{version}.joblib"
+            path = directory / filename
+            # Write a new file and swap it in: other workers may have older versions memory-mapped
+            tmp_path = path.with_suffix('.tmp')
+            joblib.dump(model, tmp_path, compress=self.compress)
+            os.replace(tmp_path, path)
+            entry = {
+                'version': version,
+                'file': filename,
+                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'checksum': file_checksum(path),
+                'size_bytes': path.stat().st_size,
+                'compress': self.compress,
+                **info
+            }
+            manifest['versions'].append(entry)
+            manifest['current'] = version
+            pruned = manifest['versions'][:-self.keep]
+            manifest['versions'] = manifest['versions'][-self.keep:]
+            _write_json(self._manifest_path(key), manifest)
+            # Unlinked files stay readable by workers that still map them
+            for old in pruned:
+                (directory / old['file']).unlink(missing_ok=True)
+            with self._lock:
+                self._loaded[key] = (version, model)
+        logger.info(f"Saved {key.upper()} classifier v{version} ({entry['size_bytes']} bytes)")
+        return entry
+
+    def annotate(self, key: str, version: int, **info):
+        """Merge info into the manifest entry of a version (e.g. metrics computed later)"""
+        with self._save_lock:
+            manifest = self.manifest(key)
+            entry = next((v for v in manifest['versions'] if v['version'] == version), None) if manifest else None
+            if entry is None:
+                return
+            for name, value in info.items():
+                entry[name] = {**entry.get(name, {}), **value} if isinstance(value, dict) else value
+            _write_json(self._manifest_path(key), manifest)
+
+    def activate(self, key: str, version: int) -> Dict[str, Any]:
+        """Make a kept version the active one (rollback or roll forward)"""
+        with self._save_lock:
+            manifest = self.manifest(key)
+            entry = next((v for v in manifest['versions'] if v['version'] == version), None) if manifest else None
+            if entry is None:
+                raise ValueError(f"{key} has no kept version {version}")
+            manifest['current'] = version
+            _write_json(self._manifest_path(key), manifest)
+        self.refresh([key])
+        return entry
+
+    def delete(self, key: str):
+        """Remove every version of a model family"""
+        with self._save_lock:
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            self._manifests.pop(key, None)
+            with self._lock:
+                self._loaded.pop(key, None)
+
+    def refresh(self, keys: Optional[Iterable[str]] = None):
+        """Drop loaded models that are no longer the active version (the next use loads the new one)"""
+        with self._lock:
+            for key in list(keys if keys is not None else self._loaded):
+                loaded = self._loaded.get(key)
+                entry = self.current(key)
+                if loaded is None:
+                    continue
+                # Unsaved models stay until a version exists; deleted or superseded ones go
+                if (entry is None and loaded[0] is not None) or (entry is not None and entry['version'] != loaded[0]):
+                    del self._loaded[key]
+
+    def warm(self, keys: Iterable[str]):
+        """Load the given models now"""
+        for key in keys:
+            self.get(key)
+
+    def warm_in_background(self, keys: Iterable[str]) -> threading.Thread:
+        """Load the given models in a daemon thread so startup does not wait for them"""
+        thread = threading.Thread(target=self.warm, args=(list(keys),), name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'loaded': {key: version for key, (version, _) in self._loaded.items()},
+            'mmap': self.mmap,
+            'compress': self.compress,
+            **self._stats
+        }
+
+    def list(self, keys: Iterable[str]) -> List[Dict[str, Any]]:
+        """Manifests of the given model families (None where nothing is persisted)"""
+        return [{'model': key, 'loaded_version': self._loaded.get(key, (None,))[0], 'manifest': self.manifest(key)}
+                for key in keys]
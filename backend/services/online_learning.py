@@ -0,0 +1,241 @@
+"""
+Incremental classifier updates and the drift monitor deciding when to retrain instead
+"""
+import copy
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.neighbors import KNeighborsClassifier, NearestNeighbors
+from sklearn.pipeline import Pipeline
+
+DRIFT_BINS = 10        # reference quantile bins per feature
+DRIFT_MIN_ROWS = 50    # appended rows needed before the distribution and accuracy checks count
+PSI_EPSILON = 1e-4     # floor on bin shares so empty bins do not make the PSI infinite
+
+
+class AppendableKNeighbors(ClassifierMixin, BaseEstimator):
+    """Fitted K-NN classifier plus a small index of rows appended since it was built.
+
+    Queries search both trees and keep the k nearest overall, so appending m
+    rows costs O(m log m) instead of rebuilding the main index. Once more
+    than delta_limit rows have been appended, they are folded into a new main index.
+    """
+
+    def __init__(self, base: KNeighborsClassifier, delta_limit: int = 2048):
+        self.base = base
+        self.delta_limit = delta_limit
+        self.delta_X = np.empty((0, base._fit_X.shape[1]))
+        self.delta_codes = np.empty(0, dtype=np.int64)  # indices into classes_
+        self.delta_index: Optional[NearestNeighbors] = None
+
+    def __getattr__(self, name: str):
+        # Hyperparameters and fitted attributes (classes_, n_neighbors, ...) come from the main index
+        if name.startswith('__') or name == 'base':
+            raise AttributeError(name)
+        return getattr(self.base, name)
+
+    def __sklearn_is_fitted__(self) -> bool:
+        return True
+
+    @property
+    def n_samples(self) -> int:
+        return self.base.n_samples_fit_ + len(self.delta_codes)
+
+    def append(self, X: np.ndarray, y: np.ndarray, delta_limit: Optional[int] = None) -> "AppendableKNeighbors":
+        """New classifier with the rows added (labels must be known classes); this one is left untouched"""
+        if not np.isin(y, self.base.classes_).all():
+            raise ValueError("Appended rows contain a class the model has never seen")
+        codes = np.searchsorted(self.base.classes_, y)
+        updated = copy.copy(self)
+        updated.delta_limit = self.delta_limit if delta_limit is None else delta_limit
+        updated.delta_X = np.vstack([self.delta_X, X])
+        updated.delta_codes = np.concatenate([self.delta_codes, codes])
+        if len(updated.delta_codes) > updated.delta_limit:
+            updated.base = _refit(self.base, np.vstack([self.base._fit_X, updated.delta_X]),
+                                  self.base.classes_[np.concatenate([self.base._y, updated.delta_codes])])
+            updated.delta_X = np.empty((0, X.shape[1]))
+            updated.delta_codes = np.empty(0, dtype=np.int64)
+            updated.delta_index = None
+        else:
+            updated.delta_index = NearestNeighbors(
+                algorithm=self.base.algorithm, leaf_size=self.base.leaf_size
+            ).fit(updated.delta_X)
+        return updated
+
+    def _neighbors(self, X: np.ndarray):
+        """Distances and class codes of the k nearest rows across both indexes"""
+        k = self.base.n_neighbors
+        dist, ind = self.base.kneighbors(X, n_neighbors=min(k, self.base.n_samples_fit_))
+        codes = self.base._y[ind]
+        if self.delta_index is not None:
+            delta_dist, delta_ind = self.delta_index.kneighbors(X, n_neighbors=min(k, len(self.delta_codes)))
+            dist = np.hstack([dist, delta_dist])
+            codes = np.hstack([codes, self.delta_codes[delta_ind]])
+            order = np.argsort(dist, axis=1, kind='stable')[:, :k]
+            dist = np.take_along_axis(dist, order, axis=1)
+            codes = np.take_along_axis(codes, order, axis=1)
+        return dist, codes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        dist, codes = self._neighbors(np.asarray(X, dtype=np.float64))
+        if self.base.weights == 'distance':
+            # As scikit-learn: exact matches, when there are any, take all the weight
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / dist
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+        else:
+            weights = np.ones_like(dist)
+        proba = np.zeros((len(dist), len(self.base.classes_)))
+        np.add.at(proba, (np.arange(len(dist))[:, None], codes), weights)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.base.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _refit(base: KNeighborsClassifier, X: np.ndarray, y: np.ndarray) -> KNeighborsClassifier:
+    """Fresh K-NN with the same hyperparameters over the given rows"""
+    return KNeighborsClassifier(**base.get_params()).fit(X, y)
+
+
+def append_knn(model: Pipeline, X: np.ndarray, y: np.ndarray, delta_limit: int) -> Pipeline:
+    """Scaled K-NN pipeline with the rows appended; the scaler fitted at the last full retrain is kept"""
+    scaler, knn = model[0], model[-1]
+    if not isinstance(knn, AppendableKNeighbors):
+        knn = AppendableKNeighbors(knn, delta_limit)
+    return Pipeline([('scaler', scaler), ('knn', knn.append(scaler.transform(X), y, delta_limit))])
+
+
+def grow_forest(forest, X: np.ndarray, y: np.ndarray, base_samples: int, base_estimators: int, n_jobs: int = 1):
+    """Random forest with extra trees fitted on the new rows only (warm start).
+
+    The new trees get the same share of the ensemble as the new rows have of
+    the data. Rows of absent classes are added with zero weight so every tree
+    keeps the forest's class set. The served forest is left untouched. At
+    most n_jobs threads fit the trees, so serving keeps the other cores.
+    """
+    added = max(1, int(round(len(y) * base_estimators / max(base_samples, 1))))
+    missing = [label for label in forest.classes_ if label not in set(y)]
+    weights = np.concatenate([np.ones(len(y)), np.zeros(len(missing))])
+    X = np.vstack([X, np.repeat(X[:1], len(missing), axis=0)])
+    y = np.concatenate([y, np.array(missing, dtype=y.dtype)])
+
+    grown = copy.copy(forest)
+    grown.estimators_ = list(forest.estimators_)
+    grown.set_params(warm_start=True, n_estimators=len(grown.estimators_) + added, n_jobs=max(1, n_jobs))
+    grown.fit(X, y, sample_weight=weights)
+    grown.set_params(warm_start=False, n_jobs=1)
+    return grown
+
+
+def _psi(expected: np.ndarray, actual: np.ndarray, n_expected: int, n_actual: int) -> float:
+    """Population stability index between two sets of bin shares, less its value under no drift.
+
+    Sampling noise alone gives an expected PSI of about (bins - 1)(1/n + 1/N),
+    which for a few dozen new rows would exceed the usual 0.2 threshold.
+    """
+    noise = (len(expected) - 1) * (1 / max(n_actual, 1) + 1 / max(n_expected, 1))
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return max(float(np.sum((actual - expected) * np.log(actual / expected))) - noise, 0.0)
+
+
+class DriftMonitor:
+    """Compares rows appended since the last full retrain with the data that retrain saw.
+
+    A full retrain is recommended when a feature or the species mix shifts
+    (PSI over reference quantile bins), when the served model's accuracy on
+    the new rows, measured before it learns them, drops, or when the appended
+    rows outgrow a share of the original training set.
+    """
+
+    def __init__(self, features: Sequence[str], classes: Sequence[str], samples: int,
+                 edges: Dict[str, List[float]], reference: Dict[str, List[float]], class_shares: List[float],
+                 trained_through: Optional[str] = None, reference_accuracy: Optional[float] = None):
+        self.features = list(features)
+        self.classes = list(classes)
+        self.samples = samples
+        self.edges = edges
+        self.reference = reference
+        self.class_shares = class_shares
+        self.trained_through = trained_through
+        self.reference_accuracy = reference_accuracy
+        # Rows appended since the full retrain
+        self.rows = 0
+        self.correct = 0
+        self.bin_counts = {feature: [0] * len(reference[feature]) for feature in self.features}
+        self.class_counts = [0] * len(self.classes)
+
+    @staticmethod
+    def _bin(values: np.ndarray, edges: Sequence[float]) -> np.ndarray:
+        # Inner edges only: values beyond the reference range land in the outer bins
+        return np.bincount(np.searchsorted(edges[1:-1], values, side='right'), minlength=len(edges) - 1)
+
+    @classmethod
+    def fit(cls, X: np.ndarray, y: np.ndarray, features: Sequence[str], classes: Sequence[str],
+            trained_through: Optional[str] = None) -> "DriftMonitor":
+        """Reference distributions of a full training set"""
+        edges, reference = {}, {}
+        for j, feature in enumerate(features):
+            cuts = np.unique(np.quantile(X[:, j], np.linspace(0, 1, DRIFT_BINS + 1)))
+            if len(cuts) < 2:
+                cuts = np.array([cuts[0], cuts[0]])
+            counts = cls._bin(X[:, j], cuts)
+            edges[feature] = cuts.tolist()
+            reference[feature] = (counts / max(len(X), 1)).tolist()
+        class_counts = np.array([np.sum(y == label) for label in classes])
+        return cls(features, classes, len(y), edges, reference, (class_counts / max(len(y), 1)).tolist(),
+                   trained_through)
+
+    def update(self, X: np.ndarray, y: np.ndarray, correct: int):
+        """Account for appended rows and how many of them the served model got right"""
+        self.rows += len(y)
+        self.correct += int(correct)
+        for j, feature in enumerate(self.features):
+            counts = self._bin(X[:, j], self.edges[feature])
+            self.bin_counts[feature] = (np.array(self.bin_counts[feature]) + counts).tolist()
+        for i, label in enumerate(self.classes):
+            self.class_counts[i] += int(np.sum(y == label))
+
+    def check(self, psi_threshold: float, accuracy_drop: float, max_growth: float) -> Dict[str, Any]:
+        """Whether a full retrain is needed, with the reasons and the statistics behind them"""
+        reasons = []
+        psi = {}
+        accuracy = self.correct / self.rows if self.rows else None
+        if self.rows >= DRIFT_MIN_ROWS:
+            for feature in self.features:
+                psi[feature] = _psi(np.array(self.reference[feature]), np.array(self.bin_counts[feature]) / self.rows,
+                                    self.samples, self.rows)
+            psi['species'] = _psi(np.array(self.class_shares), np.array(self.class_counts) / self.rows,
+                                  self.samples, self.rows)
+            reasons += [f"distribution shift in {name} (PSI {value:.2f})" for name, value in psi.items()
+                        if value > psi_threshold]
+            if self.reference_accuracy is not None and accuracy < self.reference_accuracy - accuracy_drop:
+                reasons.append(f"accuracy on new rows {accuracy:.3f} vs {self.reference_accuracy:.3f} at retrain")
+        if self.rows > max_growth * self.samples:
+            reasons.append(f"{self.rows} rows appended to a model trained on {self.samples}")
+        return {
+            'retrain': bool(reasons),
+            'reasons': reasons,
+            'appended_rows': self.rows,
+            'trained_samples': self.samples,
+            'prequential_accuracy': accuracy,
+            'reference_accuracy': self.reference_accuracy,
+            'psi': psi
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DriftMonitor":
+        monitor = cls(data['features'], data['classes'], data['samples'], data['edges'], data['reference'],
+                      data['class_shares'], data.get('trained_through'), data.get('reference_accuracy'))
+        monitor.rows = data['rows']
+        monitor.correct = data['correct']
+        monitor.bin_counts = data['bin_counts']
+        monitor.class_counts = data['class_counts']
+        return monitor
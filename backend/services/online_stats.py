@@ -0,0 +1,231 @@
+"""
+Mergeable online statistics for datasets streamed in chunks
+
+Every accumulator consumes numpy chunks, keeps a state that does not grow with
+the number of rows (up to the sketch size) and merges with another
+accumulator of the same kind, so chunks, workers or shards can be reduced in
+any order.
+
+Error bounds against the in-memory pandas path:
+- CoMoments (count, mean, std, Pearson correlation) and FixedHistogram are
+  exact up to floating-point rounding (relative error ~1e-12).
+- KLLSketch quantiles are exact while a column has at most k values. Beyond
+  that the returned value has a normalized rank error of about 2/k with high
+  probability (0.5% of n for the default k=400).
+"""
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_SKETCH_K = 400
+COMPACTOR_DECAY = 2 / 3  # capacity ratio between consecutive KLL levels
+
+
+class CoMoments:
+    """Pairwise-complete counts, means and co-moments of m columns (Welford/Chan updates).
+
+    For every pair (i, j) the statistics cover the rows where both columns are
+    present, which is how pandas computes corr(); the diagonal holds the
+    per-column count, mean and sum of squared deviations.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        m = len(columns)
+        self.columns = tuple(columns)
+        self.n = np.zeros((m, m))
+        self.means = np.zeros((m, m))     # [i, j]: mean of column i over rows with i and j
+        self.m2 = np.zeros((m, m))        # [i, j]: Σ (x_i - mean)² over rows with i and j
+        self.comoments = np.zeros((m, m))  # [i, j]: Σ (x_i - mean_i)(x_j - mean_j)
+
+    def update(self, data: np.ndarray):
+        """Add a chunk of rows (n x m float array, NaN where missing)"""
+        if len(data) == 0:
+            return
+        other = CoMoments(self.columns)
+        present = ~np.isnan(data)
+        mask = present.astype(np.float64)
+        # Shift by the chunk means so the raw sums stay small
+        with np.errstate(invalid='ignore'):
+            shift = np.nan_to_num(np.nanmean(np.where(present, data, np.nan), axis=0))
+        x = np.where(present, data - shift, 0.0)
+
+        n = mask.T @ mask
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.nan_to_num((x.T @ mask) / n)
+        other.n = n
+        other.means = means + shift[:, None]
+        other.m2 = (x * x).T @ mask - n * means * means
+        other.comoments = x.T @ x - n * means * means.T
+        self.merge(other)
+
+    def merge(self, other: "CoMoments") -> "CoMoments":
+        """Fold another accumulator over disjoint rows into this one"""
+        n = self.n + other.n
+        delta = other.means - self.means
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.nan_to_num(other.n / n)
+            cross = np.nan_to_num(self.n * other.n / n)
+        self.means = self.means + delta * weight
+        self.m2 = self.m2 + other.m2 + delta * delta * cross
+        self.comoments = self.comoments + other.comoments + delta * delta.T * cross
+        self.n = n
+        return self
+
+    def count(self) -> np.ndarray:
+        return np.diagonal(self.n).astype(np.int64)
+
+    def mean(self) -> np.ndarray:
+        """Column means (NaN for empty columns)"""
+        n = np.diagonal(self.n)
+        return np.where(n > 0, np.diagonal(self.means), np.nan)
+
+    def std(self) -> np.ndarray:
+        """Sample standard deviations (ddof=1, NaN below two values)"""
+        n = np.diagonal(self.n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(n > 1, np.sqrt(np.maximum(np.diagonal(self.m2), 0.0) / (n - 1)), np.nan)
+
+    def correlation(self) -> np.ndarray:
+        """Pearson correlation over pairwise-complete rows (NaN where undefined)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoments / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < 2] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty 2016) with levels of doubling weight.
+
+    Level h holds items standing for 2**h values each. A full level is sorted
+    and every other item (random offset) moves up, which keeps O(k) items.
+    """
+
+    def __init__(self, k: int = DEFAULT_SKETCH_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * COMPACTOR_DECAY ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item stays behind so the total weight is preserved
+                keep, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values (NaN are ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @property
+    def exact(self) -> bool:
+        """True while every value is still held (quantiles equal np.quantile)"""
+        return len(self.levels[0]) == self.n
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """Quantiles with linear interpolation (pandas/numpy default), NaN when empty"""
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        if self.exact:
+            return np.quantile(self.levels[0], qs)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        # Each item sits at the middle of the ranks it stands for
+        positions = np.cumsum(weights) - weights / 2
+        return np.interp(np.asarray(qs) * self.n, positions, values)
+
+
+class FixedHistogram:
+    """Counts on fixed bin edges with np.histogram semantics (half-open bins, last one closed)"""
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values (NaN and values outside the edges are ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[(values >= self.edges[0]) & (values <= self.edges[-1])]
+        n_bins = len(self.counts)
+        index = np.clip(np.searchsorted(self.edges, values, side='right') - 1, 0, n_bins - 1)
+        self.counts += np.bincount(index, minlength=n_bins)
+
+    def merge(self, other: "FixedHistogram") -> "FixedHistogram":
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Histograms with different bin edges cannot be merged")
+        self.counts += other.counts
+        return self
+
+
+class ColumnSummary:
+    """Count, mean, std, min, max and quantile sketch of every numeric column"""
+
+    def __init__(self, columns: Sequence[str], k: int = DEFAULT_SKETCH_K, seed: Optional[int] = None):
+        self.columns = tuple(columns)
+        self.moments = CoMoments(columns)
+        self.minimum = np.full(len(columns), np.inf)
+        self.maximum = np.full(len(columns), -np.inf)
+        self.sketches = [KLLSketch(k, seed) for _ in columns]
+
+    def update(self, data: np.ndarray):
+        """Add a chunk of rows (n x m float array, NaN where missing)"""
+        if len(data) == 0:
+            return
+        self.moments.update(data)
+        with np.errstate(invalid='ignore'):
+            self.minimum = np.fmin(self.minimum, np.nanmin(np.where(np.isnan(data), np.inf, data), axis=0))
+            self.maximum = np.fmax(self.maximum, np.nanmax(np.where(np.isnan(data), -np.inf, data), axis=0))
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(data[:, j])
+
+    def merge(self, other: "ColumnSummary") -> "ColumnSummary":
+        self.moments.merge(other.moments)
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def describe(self) -> Dict[str, np.ndarray]:
+        """Per-column arrays: count, mean, std, min, max, q1, median, q3 (NaN when empty)"""
+        count = self.moments.count()
+        quartiles = np.array([sketch.quantiles([0.25, 0.5, 0.75]) for sketch in self.sketches]).reshape(-1, 3)
+        return {
+            'count': count,
+            'mean': self.moments.mean(),
+            'std': self.moments.std(),
+            'min': np.where(count > 0, self.minimum, np.nan),
+            'max': np.where(count > 0, self.maximum, np.nan),
+            'q1': quartiles[:, 0],
+            'median': quartiles[:, 1],
+            'q3': quartiles[:, 2]
+        }
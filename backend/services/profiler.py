@@ -0,0 +1,310 @@
+"""
+On-demand statistical sampling profiler for live requests and the whole process
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+import logging
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b'x-profile'  # "X-Profile: true" profiles that one request
+PROFILE_ID_HEADER = b'x-profile-id'
+MAX_STACK_DEPTH = 128
+
+# Leaf frames of threads that are parked rather than running code
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+# A stack is (thread name, frames from root to leaf)
+Stack = Tuple[str, Tuple[str, ...]]
+
+
+class Sampler:
+    """Background thread counting the Python stacks of every busy thread"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        code = frame.f_code
+        return (code.co_filename.rsplit('/', 1)[-1], code.co_name) in IDLE_FRAMES
+
+    def _sample(self, names: Dict[int, str]):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own or self._is_idle(frame):
+                continue
+            frames = []
+            while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[(names.get(thread_id, str(thread_id)), tuple(reversed(frames)))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self._sample(names)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+
+class Profile:
+    """Collected stacks for a route (next N requests), a single request or the whole process"""
+
+    def __init__(self, kind: str, target: Optional[str], requests: int, interval: float):
+        self.id = str(uuid.uuid4())
+        self.kind = kind              # route, request or process
+        self.target = target          # request path, None for the process
+        self.remaining = requests     # requests still to capture
+        self.interval = interval
+        self.status = 'armed'
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+
+    def add(self, sampler: Sampler, duration: float):
+        self.counts.update(sampler.counts)
+        self.samples += sampler.samples
+        self.duration += duration
+
+    def finish(self):
+        self.status = 'complete'
+        self.finished_at = datetime.now()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'worker': os.getpid(),  # profiles and armed routes live in this process only
+            'kind': self.kind,
+            'target': self.target,
+            'status': self.status,
+            'remaining_requests': self.remaining if self.kind == 'route' else None,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'stacks': len(self.counts),
+            'duration_s': self.duration,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format (flamegraph.pl, speedscope, inferno)"""
+        lines = [
+            f"{';'.join((thread,) + frames)} {count}"
+            for (thread, frames), count in self.counts.most_common()
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope file with one sampled profile per thread"""
+        frame_index: Dict[str, int] = {}
+        frames: List[Dict[str, Any]] = []
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for (thread, stack), count in self.counts.items():
+            indices = []
+            for name in stack:
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    function, _, location = name.partition(' (')
+                    file, _, line = location.rstrip(')').rpartition(':')
+                    frames.append({'name': function, 'file': file, 'line': int(line)})
+                indices.append(frame_index[name])
+            profile = profiles.setdefault(thread, {
+                'type': 'sampled', 'name': thread, 'unit': 'seconds',
+                'startValue': 0, 'endValue': 0.0, 'samples': [], 'weights': []
+            })
+            weight = count * self.interval
+            profile['samples'].append(indices)
+            profile['weights'].append(weight)
+            profile['endValue'] += weight
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': f"{self.kind} {self.target or ''}".strip(),
+            'exporter': 'penguins-api',
+            'shared': {'frames': frames},
+            'profiles': list(profiles.values())
+        }
+
+
+class ProfilerService:
+    """Arms profiles, runs one sampler at a time and keeps recent results"""
+
+    def __init__(self, enabled: bool = True, interval_ms: float = 5.0, max_history: int = 20):
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        self.max_history = max_history
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._armed: Dict[str, Profile] = {}  # request path -> route profile
+        self._lock = threading.Lock()
+        self._busy = False
+
+    def _store(self, profile: Profile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_history:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Profile]:
+        return list(reversed(self._profiles.values()))
+
+    @property
+    def armed(self) -> bool:
+        return bool(self._armed)
+
+    def arm_route(self, path: str, requests: int, interval_ms: Optional[float] = None) -> Profile:
+        """Profile the next requests to path (replacing any profile already armed for it)"""
+        if not self.enabled:
+            raise ValueError("Profiling is disabled (PROFILER_ENABLED=false)")
+        profile = Profile('route', path, requests, interval_ms / 1000 if interval_ms else self.interval)
+        self._store(profile)
+        with self._lock:
+            self._armed[path] = profile
+        return profile
+
+    def disarm(self, path: str) -> Optional[Profile]:
+        with self._lock:
+            profile = self._armed.pop(path, None)
+        if profile is not None:
+            profile.finish()
+        return profile
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._busy:
+                return False
+            self._busy = True
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._busy = False
+
+    def profile_process(self, seconds: float, interval_ms: Optional[float] = None) -> Profile:
+        """Sample every thread for the given number of seconds (blocks the caller)"""
+        if not self.enabled:
+            raise ValueError("Profiling is disabled (PROFILER_ENABLED=false)")
+        if not self._acquire():
+            raise ValueError("Another profile is being recorded")
+        profile = Profile('process', None, 0, interval_ms / 1000 if interval_ms else self.interval)
+        profile.status = 'running'
+        self._store(profile)
+        try:
+            sampler = Sampler(profile.interval)
+            start = time.perf_counter()
+            sampler.start()
+            time.sleep(seconds)
+            sampler.stop()
+            profile.add(sampler, time.perf_counter() - start)
+        finally:
+            self._release()
+        profile.finish()
+        return profile
+
+    def begin_request(self, path: str, requested: bool) -> Optional[Tuple[Profile, Sampler, float]]:
+        """Start sampling a request if it was asked for or its path is armed"""
+        profile = self._armed.get(path)
+        if profile is None and not requested:
+            return None
+        if not self._acquire():
+            return None
+        if profile is None:
+            profile = Profile('request', path, 1, self.interval)
+            self._store(profile)
+        profile.status = 'running'
+        sampler = Sampler(profile.interval)
+        sampler.start()
+        return profile, sampler, time.perf_counter()
+
+    def end_request(self, session: Tuple[Profile, Sampler, float]):
+        """Stop sampling and finish the profile once it has all its requests"""
+        profile, sampler, start = session
+        sampler.stop()
+        self._release()
+        profile.add(sampler, time.perf_counter() - start)
+        profile.remaining -= 1
+        if profile.remaining > 0:
+            profile.status = 'armed'
+            return
+        if profile.kind == 'route':
+            with self._lock:
+                if self._armed.get(profile.target) is profile:
+                    del self._armed[profile.target]
+        profile.finish()
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that samples requests carrying X-Profile or matching an armed route.
+
+    With nothing armed it only scans the request headers.
+    """
+
+    def __init__(self, app, profiler: "ProfilerService"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        requested = any(
+            name == PROFILE_HEADER and value.lower() in (b'1', b'true') for name, value in scope['headers']
+        )
+        if not requested and not self.profiler.armed:
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.begin_request(scope['path'], requested)
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = session[0].id.encode()
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [(PROFILE_ID_HEADER, profile_id)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.end_request(session)
+
+
+# Global profiler instance
+profiler_service = ProfilerService(
+    enabled=settings.PROFILER_ENABLED,
+    interval_ms=settings.PROFILER_INTERVAL_MS
+)
@@ -0,0 +1,165 @@
+"""
+Ordinary least squares on sufficient statistics
+"""
+import numpy as np
+from itertools import product
+from scipy import stats
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+from services.dataset import finite_or_none
+
+MAX_SUBSET_PREDICTORS = 12  # 4095 models per batch
+
+
+class SufficientStats(NamedTuple):
+    """Everything OLS needs from a set of columns over their complete rows.
+
+    The centered cross-products carry XᵀX, Xᵀy and Σy² without the intercept
+    column, which keeps the normal equations well conditioned.
+    """
+    columns: Tuple[str, ...]
+    n: int
+    means: np.ndarray       # (m,) column means
+    comoments: np.ndarray   # (m, m) Σ (a - mean_a)(b - mean_b)
+
+
+def sufficient_stats(data: np.ndarray, columns: Sequence[str]) -> SufficientStats:
+    """One pass over complete rows (n x m) for the given columns"""
+    means = data.mean(axis=0)
+    centered = data - means
+    return SufficientStats(tuple(columns), len(data), means, centered.T @ centered)
+
+
+def select_stats(ss: SufficientStats, columns: Sequence[str]) -> SufficientStats:
+    """Stats of some of the columns, read off the larger matrix (same rows)"""
+    index = [ss.columns.index(column) for column in columns]
+    return SufficientStats(tuple(columns), ss.n, ss.means[index], ss.comoments[np.ix_(index, index)])
+
+
+def merge_stats(a: SufficientStats, b: SufficientStats) -> SufficientStats:
+    """Stats of the union of two disjoint row sets (parallel-axis update)"""
+    n = a.n + b.n
+    if a.n == 0 or b.n == 0:
+        return a if b.n == 0 else b
+    delta = b.means - a.means
+    means = a.means + delta * (b.n / n)
+    comoments = a.comoments + b.comoments + np.outer(delta, delta) * (a.n * b.n / n)
+    return SufficientStats(a.columns, n, means, comoments)
+
+
+def grouped_sufficient_stats(data: np.ndarray, codes: np.ndarray, n_groups: int,
+                             columns: Sequence[str]) -> List[SufficientStats]:
+    """Stats of every group from segmented sums over the rows (codes in [0, n_groups)).
+
+    Values are shifted by the overall mean first so the raw second moments
+    do not cancel catastrophically. Cost is O(n m²) whatever the number of groups.
+    """
+    m = data.shape[1]
+    offset = data.mean(axis=0) if len(data) else np.zeros(m)
+    shifted = data - offset
+    counts = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    sums = np.stack([np.bincount(codes, weights=shifted[:, j], minlength=n_groups) for j in range(m)], axis=1)
+    products = np.empty((n_groups, m, m))
+    for i in range(m):
+        for j in range(i, m):
+            products[:, i, j] = products[:, j, i] = np.bincount(
+                codes, weights=shifted[:, i] * shifted[:, j], minlength=n_groups
+            )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts[:, None]
+    comoments = products - counts[:, None, None] * means[:, :, None] * means[:, None, :]
+    return [
+        SufficientStats(tuple(columns), int(counts[g]), means[g] + offset, comoments[g])
+        for g in range(n_groups)
+    ]
+
+
+def correlation(ss: SufficientStats) -> np.ndarray:
+    """Pearson correlation matrix of the columns (0 where a column is constant)"""
+    scale = np.sqrt(np.diagonal(ss.comoments))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = ss.comoments / np.outer(scale, scale)
+    return np.nan_to_num(corr, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _solve(ss: SufficientStats, predictors: List[str], target: str, masks: np.ndarray) -> Dict[str, np.ndarray]:
+    """Fit one model per row of masks (s x k booleans over predictors) in a single batch.
+
+    Excluded predictors get an identity block, so the batched pseudo-inverse
+    is the inverse of the selected block and their coefficients come out 0.
+    """
+    index = [ss.columns.index(column) for column in predictors]
+    t = ss.columns.index(target)
+    sxx = ss.comoments[np.ix_(index, index)]
+    sxy = ss.comoments[index, t]
+    syy = ss.comoments[t, t]
+    k = len(index)
+
+    m = masks.astype(np.float64)
+    a = sxx * (m[:, :, None] * m[:, None, :]) + np.eye(k) * (1 - m)[:, :, None]
+    inverse = np.linalg.pinv(a)
+    b = sxy * m
+    beta = np.einsum('sij,sj->si', inverse, b)
+
+    p = m.sum(axis=1)
+    dof = ss.n - p - 1
+    ss_res = np.maximum(syy - (beta * b).sum(axis=1), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = ss_res / dof
+        std_errors = np.sqrt(sigma2[:, None] * np.diagonal(inverse, axis1=1, axis2=2)) * m
+        t_stats = np.where(m > 0, beta / std_errors, 0.0)
+        p_values = np.where(m > 0, 2 * stats.t.sf(np.abs(t_stats), dof[:, None]), np.nan)
+
+        x_means = ss.means[index] * m
+        intercept = ss.means[t] - (beta * x_means).sum(axis=1)
+        intercept_se = np.sqrt(sigma2 * (1 / ss.n + np.einsum('si,sij,sj->s', x_means, inverse, x_means)))
+
+        r_squared = 1 - ss_res / syy
+        adj_r_squared = 1 - (1 - r_squared) * (ss.n - 1) / dof
+        f_stat = ((syy - ss_res) / p) / sigma2
+        f_p_value = stats.f.sf(f_stat, p, dof)
+        aic = ss.n * np.log(ss_res / ss.n) + 2 * (p + 1)
+
+    return {
+        'beta': beta, 'std_errors': std_errors, 't_stats': t_stats, 'p_values': p_values,
+        'intercept': intercept, 'intercept_se': intercept_se, 'r_squared': r_squared,
+        'adj_r_squared': adj_r_squared, 'f_stat': f_stat, 'f_p_value': f_p_value,
+        'residual_std': np.sqrt(ss_res / ss.n), 'dof': dof, 'aic': aic
+    }
+
+
+def _model(fit: Dict[str, np.ndarray], i: int, names: List[str], mask: np.ndarray) -> Dict[str, Any]:
+    selected = [j for j in range(len(names)) if mask[j]]
+    return {
+        'predictors': [names[j] for j in selected],
+        'intercept': finite_or_none(fit['intercept'][i]),
+        'intercept_std_error': finite_or_none(fit['intercept_se'][i]),
+        'coefficients': {names[j]: finite_or_none(fit['beta'][i, j]) for j in selected},
+        'std_errors': {names[j]: finite_or_none(fit['std_errors'][i, j]) for j in selected},
+        't_stats': {names[j]: finite_or_none(fit['t_stats'][i, j]) for j in selected},
+        'p_values': {names[j]: finite_or_none(fit['p_values'][i, j]) for j in selected},
+        'r_squared': finite_or_none(fit['r_squared'][i]),
+        'adj_r_squared': finite_or_none(fit['adj_r_squared'][i]),
+        'f_stat': finite_or_none(fit['f_stat'][i]),
+        'p_value': finite_or_none(fit['f_p_value'][i]),
+        'aic': finite_or_none(fit['aic'][i]),
+        'residual_std': finite_or_none(fit['residual_std'][i]),
+        'dof': int(fit['dof'][i])
+    }
+
+
+def fit_ols(ss: SufficientStats, predictors: List[str], target: str,
+            names: List[str] = None) -> Dict[str, Any]:
+    """Coefficients, standard errors, t-stats, p-values and R² of one model"""
+    fit = _solve(ss, predictors, target, np.ones((1, len(predictors)), dtype=bool))
+    return _model(fit, 0, names or predictors, np.ones(len(predictors), dtype=bool))
+
+
+def fit_all_subsets(ss: SufficientStats, predictors: List[str], target: str,
+                    names: List[str] = None) -> List[Dict[str, Any]]:
+    """Every non-empty predictor subset, solved as one batch"""
+    if len(predictors) > MAX_SUBSET_PREDICTORS:
+        raise ValueError(f"At most {MAX_SUBSET_PREDICTORS} predictors can be searched exhaustively")
+    masks = np.array(list(product([False, True], repeat=len(predictors)))[1:], dtype=bool)
+    fit = _solve(ss, predictors, target, masks)
+    return [_model(fit, i, names or predictors, mask) for i, mask in enumerate(masks)]
@@ -0,0 +1,201 @@
+"""
+State shared between uvicorn worker processes: dataset snapshots and model versions
+"""
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from database import mongo_service, redis_service
+from services.analysis import analysis_service
+from services.cache import response_cache
+from services.dataset import build_frame
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY_PREFIX = 'shared:snapshot:'  # + dataset version -> Arrow IPC stream of the frame
+SNAPSHOT_TTL = 3600                       # seconds; superseded versions simply expire
+MODEL_VERSION_KEY = 'shared:model_version'
+MODEL_CHECK_INTERVAL = 1.0                # seconds a resolved model version is trusted
+TRAINING_LOCK_KEY = 'shared:training_lock'
+TRAINING_LOCK_TTL = 900                   # seconds before the lock of a crashed worker expires
+TRAINING_LOCK_WAIT = 60.0                 # seconds to wait for another worker's training
+
+
+class TrainingInProgress(Exception):
+    """Another worker kept the training lock for longer than TRAINING_LOCK_WAIT"""
+
+
+def encode_frame(df: pd.DataFrame) -> bytes:
+    """Arrow IPC stream of the frame (float32, Int32 and categorical columns round-trip)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_frame(data: bytes) -> pd.DataFrame:
+    """Frame from an Arrow IPC stream written by encode_frame"""
+    return pa.ipc.open_stream(data).read_pandas()
+
+
+class SharedState:
+    """Keeps every worker on the same dataset snapshot and classifier version.
+
+    The first worker to need a dataset version builds the frame from MongoDB
+    and publishes it to Redis; the others decode it instead of re-querying.
+    Retrains and model deletions bump a counter in Redis that every worker
+    polls before serving Part 4, reloading the (memory-mapped) models from disk.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[Tuple[str, pd.DataFrame]] = None
+        self._snapshot_lock = threading.Lock()
+        self._model_version: Optional[str] = None
+        self._model_checked = 0.0
+        self._model_lock = threading.Lock()
+        self._training_lock = threading.Lock()  # used when Redis is unavailable
+        self._stats = {'snapshot_builds': 0, 'snapshot_loads': 0, 'model_reloads': 0}
+
+    # Dataset snapshots
+    def _read_snapshot(self, version: str) -> Optional[pd.DataFrame]:
+        if redis_service.binary is None:
+            return None
+        try:
+            data = redis_service.binary.get(SNAPSHOT_KEY_PREFIX + version)
+        except Exception as e:
+            logger.warning(f"Snapshot read failed: {e}")
+            return None
+        return decode_frame(data) if data is not None else None
+
+    def _publish_snapshot(self, version: str, df: pd.DataFrame):
+        if redis_service.binary is None:
+            return
+        try:
+            redis_service.binary.set(SNAPSHOT_KEY_PREFIX + version, encode_frame(df), ex=SNAPSHOT_TTL)
+        except Exception as e:
+            logger.warning(f"Snapshot publish failed: {e}")
+
+    def dataset_snapshot(self) -> pd.DataFrame:
+        """Typed frame of the whole dataset for the current dataset version.
+
+        The frame is shared by every request in this worker and must not be mutated.
+        """
+        version = response_cache.dataset_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1]
+
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot[0] == version:
+                return snapshot[1]
+
+            df = self._read_snapshot(version)
+            if df is not None:
+                self._stats['snapshot_loads'] += 1
+            else:
+                df = build_frame(mongo_service.get_all_penguins())
+                self._publish_snapshot(version, df)
+                self._stats['snapshot_builds'] += 1
+                logger.info(f"Published dataset snapshot {version} ({len(df)} rows)")
+            self._snapshot = (version, df)
+            return df
+
+    # Model versions
+    def _read_model_version(self) -> str:
+        if redis_service.redis is None:
+            return '0'
+        try:
+            return redis_service.redis.get(MODEL_VERSION_KEY) or '0'
+        except Exception as e:
+            logger.warning(f"Model version lookup failed: {e}")
+            return self._model_version or '0'
+
+    def publish_models_changed(self):
+        """Signal every worker that the persisted classifiers were retrained or deleted"""
+        if redis_service.redis is None:
+            return
+        try:
+            version = str(redis_service.redis.incr(MODEL_VERSION_KEY))
+        except Exception as e:
+            logger.warning(f"Model version publish failed: {e}")
+            return
+        # This worker already holds the new models
+        with self._model_lock:
+            self._model_version = version
+            self._model_checked = time.monotonic()
+
+    def sync_models(self):
+        """Reload the classifiers from disk if another worker changed them"""
+        now = time.monotonic()
+        if self._model_version is not None and now - self._model_checked < MODEL_CHECK_INTERVAL:
+            return
+
+        with self._model_lock:
+            version = self._read_model_version()
+            self._model_checked = now
+            if self._model_version is None:
+                # First check: the models loaded at startup are current
+                self._model_version = version
+                return
+            if version == self._model_version:
+                return
+            analysis_service.reload_classifiers()
+            self._model_version = version
+            self._stats['model_reloads'] += 1
+            logger.info(f"Reloaded classifiers for model version {version}")
+
+    # Training
+    @contextmanager
+    def training_lock(self) -> Iterator[None]:
+        """Serialize retrains, incremental updates and promotions across workers.
+
+        Each of them reads the current models and the training watermark and
+        then saves new versions, so two at once would fork the version history.
+        """
+        lock = None
+        if redis_service.redis is not None:
+            lock = redis_service.redis.lock(TRAINING_LOCK_KEY, timeout=TRAINING_LOCK_TTL,
+                                            blocking_timeout=TRAINING_LOCK_WAIT, thread_local=False)
+            try:
+                acquired = lock.acquire()
+            except Exception as e:
+                logger.warning(f"Training lock unavailable, locking this worker only: {e}")
+                lock = None
+        if lock is None:
+            acquired = self._training_lock.acquire(timeout=TRAINING_LOCK_WAIT)
+        if not acquired:
+            raise TrainingInProgress("Another retrain or model update is in progress; try again later")
+        try:
+            yield
+        finally:
+            try:
+                if lock is not None:
+                    lock.release()
+                else:
+                    self._training_lock.release()
+            except Exception as e:
+                logger.warning(f"Training lock release failed (expired?): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """This worker's process id, snapshot and model versions"""
+        snapshot = self._snapshot
+        return {
+            'pid': os.getpid(),
+            'dataset_version': snapshot[0] if snapshot else None,
+            'snapshot_rows': len(snapshot[1]) if snapshot else 0,
+            'model_version': self._model_version,
+            **self._stats
+        }
+
+
+# Global shared state instance
+shared_state = SharedState()
@@ -160,6 +160,8 @@ def init_redis(penguins: List[Dict], host: str = 'redis', port: int = 6379):
             penguin_data = {k: v for k, v in penguin.items() if k != '_id'}
             key = f"penguin:{penguin_data['sampleNumber']}"
             r.hset(key, mapping={k: json.dumps(v) if v is not None else 'null' for k, v in penguin_data.items()})
+            # Keep the API's sampleNumber pagination index in step with the hashes
+            r.zadd('penguins:by_sample', {key: penguin_data['sampleNumber']})
             
             # Add to species set
             species = penguin['species']
@@ -27,7 +27,7 @@ function Part2() {
       const [distRes, corrRes, scatterRes] = await Promise.all([
         axios.get(`/api/part2/distribution?variable=${variable}`),
         axios.get('/api/part2/correlation'),
-        axios.get('/api/part2/scatter')
+        axios.get('/api/part2/scatter?mode=stratified&max_points=2000')
       ]);
       setDistributionData(distRes.data);
       setCorrelationData(corrRes.data);
@@ -125,6 +125,10 @@ function Part4() {
         </div>
 
         <div className="metrics-box">
+          <div className="metric-row">
+            <span className="metric-label">Scored on</span>
+            <span className="metric-value">{metrics.evaluated_on === 'cross_validation' ? 'Cross-validation' : 'Training set'}</span>
+          </div>
           <div className="metric-row">
             <span className="metric-label">Accuracy</span>
             <span className="metric-value" style={{ color: getModelColor(modelKey) }}>
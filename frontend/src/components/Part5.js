@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useRef, useEffect } from 'react';
 import axios from 'axios';
 import {
   Chart as ChartJS,
@@ -55,19 +55,80 @@ function Part5() {
     }
   };
 
+  const [job, setJob] = useState(null);
+  const [isolated, setIsolated] = useState(false);
+  const eventSourceRef = useRef(null);
+
+  const closeStream = () => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
+    }
+  };
+
+  // Close any open progress stream when the component unmounts
+  useEffect(() => closeStream, []);
+
   const runAllBenchmarks = async () => {
     try {
+      closeStream();
       setLoading(true);
       setError(null);
-      const response = await axios.post('/api/benchmark/all');
-      setResults(response.data);
+      setResults(null);
+      const response = await axios.post('/api/benchmark/jobs', null, {
+        params: { isolated },
+      });
+      const jobId = response.data.job_id;
+      setJob({ job_id: jobId, status: response.data.status, progress: {} });
+
+      const source = new EventSource(`/api/benchmark/jobs/${jobId}/events`);
+      eventSourceRef.current = source;
+
+      source.addEventListener('progress', (event) => {
+        setJob(JSON.parse(event.data));
+      });
+      source.addEventListener('completed', (event) => {
+        const data = JSON.parse(event.data);
+        setJob(data);
+        setResults(data.result);
+        closeStream();
+        setLoading(false);
+      });
+      source.addEventListener('failed', (event) => {
+        const data = JSON.parse(event.data);
+        setJob(data);
+        setError(`Failed to run benchmarks: ${data.error}`);
+        closeStream();
+        setLoading(false);
+      });
+      source.addEventListener('cancelled', (event) => {
+        setJob(JSON.parse(event.data));
+        closeStream();
+        setLoading(false);
+      });
+      source.onerror = () => {
+        // The browser retries automatically; give up only once the stream is closed
+        if (source.readyState === EventSource.CLOSED) {
+          setError('Lost connection to the benchmark progress stream');
+          closeStream();
+          setLoading(false);
+        }
+      };
     } catch (err) {
       setError(`Failed to run benchmarks: ${err.message}`);
-    } finally {
       setLoading(false);
     }
   };
 
+  const cancelBenchmarks = async () => {
+    if (!job) return;
+    try {
+      await axios.delete(`/api/benchmark/jobs/${job.job_id}`);
+    } catch (err) {
+      setError(`Failed to cancel benchmarks: ${err.message}`);
+    }
+  };
+
   const getChartData = () => {
     if (!results || !results.benchmarks) {
       return null;
@@ -159,6 +220,24 @@ function Part5() {
           >
             {loading ? 'Testing All...' : 'Run All Benchmarks'}
           </button>
+          {loading && job && (
+            <button
+              onClick={cancelBenchmarks}
+              disabled={job.cancel_requested}
+              className="btn btn-primary"
+            >
+              {job.cancel_requested ? 'Cancelling...' : 'Cancel Benchmarks'}
+            </button>
+          )}
+          <label className="isolation-toggle">
+            <input
+              type="checkbox"
+              checked={isolated}
+              disabled={loading}
+              onChange={(e) => setIsolated(e.target.checked)}
+            />
+            Run databases one at a time (isolated)
+          </label>
         </div>
 
         {results && (
@@ -186,7 +265,40 @@ function Part5() {
       </div>
 
       {error && <div className="error-message">{error}</div>}
-      {loading && <div className="loading">Running benchmarks...</div>}
+      {loading && !job && <div className="loading">Running benchmarks...</div>}
+
+      {job && job.status !== 'completed' && (
+        <div className="live-progress">
+          <h3>⏱️ Live Progress ({job.status})</h3>
+          <table className="results-table">
+            <thead>
+              <tr>
+                <th>Database</th>
+                <th>Queries</th>
+                <th>Avg (ms)</th>
+                <th>p50 (ms)</th>
+                <th>p95 (ms)</th>
+                <th>p99 (ms)</th>
+              </tr>
+            </thead>
+            <tbody>
+              {Object.entries(job.progress || {}).map(([db, progress]) => (
+                <tr key={db}>
+                  <td className="db-name">{db}</td>
+                  <td>
+                    <progress value={progress.completed} max={progress.total} />{' '}
+                    {progress.completed}/{progress.total}
+                  </td>
+                  <td>{progress.metrics.avg_time?.toFixed(2)}</td>
+                  <td>{progress.metrics.p50?.toFixed(2)}</td>
+                  <td>{progress.metrics.p95?.toFixed(2)}</td>
+                  <td>{progress.metrics.p99?.toFixed(2)}</td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+      )}
 
       {results && (
         <div className="results-container">
@@ -273,6 +385,7 @@ function Part5() {
                   <th>Avg Time (ms)</th>
                   <th>Min Time (ms)</th>
                   <th>Max Time (ms)</th>
+                  <th>p95 (ms)</th>
                   <th>Throughput (ops/s)</th>
                   <th>Total Queries</th>
                 </tr>
@@ -285,6 +398,7 @@ function Part5() {
                       <td>{metrics.avg_time?.toFixed(2)}</td>
                       <td>{metrics.min_time?.toFixed(2)}</td>
                       <td>{metrics.max_time?.toFixed(2)}</td>
+                      <td>{metrics.p95?.toFixed(2)}</td>
                       <td>{metrics.throughput?.toFixed(2)}</td>
                       <td>{metrics.total_queries}</td>
                     </tr>